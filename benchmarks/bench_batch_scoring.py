@@ -0,0 +1,97 @@
+"""Compare per-row scalar scoring against vectorized batch scoring.
+
+Usage:
+    python benchmarks/bench_batch_scoring.py --rows 200000
+
+Generates random assessments, scores them with both the scalar functions and
+``fibromyalgia_batch.score_batch``, checks the results are identical and
+prints the speedup.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_scoring import (  # noqa: E402
+    PAIN_AREAS, OTHER_SYMPTOMS,
+    calculate_wpi_score, calculate_ss_score_2a, calculate_ss_score_2b,
+    evaluate_diagnostic_criteria
+)
+from fibromyalgia_batch import score_batch  # noqa: E402
+
+
+def random_cohort(rows, seed):
+    """Generate random answers for a cohort"""
+    rng = np.random.default_rng(seed)
+    # Vary the per-row probability so every score range is represented
+    pain_p = rng.random((rows, 1))
+    symptom_p = rng.random((rows, 1))
+    return {
+        "pain_flags": rng.random((rows, len(PAIN_AREAS))) < pain_p,
+        "fatigue": rng.integers(0, 4, rows),
+        "waking": rng.integers(0, 4, rows),
+        "cognitive": rng.integers(0, 4, rows),
+        "symptom_flags": rng.random((rows, len(OTHER_SYMPTOMS))) < symptom_p
+    }
+
+def to_label_rows(cohort):
+    """Convert a cohort into the per-row label lists the app works with"""
+    pain_areas = np.array(PAIN_AREAS, dtype=object)
+    symptoms = np.array(OTHER_SYMPTOMS, dtype=object)
+    return [
+        (list(pain_areas[pain_row]), int(f), int(w), int(c), list(symptoms[symptom_row]))
+        for pain_row, f, w, c, symptom_row in zip(
+            cohort["pain_flags"], cohort["fatigue"], cohort["waking"],
+            cohort["cognitive"], cohort["symptom_flags"])
+    ]
+
+def score_rows(rows):
+    """Score label rows one at a time with the scalar functions"""
+    results = []
+    for pain_areas, fatigue, waking, cognitive, symptoms in rows:
+        wpi = calculate_wpi_score(pain_areas)
+        ss_2a = calculate_ss_score_2a(fatigue, waking, cognitive)
+        ss_2b = calculate_ss_score_2b(len(symptoms))
+        total_ss = ss_2a + ss_2b
+        results.append((wpi, ss_2a, ss_2b, total_ss, evaluate_diagnostic_criteria(wpi, total_ss)))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    cohort = random_cohort(args.rows, args.seed)
+    label_rows = to_label_rows(cohort)
+
+    start = time.perf_counter()
+    scalar = score_rows(label_rows)
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = score_batch(**cohort)
+    batch_seconds = time.perf_counter() - start
+
+    expected = np.array(scalar, dtype=np.int64)
+    columns = ["wpi_score", "ss_2a_score", "ss_2b_score", "total_ss_score", "meets_diagnostic_criteria"]
+    for i, column in enumerate(columns):
+        if not np.array_equal(batch[column].astype(np.int64), expected[:, i]):
+            print(f"MISMATCH in {column}", file=sys.stderr)
+            return 1
+
+    print(f"rows:     {args.rows:,}")
+    print(f"scalar:   {scalar_seconds:.3f}s ({args.rows / scalar_seconds:,.0f} rows/s)")
+    print(f"batch:    {batch_seconds:.3f}s ({args.rows / batch_seconds:,.0f} rows/s)")
+    print(f"speedup:  {scalar_seconds / batch_seconds:.1f}x")
+    print("results identical: yes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Bytes sent to the browser per results rerun, for each chart mode.
+
+Usage:
+    python benchmarks/bench_chart_payload.py --runs 20
+
+Runs the app with Streamlit's AppTest harness once per FIBRO_CHART_MODE,
+each in a fresh interpreter (the mode is read at import), submits the same
+answers and reports:
+
+- the serialized size of every element the results rerun sends, and of
+  the two Plotly charts alone
+- the server time of the submit rerun (best and median of ``--runs``)
+- the time to serialize both figures to JSON
+
+The app's charts are cached, so the rerun times include no figure building.
+How long the browser takes to draw the charts is not measured here; it
+scales with the spec size that is.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+APP_PATH = os.path.join(ROOT, "fibromyalgia_app.py")
+
+# Checkbox keys ticked in every run: 9 pain areas and 12 symptoms
+PAIN_KEYS = [f"pain_{i}" for i in (1, 2, 3, 5, 8, 10, 12, 15, 18)]
+SYMPTOM_KEYS = [f"symptom_{i}" for i in range(0, 36, 3)]
+
+
+def element_bytes(node):
+    """(all elements, plotly charts) serialized bytes under an AppTest node"""
+    total = charts = 0
+    proto = getattr(node, "proto", None)
+    if proto is not None:
+        total = proto.ByteSize()
+        if node.type == "plotly_chart":
+            charts = total
+    for child in getattr(node, "children", {}).values():
+        child_total, child_charts = element_bytes(child)
+        total += child_total
+        charts += child_charts
+    return total, charts
+
+def measure(runs):
+    from streamlit.testing.v1 import AppTest
+    from fibromyalgia_charts import CHART_MODE, scores_figure, pain_figure
+    import plotly.io as pio
+
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    seconds = []
+    for _ in range(runs + 1):
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        at.run()
+        for key in PAIN_KEYS + SYMPTOM_KEYS:
+            at.checkbox(key=key).set_value(True)
+        at.radio(key="fatigue").set_value(at.radio(key="fatigue").options[2])
+        start = time.perf_counter()
+        at.button[0].click().run()
+        seconds.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"app raised: {at.exception[0].message}")
+    # The first run also builds the cached figures
+    seconds = seconds[1:]
+    total, charts = element_bytes(at.main)
+
+    record = at.session_state["assessment"]
+    figures = [scores_figure(record.wpi_score, record.ss_2a_score, record.ss_2b_score,
+                             record.total_ss_score), pain_figure(record.region_counts)]
+    start = time.perf_counter()
+    for _ in range(100):
+        for figure in figures:
+            pio.to_json(figure, validate=False)
+    serialize = (time.perf_counter() - start) / 100
+    return {
+        "mode": CHART_MODE,
+        "rerun_bytes": total,
+        "chart_bytes": charts,
+        "rerun_best_ms": min(seconds) * 1000,
+        "rerun_median_ms": statistics.median(seconds) * 1000,
+        "serialize_ms": serialize * 1000,
+    }
+
+def measure_process(mode, runs):
+    env = dict(os.environ, FIBRO_CHART_MODE=mode, FIBRO_STORE_PATH="", FIBRO_METRICS="")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--runs", str(runs)],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+def main(argv=None):
+    from fibromyalgia_charts import CHART_MODES
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="submit reruns timed per mode")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.runs)))
+        return 0
+
+    print(f"{'mode':<8} {'rerun KB':>9} {'charts KB':>10} {'rerun ms':>9} {'median':>8} {'to_json ms':>11}")
+    for mode in CHART_MODES:
+        result = measure_process(mode, args.runs)
+        print(f"{mode:<8} {result['rerun_bytes'] / 1024:>9.1f} {result['chart_bytes'] / 1024:>10.1f} "
+              f"{result['rerun_best_ms']:>9.1f} {result['rerun_median_ms']:>8.1f} "
+              f"{result['serialize_ms']:>11.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Check and time the compiled criteria engine.
+
+Usage:
+    python benchmarks/bench_criteria.py --size 1000000
+
+Checks that:
+
+- for every (WPI, SS) pair, ``meets_primary_criteria`` (behind
+  ``AssessmentRecord.meets_criteria`` and the results banner, built from
+  the 2010 definition) matches ``evaluate_diagnostic_criteria`` and
+  ``batch_evaluate_diagnostic_criteria``, which hard-code the thresholds
+- on a random cohort, ``CompiledCriteria.evaluate`` (NumPy, whole batch)
+  and ``evaluate_one`` (plain Python, used by the results page) agree on
+  every measure and set
+- the 2010 set matches ``evaluate_diagnostic_criteria`` and
+  ``score_batch`` on the cohort too
+
+then times evaluating every set in one pass against compiling and
+evaluating each set on its own, and against ``evaluate_one`` per row.
+Exits non-zero on any mismatch.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_batch import batch_evaluate_diagnostic_criteria, score_batch  # noqa: E402
+from fibromyalgia_criteria import (  # noqa: E402
+    CRITERIA_SETS, PRIMARY_CRITERIA, compile_criteria, default_criteria, meets_primary_criteria
+)
+from fibromyalgia_scoring import MAX_WPI_SCORE, MAX_SS_SCORE, evaluate_diagnostic_criteria  # noqa: E402
+from bench_batch_scoring import random_cohort  # noqa: E402
+
+
+def masks(flags):
+    return flags.astype(np.int64) @ (1 << np.arange(flags.shape[1], dtype=np.int64))
+
+def check_score_grid():
+    """Mismatches between the primary criteria table and the hard-coded functions"""
+    wpi, ss = np.meshgrid(np.arange(MAX_WPI_SCORE + 1), np.arange(MAX_SS_SCORE + 1), indexing="ij")
+    batch = batch_evaluate_diagnostic_criteria(wpi, ss)
+    mismatches = 0
+    for w in range(MAX_WPI_SCORE + 1):
+        for s in range(MAX_SS_SCORE + 1):
+            meets = meets_primary_criteria(w, s)
+            if meets != evaluate_diagnostic_criteria(w, s) or meets != batch[w, s]:
+                mismatches += 1
+                print(f"criteria {PRIMARY_CRITERIA} mismatch for WPI {w}, SS {s}", file=sys.stderr)
+    print(f"checked {wpi.size} (WPI, SS) pairs against the hard-coded criteria: {mismatches} mismatches")
+    return mismatches
+
+def best_of(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1_000_000, help="cohort size")
+    parser.add_argument("--checked", type=int, default=20_000, help="rows checked against evaluate_one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    cohort = random_cohort(args.size, seed=args.seed)
+    pain_masks, symptom_masks = masks(cohort["pain_flags"]), masks(cohort["symptom_flags"])
+    answers = (pain_masks, symptom_masks, cohort["fatigue"], cohort["waking"], cohort["cognitive"])
+    criteria = default_criteria()
+    result = criteria.evaluate(*answers)
+
+    mismatches = check_score_grid()
+    for i in range(min(args.checked, args.size)):
+        one = criteria.evaluate_one(*(int(column[i]) for column in answers))
+        mismatches += sum(one.measures[name] != result.measures[name][i] for name in one.measures)
+        mismatches += sum(one.meets[key] != result.meets[key][i] for key in one.meets)
+        mismatches += one.meets["2010"] != evaluate_diagnostic_criteria(one.measures["wpi"], one.measures["ss"])
+    scores = score_batch(**cohort)
+    mismatches += int(np.count_nonzero(scores["meets_diagnostic_criteria"] != result.meets["2010"]))
+    print(f"checked {min(args.checked, args.size):,} rows against evaluate_one and "
+          f"{args.size:,} against score_batch: {mismatches} mismatches")
+
+    for criteria_set in CRITERIA_SETS:
+        print(f"  {criteria_set.name:<28} {result.meets[criteria_set.key].mean():6.1%} meet")
+
+    separate = [compile_criteria([criteria_set]) for criteria_set in CRITERIA_SETS]
+    one_pass = best_of(lambda: criteria.evaluate(*answers))
+    per_set = best_of(lambda: [compiled.evaluate(*answers) for compiled in separate])
+    rows = min(args.checked, args.size)
+    scalar = best_of(lambda: [criteria.evaluate_one(*(int(column[i]) for column in answers))
+                              for i in range(rows)], repeat=1) * args.size / rows
+    print(f"{len(CRITERIA_SETS)} sets over {args.size:,} rows:")
+    print(f"  one pass              {one_pass * 1000:8.1f} ms ({one_pass / args.size * 1e9:.0f} ns/row)")
+    print(f"  one pass per set      {per_set * 1000:8.1f} ms ({per_set / one_pass:.1f}x)")
+    print(f"  evaluate_one per row  {scalar * 1000:8.1f} ms ({scalar / one_pass:.0f}x, extrapolated)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
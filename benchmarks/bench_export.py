@@ -0,0 +1,102 @@
+"""Throughput and memory of the streaming export against the pandas route.
+
+Usage:
+    python benchmarks/bench_export.py --rows 500000
+    python benchmarks/bench_export.py --methods pandas-csv csv parquet
+
+Fills a temporary store with random assessments, then exports all of them
+once per method, each in a fresh interpreter so peak memory is comparable.
+``pandas-csv`` and ``json-indent`` are what the app's single-assessment
+export does (export dicts into a DataFrame and ``to_csv``, or
+``json.dumps(indent=2)``), applied to the whole cohort; the other methods
+stream through ``fibromyalgia_export`` in both layouts.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_store import AssessmentStore, query_records  # noqa: E402
+from fibromyalgia_export import write_export  # noqa: E402
+from bench_store import random_records  # noqa: E402
+
+METHODS = [
+    "pandas-csv", "json-indent",
+    "csv", "jsonl", "arrow", "parquet",
+    "csv:boolean", "jsonl:boolean", "arrow:boolean", "parquet:boolean",
+]
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def run_method(method, store_path, output_path):
+    """Export the whole store with one method; returns bytes written"""
+    records = query_records(store_path)
+    if method == "pandas-csv":
+        import pandas as pd
+        data = pd.DataFrame([record.to_export_dict() for record in records]).to_csv(index=False)
+    elif method == "json-indent":
+        data = json.dumps([record.to_export_dict() for record in records], indent=2)
+    else:
+        fmt, _, layout = method.partition(":")
+        with open(output_path, "wb") as stream:
+            return write_export(records, stream, fmt, layout or "bitmask")
+    with open(output_path, "w", encoding="utf-8") as stream:
+        return stream.write(data)
+
+def measure(method, store_path, output_path):
+    """Run one method in a fresh interpreter; returns (seconds, bytes, rss_mb delta)"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", method, store_path, output_path],
+        capture_output=True, text=True, check=True
+    )
+    seconds, written, rss_mb = result.stdout.split()
+    return float(seconds), int(written), float(rss_mb)
+
+def child(method, store_path, output_path):
+    # Import what every method needs before the baseline
+    import pandas  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+    baseline = max_rss_mb()
+    start = time.perf_counter()
+    written = run_method(method, store_path, output_path)
+    print(time.perf_counter() - start, written, max_rss_mb() - baseline)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=METHODS)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(*args.child)
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="fibro-export-") as tmp_dir:
+        store_path = os.path.join(tmp_dir, "assessments.db")
+        store = AssessmentStore(store_path)
+        store.insert_many(random_records(args.rows, args.seed))
+        store.close()
+
+        print(f"{args.rows:,} assessments")
+        print(f"  {'method':<16} {'rows/s':>10} {'seconds':>8} {'MB out':>8} {'peak RSS +MB':>13}")
+        for method in args.methods:
+            seconds, written, rss_mb = measure(method, store_path, os.path.join(tmp_dir, "export.out"))
+            print(f"  {method:<16} {args.rows / seconds:>10,.0f} {seconds:>8.2f} "
+                  f"{written / 1e6:>8.1f} {rss_mb:>13.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
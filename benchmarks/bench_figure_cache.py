@@ -0,0 +1,94 @@
+"""Measure the results figure cache.
+
+Usage:
+    python benchmarks/bench_figure_cache.py --renders 2000
+    python benchmarks/bench_figure_cache.py --prewarm
+
+Replays results-page renders for random assessments, building both charts
+from scratch and then through the LRU cache, and prints time per render plus
+the cache hit/miss counters. ``--prewarm`` also times building the whole
+input domain and the memory it holds.
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_record import AssessmentRecord  # noqa: E402
+from fibromyalgia_charts import (  # noqa: E402
+    FIGURE_CACHE_SIZE, scores_figure, pain_figure,
+    prewarm_figure_cache, figure_cache_info, clear_figure_cache
+)
+from bench_batch_scoring import random_cohort  # noqa: E402
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def chart_inputs(renders, seed):
+    """(score tuple, region counts) for each simulated render"""
+    cohort = random_cohort(renders, seed)
+    inputs = []
+    for i in range(renders):
+        pain_mask = sum(1 << bit for bit, flag in enumerate(cohort["pain_flags"][i]) if flag)
+        symptom_mask = sum(1 << bit for bit, flag in enumerate(cohort["symptom_flags"][i]) if flag)
+        record = AssessmentRecord(pain_mask, symptom_mask, int(cohort["fatigue"][i]),
+                                  int(cohort["waking"][i]), int(cohort["cognitive"][i]))
+        inputs.append(((record.wpi_score, record.ss_2a_score, record.ss_2b_score, record.total_ss_score),
+                       record.region_counts))
+    return inputs
+
+def render_all(inputs, build_scores, build_pain):
+    start = time.perf_counter()
+    for scores, counts in inputs:
+        build_scores(*scores)
+        if any(counts):
+            build_pain(counts)
+    return time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renders", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prewarm", action="store_true", help="also time prewarming the full domain")
+    args = parser.parse_args(argv)
+
+    inputs = chart_inputs(args.renders, args.seed)
+    distinct = len(set(inputs))
+
+    # Warm up Plotly's own lazy imports before timing anything
+    scores_figure.__wrapped__(0, 0, 0, 0)
+    pain_figure.__wrapped__((1, 0, 0, 0))
+
+    uncached = render_all(inputs, scores_figure.__wrapped__, pain_figure.__wrapped__)
+    clear_figure_cache()
+    cached = render_all(inputs, scores_figure, pain_figure)
+    info = figure_cache_info()
+
+    print(f"renders: {args.renders:,} ({distinct:,} distinct chart inputs, cache size {FIGURE_CACHE_SIZE})")
+    print(f"uncached: {uncached / args.renders * 1000:7.2f} ms/render")
+    print(f"cached:   {cached / args.renders * 1000:7.2f} ms/render ({uncached / cached:.1f}x)")
+    for name, stats in info.items():
+        lookups = stats["hits"] + stats["misses"]
+        print(f"{name}: {stats['hits']:,} hits, {stats['misses']:,} misses "
+              f"({stats['hits'] / lookups:.0%} hit rate), {stats['currsize']} cached")
+
+    if args.prewarm:
+        clear_figure_cache()
+        rss_before = max_rss_mb()
+        start = time.perf_counter()
+        built = prewarm_figure_cache()
+        seconds = time.perf_counter() - start
+        cached_figures = sum(stats["currsize"] for stats in figure_cache_info().values())
+        print(f"prewarm: {built:,} figures in {seconds:.1f}s, {cached_figures} kept, "
+              f"peak RSS +{max_rss_mb() - rss_before:.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Storage size and render cost of per-patient longitudinal history.
+
+Usage:
+    python benchmarks/bench_history.py --patients 200 --entries 2000
+
+Writes weekly histories in which each pain area and symptom flips with a
+small probability from one week to the next, once with delta-encoded masks
+(the store's format) and once with every entry a keyframe (full masks), and
+compares the bytes per entry of the ``patient_history`` table. Then times
+reading one patient's trend and recent entries, and building the trend
+chart with and without LTTB downsampling, with the size of the Plotly JSON
+each one sends to the browser.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fibromyalgia_store  # noqa: E402
+from fibromyalgia_charts import patient_trend_figure  # noqa: E402
+from fibromyalgia_record import AssessmentRecord  # noqa: E402
+from fibromyalgia_scoring import PAIN_AREAS, OTHER_SYMPTOMS  # noqa: E402
+from fibromyalgia_store import AssessmentStore  # noqa: E402
+
+
+def patient_history(entries, change_probability, rng):
+    """Yield one patient's weekly records as a random walk over the masks"""
+    pain = rng.random(len(PAIN_AREAS)) < 0.4
+    symptoms = rng.random(len(OTHER_SYMPTOMS)) < 0.2
+    pain_weights = 1 << np.arange(len(PAIN_AREAS), dtype=np.int64)
+    symptom_weights = 1 << np.arange(len(OTHER_SYMPTOMS), dtype=np.int64)
+    severities = rng.integers(0, 4, 3)
+    start = np.datetime64("2000-01-03T09:00:00")
+    for week in range(entries):
+        pain ^= rng.random(len(PAIN_AREAS)) < change_probability
+        symptoms ^= rng.random(len(OTHER_SYMPTOMS)) < change_probability
+        if rng.random() < change_probability:
+            severities = rng.integers(0, 4, 3)
+        date = start + np.timedelta64(week * 7 * 86400, "s")
+        yield AssessmentRecord(int(pain @ pain_weights), int(symptoms @ symptom_weights),
+                               *map(int, severities), assessment_date=str(date).replace("T", " "))
+
+def table_bytes(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (table,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def build(path, args):
+    store = AssessmentStore(path)
+    rng = np.random.default_rng(args.seed)
+    start = time.perf_counter()
+    for patient in range(args.patients):
+        store.insert_many(patient_history(args.entries, args.change_probability, rng),
+                          patient_id=f"patient-{patient}")
+    seconds = time.perf_counter() - start
+    store.close()
+    return seconds
+
+def timed(label, func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    print(f"  {label:<40} {best * 1000:8.1f} ms")
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--entries", type=int, default=2000, help="weekly assessments per patient")
+    parser.add_argument("--change-probability", type=float, default=0.05,
+                        help="chance each answer changes from one week to the next")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    entries = args.patients * args.entries
+
+    with tempfile.TemporaryDirectory(prefix="fibro-history-") as tmp_dir:
+        sizes = {}
+        for label, interval in (("full masks", 1), ("deltas", fibromyalgia_store.KEYFRAME_INTERVAL)):
+            path = os.path.join(tmp_dir, f"{interval}.db")
+            saved, fibromyalgia_store.KEYFRAME_INTERVAL = fibromyalgia_store.KEYFRAME_INTERVAL, interval
+            try:
+                seconds = build(path, args)
+            finally:
+                fibromyalgia_store.KEYFRAME_INTERVAL = saved
+            sizes[label] = table_bytes(path, "patient_history")
+            print(f"{label:<11} {entries:,} entries in {seconds:.1f}s ({entries / seconds:,.0f}/s), "
+                  f"patient_history {sizes[label] / 1e6:.1f} MB, {sizes[label] / entries:.1f} bytes per entry")
+        print(f"deltas use {sizes['deltas'] / sizes['full masks']:.0%} of the full-mask size")
+
+        store = AssessmentStore(path)
+        patient = "patient-0"
+        print(f"one patient ({args.entries:,} entries):")
+        trend = timed("trend()", lambda: store.trend(patient))
+        timed("history(last=21), decoded", lambda: store.history(patient, last=21))
+        timed("history(), all decoded", lambda: store.history(patient))
+        for label, max_points in (("LTTB", None), ("all points", args.entries)):
+            figure = timed(f"trend chart, {label}", lambda: patient_trend_figure(trend, max_points))
+            payload = len(figure.to_json())
+            points = sum(len(trace.x) for trace in figure.data)
+            print(f"  {'':<40} {points:,} points, {payload / 1024:.0f} KB of Plotly JSON")
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
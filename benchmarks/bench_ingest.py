@@ -0,0 +1,177 @@
+"""Check and time the bulk ingest of downloaded export files.
+
+Usage:
+    python benchmarks/bench_ingest.py --files 20000 --workers 4
+
+Writes a tree of clinic folders with export files as the app downloads
+them: current JSON, JSON from before the severities were exported, and
+the one-row CSV. A share of them are exact or re-indented copies, carry a
+wrong stored score, or are not valid exports. Then:
+
+- ingests the tree and checks the row, duplicate, reject and mismatch
+  counts against what was written
+- re-runs the ingest, which must skip every file
+- adds more files and checks only those are processed
+- leaves an unreferenced part and an unfinished manifest batch behind (as
+  a crash would) and checks the next run discards them
+- touches some files and checks re-ingesting them keeps their rows
+- edits a file whose content another file duplicates and checks both the
+  new and the shared content stay in the dataset
+
+and reports files per second for the first run. Exits non-zero on any
+mismatch.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_ingest import (  # noqa: E402
+    CSV_EXPORT_COLUMNS, find_files, ingest, read_dataset, read_manifest
+)
+from fibromyalgia_record import AssessmentRecord  # noqa: E402
+from fibromyalgia_scoring import PAIN_AREAS, OTHER_SYMPTOMS  # noqa: E402
+
+
+def random_record(rng, date):
+    return AssessmentRecord(int(rng.integers(0, 1 << len(PAIN_AREAS))),
+                            int(rng.integers(0, 1 << len(OTHER_SYMPTOMS))),
+                            *map(int, rng.integers(0, 4, 3)), assessment_date=date)
+
+def export_texts(record):
+    """(JSON, CSV) export texts for a record, as the app writes them"""
+    export_data = record.to_export_dict()
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(CSV_EXPORT_COLUMNS)
+    writer.writerow([export_data["assessment_date"], record.wpi_score, record.ss_2a_score,
+                     record.ss_2b_score, record.total_ss_score, record.meets_criteria,
+                     record.wpi_score, record.symptom_count])
+    return export_data, output.getvalue()
+
+def write_tree(root, files, rng, start=0):
+    """Write export files under root; returns the expected counts"""
+    expected = {"rows": 0, "duplicates": 0, "rejected": 0, "mismatches": 0}
+    previous = []
+    for i in range(start, start + files):
+        folder = os.path.join(root, f"clinic-{i % 17:02d}", f"2024-{i % 12 + 1:02d}")
+        os.makedirs(folder, exist_ok=True)
+        name = os.path.join(folder, f"fibromyalgia_assessment_{i:08d}")
+        kind = rng.random()
+        if previous and kind < 0.05:
+            # Downloaded twice, or re-saved with other whitespace
+            path, text = previous[rng.integers(len(previous))]
+            if path.endswith(".json") and rng.random() < 0.5:
+                text = json.dumps(json.loads(text))
+            with open(name + os.path.splitext(path)[1], "w", encoding="utf-8") as f:
+                f.write(text)
+            expected["duplicates"] += 1
+            continue
+        if kind < 0.07:
+            with open(name + ".json", "w", encoding="utf-8") as f:
+                f.write('{"wpi_score": 3, "pain_areas": ')
+            expected["rejected"] += 1
+            continue
+        record = random_record(rng, f"2024-01-01 09:{i // 60 % 60:02d}:{i % 60:02d}.{i}")
+        export_data, csv_text = export_texts(record)
+        if kind < 0.10:
+            export_data["total_ss_score"] = (export_data["total_ss_score"] + 1) % 13
+            expected["mismatches"] += 1
+        if kind < 0.30:
+            for field in ("fatigue", "waking_unrefreshed", "cognitive_symptoms"):
+                del export_data[field]
+        if 0.10 <= kind < 0.20:
+            path, text = name + ".csv", csv_text
+        else:
+            path, text = name + ".json", json.dumps(export_data, indent=2)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        previous.append((path, text))
+        expected["rows"] += 1
+    return expected
+
+def check(label, stats, expected):
+    actual = {field: getattr(stats, field) for field in expected}
+    ok = actual == expected
+    print(f"{label:<22} {stats.files:>7,} files {stats.skipped:>7,} skipped {stats.rows:>7,} rows "
+          f"{stats.seconds:>6.2f}s {'ok' if ok else f'MISMATCH expected {expected}'}")
+    return 0 if ok else 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    failures = 0
+
+    with tempfile.TemporaryDirectory(prefix="fibro-ingest-") as tmp_dir:
+        root, output = os.path.join(tmp_dir, "exports"), os.path.join(tmp_dir, "dataset")
+        expected = write_tree(root, args.files, rng)
+        stats = ingest(root, output, args.workers)
+        failures += check("first run", stats, dict(expected, files=args.files))
+        print(f"{'':<22} {stats.files / stats.seconds:,.0f} files/s with {args.workers} workers")
+
+        failures += check("re-run", ingest(root, output, args.workers),
+                          {"files": 0, "skipped": args.files, "rows": 0})
+
+        more = max(1, args.files // 10)
+        added = write_tree(root, more, rng, start=args.files)
+        failures += check("new files", ingest(root, output, args.workers), dict(added, files=more))
+
+        with open(os.path.join(output, "part-99999.parquet"), "wb") as f:
+            f.write(b"left by an interrupted run")
+        with open(os.path.join(output, "manifest.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"path": "uncommitted", "size": 0, "mtime_ns": 0, "status": "ingested",
+                                "hashes": ["0" * 64], "part": "part-99999.parquet"}) + '\n{"path": "tor')
+        failures += check("after a crash", ingest(root, output, args.workers), {"files": 0, "rows": 0})
+        if os.path.exists(os.path.join(output, "part-99999.parquet")):
+            print("unreferenced part was not removed")
+            failures += 1
+
+        touched = find_files(root)[::max(1, args.files // 50)]
+        later = time.time_ns() + 10**9
+        for path in touched:
+            os.utime(path, ns=(later, later))
+        failures += check("touched files", ingest(root, output, args.workers),
+                          {"files": len(touched), "rows": 0, "duplicates": 0})
+
+        shared = os.path.join(root, "shared")
+        os.makedirs(shared)
+        text = json.dumps(random_record(rng, "2024-02-01 10:00:00").to_export_dict())
+        for name in ("a", "b"):
+            with open(os.path.join(shared, f"fibromyalgia_assessment_{name}.json"), "w", encoding="utf-8") as f:
+                f.write(text)
+        failures += check("shared content", ingest(root, output, args.workers),
+                          {"files": 2, "rows": 1, "duplicates": 1})
+        with open(os.path.join(shared, "fibromyalgia_assessment_a.json"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(random_record(rng, "2024-02-02 10:00:00").to_export_dict()))
+        os.utime(os.path.join(shared, "fibromyalgia_assessment_a.json"), ns=(later, later))
+        failures += check("edited original", ingest(root, output, args.workers), {"files": 1, "rows": 1})
+
+        table = read_dataset(output)
+        # The edited file's new row, plus its old content still held by its copy
+        rows = expected["rows"] + added["rows"] + 2
+        hashes = len(set(table.column("content_hash").to_pylist()))
+        entries = read_manifest(output)
+        print(f"dataset: {table.num_rows:,} rows, {hashes:,} distinct hashes, "
+              f"{len(entries):,} manifest entries, "
+              f"{sum(os.path.getsize(os.path.join(output, name)) for name in os.listdir(output)) / 1e6:.1f} MB")
+        if table.num_rows != rows or hashes != rows:
+            print(f"expected {rows:,} distinct rows")
+            failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
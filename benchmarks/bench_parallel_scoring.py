@@ -0,0 +1,118 @@
+"""Measure how file scoring scales from 1 to N worker processes.
+
+Usage:
+    python benchmarks/bench_parallel_scoring.py --rows 500000 --max-workers 8
+
+Writes a JSONL file of random raw answers, about 1 in 1,000 of them
+malformed (not JSON, not UTF-8, nested too deeply to parse, or with a bad
+severity). Scores it once with the single-process scorer, checking every
+malformed line is rejected, and then with ``score_file_parallel`` for each
+worker count, checking every parallel output and rejects file is
+byte-identical to the single run.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_scoring import PAIN_AREAS, OTHER_SYMPTOMS  # noqa: E402
+from fibromyalgia_cli import RejectWriter, score_stream  # noqa: E402
+from fibromyalgia_parallel import score_file_parallel  # noqa: E402
+from bench_batch_scoring import random_cohort  # noqa: E402
+
+
+MALFORMED_LINES = [
+    b'{"pain_areas": [',
+    b'{"pain_areas": [], "other_symptoms": ["\xff"]}',
+    b"[" * 100_000 + b"]" * 100_000,
+    b'{"pain_areas": [], "other_symptoms": [], "fatigue": "high", "waking_unrefreshed": 0, '
+    b'"cognitive_symptoms": 0}',
+]
+
+def write_answers(path, rows, seed):
+    """Write random raw answers as JSONL; returns the number of malformed lines"""
+    cohort = random_cohort(rows, seed)
+    pain_areas = np.array(PAIN_AREAS, dtype=object)
+    symptoms = np.array(OTHER_SYMPTOMS, dtype=object)
+    malformed = 0
+    with open(path, "wb") as f:
+        for i in range(rows):
+            if i % 1000 == 999:
+                f.write(MALFORMED_LINES[malformed % len(MALFORMED_LINES)] + b"\n")
+                malformed += 1
+                continue
+            f.write((json.dumps({
+                "assessment_date": "2024-01-01 09:00:00",
+                "pain_areas": list(pain_areas[cohort["pain_flags"][i]]),
+                "other_symptoms": list(symptoms[cohort["symptom_flags"][i]]),
+                "fatigue": int(cohort["fatigue"][i]),
+                "waking_unrefreshed": int(cohort["waking"][i]),
+                "cognitive_symptoms": int(cohort["cognitive"][i])
+            }) + "\n").encode("utf-8"))
+    return malformed
+
+def same_file(path_a, path_b):
+    with open(path_a, "rb") as a, open(path_b, "rb") as b:
+        while True:
+            block_a, block_b = a.read(1 << 20), b.read(1 << 20)
+            if block_a != block_b:
+                return False
+            if not block_a:
+                return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="fibro-bench-") as tmp_dir:
+        input_path = os.path.join(tmp_dir, "answers.jsonl")
+        malformed = write_answers(input_path, args.rows, args.seed)
+        print(f"input: {args.rows:,} rows, {os.path.getsize(input_path) / 1e6:.1f} MB, "
+              f"{os.cpu_count()} CPUs")
+
+        single_path = os.path.join(tmp_dir, "single.jsonl")
+        rejects = RejectWriter(os.path.join(tmp_dir, "single.rejects"))
+        start = time.perf_counter()
+        with open(input_path, "rb") as input_stream, \
+                open(single_path, "w", encoding="utf-8", newline="") as output_stream:
+            stats = score_stream(input_stream, output_stream, rejects)
+        baseline = time.perf_counter() - start
+        rejects.close()
+        print(f"{'single process':>16}: {baseline:7.2f}s {args.rows / baseline:>10,.0f} rows/s  "
+              f"{stats.rejected:,} rejected")
+        identical = stats.rejected == malformed
+        if not identical:
+            print(f"expected {malformed:,} rejected lines")
+
+        # 1, 2, 4, ... up to and including max_workers
+        worker_counts = sorted({args.max_workers} | {
+            1 << i for i in range(args.max_workers.bit_length()) if 1 << i <= args.max_workers
+        })
+        for workers in worker_counts:
+            output_path = os.path.join(tmp_dir, f"parallel-{workers}.jsonl")
+            start = time.perf_counter()
+            score_file_parallel(input_path, output_path, os.path.join(tmp_dir, "parallel.rejects"),
+                                workers)
+            seconds = time.perf_counter() - start
+            same = (same_file(single_path, output_path)
+                    and same_file(rejects.path, os.path.join(tmp_dir, "parallel.rejects")))
+            identical = identical and same
+            print(f"{f'{workers} workers':>16}: {seconds:7.2f}s {args.rows / seconds:>10,.0f} rows/s "
+                  f"speedup {baseline / seconds:5.2f}x  {'identical' if same else 'DIFFERENT'}")
+            os.remove(output_path)
+
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
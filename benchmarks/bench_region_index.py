@@ -0,0 +1,78 @@
+"""Check and time the region index.
+
+Usage:
+    python benchmarks/bench_region_index.py
+
+Walks all 2^19 pain area subsets and compares ``region_counts`` with the
+list-membership summary and substring-based pie grouping the app used before.
+Exits non-zero on any mismatch. (The criteria outcome of every (WPI, SS)
+pair is checked by bench_criteria.py.)
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_scoring import PAIN_AREAS, BODY_REGIONS  # noqa: E402
+from fibromyalgia_record import PAIN_MASK_ALL, decode_mask, region_counts  # noqa: E402
+
+# Pie categories in the order the app draws them, as indexes into BODY_REGIONS
+PIE_REGIONS = [1, 3, 2, 0]
+
+
+def legacy_summary_counts(selected_pain_areas):
+    """Region counts as the form summary used to compute them"""
+    return tuple(
+        sum(1 for area in areas if area in selected_pain_areas)
+        for areas in BODY_REGIONS.values()
+    )
+
+def legacy_pie_counts(selected_pain_areas):
+    """Pie categories as the results chart used to compute them"""
+    pain_categories = {
+        'Upper Body': 0, 'Lower Body': 0, 'Core': 0, 'Head/Neck': 0
+    }
+    for area in selected_pain_areas:
+        if 'arm' in area.lower() or 'shoulder' in area.lower():
+            pain_categories['Upper Body'] += 1
+        elif 'leg' in area.lower() or 'hip' in area.lower():
+            pain_categories['Lower Body'] += 1
+        elif 'chest' in area.lower() or 'abdomen' in area.lower() or 'back' in area.lower():
+            pain_categories['Core'] += 1
+        elif 'jaw' in area.lower() or 'neck' in area.lower():
+            pain_categories['Head/Neck'] += 1
+    return tuple(pain_categories.values())
+
+def main():
+    subsets = range(PAIN_MASK_ALL + 1)
+    label_lists = [decode_mask(mask, PAIN_AREAS) for mask in subsets]
+
+    start = time.perf_counter()
+    legacy_summary = [legacy_summary_counts(labels) for labels in label_lists]
+    legacy_pie = [legacy_pie_counts(labels) for labels in label_lists]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [region_counts(mask) for mask in subsets]
+    indexed_seconds = time.perf_counter() - start
+
+    mismatches = 0
+    for mask, counts, summary, pie in zip(subsets, indexed, legacy_summary, legacy_pie):
+        if counts != summary or tuple(counts[r] for r in PIE_REGIONS) != pie:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"region mismatch for mask {mask:#07x}: {counts} {summary} {pie}", file=sys.stderr)
+
+
+    print(f"subsets checked:   {len(subsets):,}")
+    print(f"list/substring:    {legacy_seconds:.3f}s")
+    print(f"region masks:      {indexed_seconds:.3f}s")
+    print(f"speedup:           {legacy_seconds / indexed_seconds:.1f}x")
+    print(f"mismatches:        {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
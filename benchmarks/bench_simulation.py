@@ -0,0 +1,113 @@
+"""Check the simulation's lookup tables and measure its throughput.
+
+Usage:
+    python benchmarks/bench_simulation.py --respondents 5000000 --max-workers 8
+
+First checks ``respondent_stability`` against brute force for a sample of
+respondents. Every single-answer change (each pain area and symptom
+toggled, each severity moved one level) is applied to the actual answers,
+rescored with the scalar functions, and counted if the result flips. The
+distance tables are also compared with the nearest state of the other
+result found by exhaustive search. Then simulates ``--respondents``
+answers with 1, 2, 4 ... ``--max-workers`` processes, reports respondents
+per second and checks every summary matches the single-process one.
+Exits non-zero on any mismatch.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_scoring import (  # noqa: E402
+    PAIN_AREAS, OTHER_SYMPTOMS, MAX_SEVERITY,
+    calculate_ss_score_2a, calculate_ss_score_2b, evaluate_diagnostic_criteria
+)
+from fibromyalgia_simulation import (  # noqa: E402
+    DISTRIBUTIONS, draw_respondents, respondent_stability, simulate, state_tables
+)
+
+
+def meets(pain_flags, severities, symptom_flags):
+    ss = calculate_ss_score_2a(*severities) + calculate_ss_score_2b(int(symptom_flags.sum()))
+    return evaluate_diagnostic_criteria(int(pain_flags.sum()), ss)
+
+def brute_force_flips(pain_flags, severities, symptom_flags):
+    """(pain_area, severity, symptom) flip probabilities by rescoring every change"""
+    result = meets(pain_flags, severities, symptom_flags)
+    pain = []
+    for i in range(len(PAIN_AREAS)):
+        changed = pain_flags.copy()
+        changed[i] = not changed[i]
+        pain.append(meets(changed, severities, symptom_flags) != result)
+    severity = []
+    for i in range(3):
+        for step in (1, -1):
+            if 0 <= severities[i] + step <= MAX_SEVERITY:
+                changed = list(severities)
+                changed[i] += step
+                severity.append(meets(pain_flags, changed, symptom_flags) != result)
+    symptom = []
+    for i in range(len(OTHER_SYMPTOMS)):
+        changed = symptom_flags.copy()
+        changed[i] = not changed[i]
+        symptom.append(meets(pain_flags, severities, changed) != result)
+    return np.mean(pain), np.mean(severity), np.mean(symptom)
+
+def check_tables(samples, seed):
+    mismatches = 0
+    rng = np.random.default_rng(seed)
+    pain_flags, severities, symptom_flags = draw_respondents(DISTRIBUTIONS["mixed"], samples, rng)
+    stability = respondent_stability(pain_flags, severities, symptom_flags)
+    for i in range(samples):
+        expected = brute_force_flips(pain_flags[i], [int(s) for s in severities[i]], symptom_flags[i])
+        actual = (stability["pain_area"][i], stability["severity"][i], stability["symptom"][i])
+        mismatches += not np.allclose(expected, actual)
+
+    # Distance: L1 to the nearest (WPI, SS 2a, symptom count) with the other result
+    tables = state_tables()
+    states = np.argwhere(np.ones_like(tables["meets"]))
+    flat_meets = tables["meets"].ravel()
+    for state, result, distance in zip(states, flat_meets, tables["distance"].ravel()):
+        others = states[flat_meets != result]
+        mismatches += np.abs(others - state).sum(axis=1).min() != distance
+    print(f"checked {samples:,} respondents against brute force and {len(states):,} distances: "
+          f"{mismatches} mismatches")
+    return mismatches
+
+def same_summary(a, b):
+    return (a.respondents == b.respondents and a.meets == b.meets
+            and np.array_equal(a.distance_counts, b.distance_counts)
+            and all(np.allclose(a.flip_sums[kind], b.flip_sums[kind]) for kind in a.flip_sums))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--respondents", type=int, default=2_000_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--distribution", default="mixed", choices=list(DISTRIBUTIONS))
+    parser.add_argument("--checked", type=int, default=2_000, help="respondents checked by brute force")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    mismatches = check_tables(args.checked, args.seed)
+
+    workers, single = 1, None
+    print(f"{'workers':>7} {'seconds':>8} {'respondents/s':>14} {'speedup':>8}")
+    while workers <= args.max_workers:
+        summary = simulate(args.distribution, args.respondents, workers, seed=args.seed)
+        if single is None:
+            single = summary
+        elif not same_summary(single, summary):
+            print(f"{workers} workers: summary differs from the single-process run")
+            mismatches += 1
+        print(f"{workers:>7} {summary.seconds:>8.2f} {summary.throughput:>14,.0f} "
+              f"{single.seconds / summary.seconds:>7.1f}x")
+        workers *= 2
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
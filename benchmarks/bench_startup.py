@@ -0,0 +1,106 @@
+"""Startup-time and memory budget for the app module.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --import-budget-ms 600 --rss-budget-mb 80
+
+Imports ``fibromyalgia_app`` in fresh interpreters with ``-X importtime``
+and reports the cumulative import time (best of ``--runs``), the resident
+memory after import, and the slowest imports. Exits non-zero if either
+budget is exceeded, or if a module that should only load once results are
+shown (pandas, plotly.express) is imported at startup.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+MODULE = "fibromyalgia_app"
+
+# Defaults leave headroom over a typical laptop; tighten them per machine
+IMPORT_BUDGET_MS = 800
+RSS_BUDGET_MB = 100
+
+# Modules the form must not need
+DEFERRED_MODULES = ["pandas", "plotly.express"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+PROBE = """
+import resource, sys
+import {module}
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss is in bytes on macOS and kilobytes elsewhere
+print(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024)
+print(",".join(name for name in {deferred!r} if name in sys.modules))
+"""
+
+
+def measure_once(module):
+    """Import module in a fresh interpreter.
+
+    Returns (import_ms, rss_mb, loaded deferred modules, [(us, name)] for
+    the module's direct imports).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    # importtime lists children before their parent, one extra space per level
+    children = []
+    timings = []
+    import_us = None
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        if len(indent) == 1:
+            if name == module:
+                import_us = int(cumulative_us)
+                timings = children
+            children = []
+        elif len(indent) == 3:
+            children.append((int(cumulative_us), name))
+    rss_line, loaded_line = result.stdout.splitlines()[-2:]
+    loaded = [name for name in loaded_line.split(",") if name]
+    return import_us / 1000, float(rss_line), loaded, timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float,
+                        default=float(os.environ.get("FIBRO_IMPORT_BUDGET_MS", IMPORT_BUDGET_MS)))
+    parser.add_argument("--rss-budget-mb", type=float,
+                        default=float(os.environ.get("FIBRO_RSS_BUDGET_MB", RSS_BUDGET_MB)))
+    parser.add_argument("--top", type=int, default=8, help="number of slowest imports to list")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once(MODULE) for _ in range(args.runs)]
+    import_ms, rss_mb, loaded, timings = min(runs, key=lambda run: run[0])
+
+    print(f"{MODULE} import: {import_ms:.0f} ms (best of {args.runs}, budget {args.import_budget_ms:.0f} ms)")
+    print(f"RSS after import: {rss_mb:.1f} MB (budget {args.rss_budget_mb:.0f} MB)")
+    print(f"slowest imports made by {MODULE}:")
+    for cumulative_us, name in sorted(timings, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import time {import_ms:.0f} ms is over the {args.import_budget_ms:.0f} ms budget")
+    if rss_mb > args.rss_budget_mb:
+        failures.append(f"RSS {rss_mb:.1f} MB is over the {args.rss_budget_mb:.0f} MB budget")
+    if loaded:
+        failures.append(f"deferred modules imported at startup: {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Insert and query throughput of the assessment store.
+
+Usage:
+    python benchmarks/bench_store.py --rows 1000000
+
+Submits random assessments through the background group-commit writer (and
+through ``insert_many``), then times the indexed queries the app and reports
+use, and reading the cohort aggregates against a full-table GROUP BY. The database lives in a temporary directory unless ``--path`` is given.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_record import AssessmentRecord, PAIN_MASK_ALL, SYMPTOM_MASK_ALL  # noqa: E402
+from fibromyalgia_store import AssessmentStore  # noqa: E402
+
+
+def random_records(rows, seed):
+    """Yield random records spread over two years of dates"""
+    rng = np.random.default_rng(seed)
+    chunk = 100_000
+    start = np.datetime64("2023-01-01T00:00:00")
+    for offset in range(0, rows, chunk):
+        n = min(chunk, rows - offset)
+        pain = rng.integers(0, PAIN_MASK_ALL + 1, n)
+        symptoms = rng.integers(0, SYMPTOM_MASK_ALL + 1, n, dtype=np.int64)
+        severities = rng.integers(0, 4, (n, 3))
+        dates = start + rng.integers(0, 730 * 86400, n).astype("timedelta64[s]")
+        for i in range(n):
+            yield AssessmentRecord(int(pain[i]), int(symptoms[i]), *map(int, severities[i]),
+                                   assessment_date=str(dates[i]).replace("T", " "))
+
+def store_scan(path):
+    """The WPI x SS histogram computed from the assessments table"""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT wpi_score, total_ss_score, COUNT(*) FROM assessments "
+                            "GROUP BY wpi_score, total_ss_score").fetchall()
+    finally:
+        conn.close()
+
+def timed(label, func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    print(f"  {label:<44} {best * 1000:9.1f} ms  -> {result:,}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--path", help="database file (default: temporary)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="fibro-store-") as tmp_dir:
+        path = args.path or os.path.join(tmp_dir, "assessments.db")
+        store = AssessmentStore(path)
+
+        # Background writer, as used by the app
+        records = list(random_records(args.rows // 2, args.seed))
+        start = time.perf_counter()
+        for record in records:
+            store.submit(record)
+        queued = time.perf_counter() - start
+        store.flush()
+        written = time.perf_counter() - start
+        print(f"submit():      {len(records):,} rows, {queued / len(records) * 1e6:.1f} us per submit call, "
+              f"{len(records) / written:,.0f} rows/s committed")
+        del records
+
+        # Synchronous bulk path
+        rest = args.rows - args.rows // 2
+        start = time.perf_counter()
+        store.insert_many(random_records(rest, args.seed + 1))
+        seconds = time.perf_counter() - start
+        print(f"insert_many(): {rest:,} rows, {rest / seconds:,.0f} rows/s")
+        print(f"database:      {os.path.getsize(path) / 1e6:.0f} MB for {store.count():,} rows")
+
+        print("queries:")
+        timed("count(meets_criteria=True)", lambda: store.count(meets_criteria=True))
+        timed("count(one month)",
+              lambda: store.count(date_from="2024-03-01", date_to="2024-04-01"))
+        timed("count(wpi_min=15, ss_min=11)", lambda: store.count(wpi_min=15, ss_min=11))
+        timed("query(one day) -> records",
+              lambda: sum(1 for _ in store.query(date_from="2024-03-01", date_to="2024-03-02")))
+        timed("query(meets, newest_first, limit=100)",
+              lambda: sum(1 for _ in store.query(meets_criteria=True, newest_first=True, limit=100)))
+        timed("aggregates() -> total", lambda: store.aggregates().total)
+        timed("full scan: WPI x SS GROUP BY -> groups", lambda: len(list(store_scan(path))))
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
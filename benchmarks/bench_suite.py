@@ -0,0 +1,376 @@
+"""Benchmark suite with JSON results and a baseline comparison.
+
+Usage:
+    python benchmarks/bench_suite.py                      # run, compare with baseline.json
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --save-baseline      # record a new baseline
+    python benchmarks/bench_suite.py --cases scoring.* --tolerance 0.5
+
+Cases:
+
+- ``scoring.*``: the scalar scoring functions over their whole input domain
+  (every pain area subset, symptom count and WPI/SS pair) and the batch
+  functions over every pain area subset and a random cohort
+- ``criteria.*``: every criteria set of fibromyalgia_criteria over a
+  random cohort in one pass
+- ``app.*``: reruns of the whole script through Streamlit's AppTest harness
+  for a checkbox toggle, a form submission, a results-page rerun and
+  "Start New Assessment", plus a rerun of just the export fragment (what
+  a download click executes)
+- ``export.*``: the JSON download, the app's ``export_files`` (both
+  downloads, as the results page builds them), and a bulk CSV export
+- ``upload.*``: scoring a 10,000-row raw-answer CSV upload
+
+Each case reports the best, median and p95 time per operation in
+microseconds. With a baseline, a case whose best time is more than
+``--tolerance`` slower than the baseline's is a regression and the exit
+status is 1; the best run is the least disturbed by other load, so it is
+what gets compared. Baselines are
+only comparable on the machine that recorded them.
+"""
+
+import argparse
+import fnmatch
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from itertools import product
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_scoring import (  # noqa: E402
+    PAIN_AREAS, OTHER_SYMPTOMS, MAX_WPI_SCORE, MAX_SS_SCORE, MAX_SEVERITY,
+    calculate_wpi_score, calculate_ss_score_2a, calculate_ss_score_2b,
+    evaluate_diagnostic_criteria
+)
+from fibromyalgia_batch import batch_wpi_score, score_batch  # noqa: E402
+from fibromyalgia_record import AssessmentRecord, PAIN_MASK_ALL  # noqa: E402
+from bench_batch_scoring import random_cohort  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(BENCH_DIR, "..", "fibromyalgia_app.py")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Allowed slowdown of a case's best time before it counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+
+def timed_runs(func, repeat, ops=1):
+    """Run func repeat times; returns seconds per op for each run"""
+    runs = []
+    # Like timeit, keep garbage left by earlier cases out of the timings
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            runs.append((time.perf_counter() - start) / ops)
+    finally:
+        gc.enable()
+    return runs
+
+def all_pain_area_lists():
+    """Selected pain area labels for every subset of PAIN_AREAS"""
+    return [[area for bit, area in enumerate(PAIN_AREAS) if mask >> bit & 1]
+            for mask in range(PAIN_MASK_ALL + 1)]
+
+
+def case_wpi_score(repeat):
+    lists = all_pain_area_lists()
+    return timed_runs(lambda: [calculate_wpi_score(areas) for areas in lists], repeat, len(lists))
+
+def case_ss_score_2a(repeat):
+    domain = list(product(range(MAX_SEVERITY + 1), repeat=3)) * 1000
+    return timed_runs(lambda: [calculate_ss_score_2a(*answers) for answers in domain], repeat, len(domain))
+
+def case_ss_score_2b(repeat):
+    domain = list(range(len(OTHER_SYMPTOMS) + 1)) * 1000
+    return timed_runs(lambda: [calculate_ss_score_2b(count) for count in domain], repeat, len(domain))
+
+def case_diagnostic_criteria(repeat):
+    domain = list(product(range(MAX_WPI_SCORE + 1), range(MAX_SS_SCORE + 1))) * 200
+    return timed_runs(lambda: [evaluate_diagnostic_criteria(wpi, ss) for wpi, ss in domain],
+                      repeat, len(domain))
+
+def case_batch_wpi_score(repeat):
+    import numpy as np
+    masks = np.arange(PAIN_MASK_ALL + 1)
+    flags = (masks[:, None] >> np.arange(len(PAIN_AREAS))) & 1 == 1
+    return timed_runs(lambda: batch_wpi_score(flags), repeat, len(flags))
+
+def case_score_batch(repeat):
+    cohort = random_cohort(100_000, seed=0)
+    return timed_runs(lambda: score_batch(**cohort), repeat, 100_000)
+
+def case_criteria_evaluate_all(repeat):
+    import numpy as np
+    from fibromyalgia_criteria import default_criteria
+    cohort = random_cohort(100_000, seed=0)
+    pain_masks = cohort["pain_flags"].astype(np.int64) @ (1 << np.arange(len(PAIN_AREAS), dtype=np.int64))
+    symptom_masks = cohort["symptom_flags"].astype(np.int64) @ (1 << np.arange(len(OTHER_SYMPTOMS), dtype=np.int64))
+    criteria = default_criteria()
+    return timed_runs(lambda: criteria.evaluate(pain_masks, symptom_masks, cohort["fatigue"],
+                                                cohort["waking"], cohort["cognitive"]),
+                      repeat, 100_000)
+
+
+def _app_test():
+    # Keep the suite from writing assessments to the app's database
+    os.environ["FIBRO_STORE_PATH"] = ""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.run()
+    # Widget label and deprecation warnings would otherwise print on every rerun
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+    if at.exception:
+        raise RuntimeError(f"app raised: {at.exception[0].message}")
+    return at
+
+def _submit(at):
+    at.button[0].click().run()
+
+def case_app_toggle(repeat):
+    at = _app_test()
+    checkbox = "pain_0"
+
+    def toggle():
+        at.checkbox(key=checkbox).set_value(not at.checkbox(key=checkbox).value).run()
+    return timed_runs(toggle, repeat)
+
+def case_app_submit(repeat):
+    at = _app_test()
+    for key in ("pain_0", "pain_3", "pain_7", "symptom_2", "symptom_5"):
+        at.checkbox(key=key).check()
+    at.run()
+    return timed_runs(lambda: _submit(at), repeat)
+
+def case_app_results_rerun(repeat):
+    at = _app_test()
+    at.checkbox(key="pain_0").check()
+    _submit(at)
+    return timed_runs(at.run, repeat)
+
+def case_app_new_assessment(repeat):
+    at = _app_test()
+
+    def new_assessment():
+        at.checkbox(key="pain_0").check()
+        _submit(at)
+        start = time.perf_counter()
+        at.button[1].click().run()
+        return time.perf_counter() - start
+    return [new_assessment() for _ in range(repeat)]
+
+def _export_fragment_script():
+    from fibromyalgia_app import show_export
+    from fibromyalgia_record import AssessmentRecord
+    show_export(AssessmentRecord(0b1011, 0b111, 2, 1, 3, assessment_date="2024-01-01 12:00:00"))
+
+def case_app_export_fragment(repeat):
+    # AppTest cannot click download buttons; a click reruns just this fragment
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_function(_export_fragment_script, default_timeout=60)
+    at.run()
+    return timed_runs(at.run, repeat)
+
+
+def _sample_record():
+    return AssessmentRecord.from_labels(
+        PAIN_AREAS[:8], OTHER_SYMPTOMS[:12], 2, 1, 3, assessment_date="2024-01-01 12:00:00"
+    )
+
+def case_export_json(repeat):
+    record = _sample_record()
+    return timed_runs(lambda: [json.dumps(record.to_export_dict(), indent=2) for _ in range(100)],
+                      repeat, 100)
+
+def case_export_csv(repeat):
+    from fibromyalgia_app import export_files
+    record = _sample_record()
+    # The results page's download path, which builds the JSON and CSV together
+    export_files(record)
+    return timed_runs(lambda: export_files(record), repeat)
+
+def case_export_bulk_csv(repeat):
+    from fibromyalgia_export import iter_export
+    cohort = random_cohort(10_000, seed=1)
+    records = [
+        AssessmentRecord(
+            sum(1 << bit for bit, flag in enumerate(pain) if flag),
+            sum(1 << bit for bit, flag in enumerate(symptoms) if flag),
+            int(fatigue), int(waking), int(cognitive)
+        )
+        for pain, symptoms, fatigue, waking, cognitive in zip(
+            cohort["pain_flags"], cohort["symptom_flags"],
+            cohort["fatigue"], cohort["waking"], cohort["cognitive"])
+    ]
+    return timed_runs(lambda: sum(len(chunk) for chunk in iter_export(records, "csv")),
+                      repeat, len(records))
+
+def case_upload_score_csv(repeat):
+    import io
+    from fibromyalgia_cli import REQUIRED_CSV_COLUMNS
+    from fibromyalgia_upload import iter_scored_chunks
+    cohort = random_cohort(10_000, seed=2)
+    lines = [",".join(f'"{column}"' for column in REQUIRED_CSV_COLUMNS)]
+    for pain, symptoms, fatigue, waking, cognitive in zip(
+            cohort["pain_flags"], cohort["symptom_flags"],
+            cohort["fatigue"], cohort["waking"], cohort["cognitive"]):
+        flags = ["yes" if flag else "" for flag in list(pain) + list(symptoms)]
+        lines.append(",".join(flags + [str(fatigue), str(waking), str(cognitive)]))
+    data = ("\n".join(lines) + "\n").encode("utf-8")
+    return timed_runs(lambda: sum(len(scored) for scored, _, _ in
+                                  iter_scored_chunks(io.BytesIO(data), "csv")),
+                      repeat, len(cohort["fatigue"]))
+
+
+# name -> (function, default repeats)
+CASES = {
+    "scoring.calculate_wpi_score": (case_wpi_score, 5),
+    "scoring.calculate_ss_score_2a": (case_ss_score_2a, 5),
+    "scoring.calculate_ss_score_2b": (case_ss_score_2b, 5),
+    "scoring.evaluate_diagnostic_criteria": (case_diagnostic_criteria, 5),
+    "scoring.batch_wpi_score": (case_batch_wpi_score, 5),
+    "scoring.score_batch": (case_score_batch, 5),
+    "criteria.evaluate_all": (case_criteria_evaluate_all, 5),
+    "app.checkbox_toggle": (case_app_toggle, 20),
+    "app.form_submit": (case_app_submit, 20),
+    "app.results_rerun": (case_app_results_rerun, 20),
+    "app.new_assessment": (case_app_new_assessment, 10),
+    "app.export_fragment": (case_app_export_fragment, 20),
+    "export.json_download": (case_export_json, 20),
+    "export.csv_download": (case_export_csv, 20),
+    "export.bulk_csv": (case_export_bulk_csv, 5),
+    "upload.score_csv": (case_upload_score_csv, 5),
+}
+
+def summarize(runs):
+    runs_us = sorted(seconds * 1e6 for seconds in runs)
+    return {
+        "min_us": runs_us[0],
+        "median_us": statistics.median(runs_us),
+        "p95_us": runs_us[min(len(runs_us) - 1, round(0.95 * (len(runs_us) - 1)))],
+        "runs": len(runs_us),
+    }
+
+def run_case(name, repeat):
+    """Run one case in a fresh interpreter so earlier cases cannot skew it"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name, str(repeat)],
+        stdout=subprocess.PIPE, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+def run_suite(patterns, repeat_scale=1.0):
+    results = {}
+    for name, (_, repeat) in CASES.items():
+        if not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            continue
+        results[name] = run_case(name, max(1, round(repeat * repeat_scale)))
+        print(f"  {name:<40} {results[name]['min_us']:>12.3f} us/op best, "
+              f"{results[name]['median_us']:.3f} median", file=sys.stderr)
+    return results
+
+def compare(results, baseline, tolerance):
+    """Return {case: ratio to baseline} and the names of regressed cases"""
+    ratios = {}
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        ratios[name] = result["min_us"] / base["min_us"]
+        if ratios[name] > 1 + tolerance:
+            regressions.append(name)
+    return ratios, regressions
+
+def environment():
+    import numpy
+    import streamlit
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": numpy.__version__,
+        "streamlit": streamlit.__version__,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", default=["*"], help="glob patterns of cases to run")
+    parser.add_argument("--output", help="write the results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--tolerance", type=float,
+                        default=float(os.environ.get("FIBRO_BENCH_TOLERANCE", DEFAULT_TOLERANCE)),
+                        help="allowed slowdown, 0.25 = 25%% (default: %(default)s)")
+    parser.add_argument("--repeat-scale", type=float, default=1.0, help="multiply every case's repeats")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        name, repeat = args.child
+        print(json.dumps(summarize(CASES[name][0](int(repeat)))))
+        return 0
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+
+    results = run_suite(args.cases, args.repeat_scale)
+    if not results:
+        parser.error(f"no case matches {' '.join(args.cases)}")
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "results": results,
+    }
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as stream:
+            json.dump(report, stream, indent=2)
+            stream.write("\n")
+        print(f"baseline written to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as stream:
+            baseline = json.load(stream)
+        ratios, regressions = compare(results, baseline, args.tolerance)
+        report["baseline"] = {
+            "path": args.baseline,
+            "created": baseline.get("created"),
+            "tolerance": args.tolerance,
+            "ratios": ratios,
+            "regressions": regressions,
+        }
+        if baseline.get("environment") != report["environment"]:
+            print("warning: baseline was recorded in a different environment", file=sys.stderr)
+        for name, ratio in ratios.items():
+            flag = "REGRESSION" if name in regressions else ""
+            print(f"  {name:<40} {ratio:>6.2f}x baseline {flag}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as stream:
+            stream.write(text + "\n")
+    else:
+        print(text)
+
+    for name in regressions:
+        print(f"FAIL: {name} is {report['baseline']['ratios'][name]:.2f}x its baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
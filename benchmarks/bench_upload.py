@@ -0,0 +1,115 @@
+"""Check bulk upload scoring against the command-line scorer and time both.
+
+Usage:
+    python benchmarks/bench_upload.py --rows 100000
+
+Writes a raw-answer CSV where a share of the rows are malformed: a cell too
+many, a cell too few, a yes/no cell that is not one, or a severity that is
+not a number. Scores it with ``fibromyalgia_upload.iter_scored_chunks``
+and with the command-line scorer's ``score_stream``, checks both reject
+the same rows and agree on every score of the others, and reports rows per
+second for each. Exits non-zero on any mismatch.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fibromyalgia_cli import REQUIRED_CSV_COLUMNS, score_stream  # noqa: E402
+from fibromyalgia_upload import concat_chunks, iter_scored_chunks, SCORED_COLUMNS  # noqa: E402
+from bench_batch_scoring import random_cohort  # noqa: E402
+
+COMPARED_FIELDS = ["wpi_score", "ss_2a_score", "ss_2b_score", "total_ss_score",
+                   "meets_diagnostic_criteria", "fatigue", "waking_unrefreshed", "cognitive_symptoms"]
+
+
+class RejectList:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line_number, raw, error):
+        self.lines.append(line_number)
+
+
+def write_csv(rows, seed):
+    """CSV bytes of random answers; returns (data, spreadsheet rows that are malformed)"""
+    cohort = random_cohort(rows, seed=seed)
+    rng = np.random.default_rng(seed)
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(REQUIRED_CSV_COLUMNS)
+    malformed = []
+    for i, (pain, symptoms, fatigue, waking, cognitive) in enumerate(zip(
+            cohort["pain_flags"], cohort["symptom_flags"],
+            cohort["fatigue"], cohort["waking"], cohort["cognitive"])):
+        cells = ["yes" if flag else "" for flag in list(pain) + list(symptoms)]
+        cells += [str(fatigue), str(waking), str(cognitive)]
+        kind = rng.random()
+        if kind < 0.01:
+            cells.append("extra")
+        elif kind < 0.02:
+            cells = cells[:int(rng.integers(1, len(cells)))]
+        elif kind < 0.03:
+            cells[int(rng.integers(len(cells) - 3))] = "maybe"
+        elif kind < 0.04:
+            cells[-1 - int(rng.integers(3))] = "two"
+        if kind < 0.04:
+            malformed.append(i + 2)
+        writer.writerow(cells)
+    return output.getvalue().encode("utf-8"), malformed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    data, malformed = write_csv(args.rows, args.seed)
+    mismatches = 0
+
+    start = time.perf_counter()
+    scored_parts, reject_parts = [], []
+    for scored, rejects, _ in iter_scored_chunks(io.BytesIO(data), "csv"):
+        scored_parts.append(scored)
+        reject_parts.append(rejects)
+    upload_seconds = time.perf_counter() - start
+    scored = concat_chunks(scored_parts, SCORED_COLUMNS)
+    rejects = concat_chunks(reject_parts, ["row", "error"])
+
+    start = time.perf_counter()
+    output, cli_rejects = io.StringIO(), RejectList()
+    score_stream(io.BytesIO(data), output, cli_rejects, input_format="csv", output_format="jsonl")
+    cli_seconds = time.perf_counter() - start
+    cli_scored = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    if rejects["row"].tolist() != malformed:
+        print(f"upload rejected {len(rejects):,} rows, expected {len(malformed):,}")
+        mismatches += 1
+    if cli_rejects.lines != malformed:
+        print(f"command-line scorer rejected {len(cli_rejects.lines):,} rows, expected {len(malformed):,}")
+        mismatches += 1
+    if len(cli_scored) != len(scored):
+        print(f"scored {len(scored):,} rows, command-line scorer {len(cli_scored):,}")
+        mismatches += 1
+    else:
+        for field in COMPARED_FIELDS:
+            expected = np.array([row[field] for row in cli_scored])
+            if not np.array_equal(scored[field].to_numpy(dtype=expected.dtype), expected):
+                print(f"{field} differs from the command-line scorer")
+                mismatches += 1
+
+    print(f"{args.rows:,} rows, {len(malformed):,} malformed: {mismatches} mismatches")
+    print(f"  upload             {upload_seconds:6.2f}s {args.rows / upload_seconds:>12,.0f} rows/s")
+    print(f"  command-line       {cli_seconds:6.2f}s {args.rows / cli_seconds:>12,.0f} rows/s")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
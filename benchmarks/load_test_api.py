@@ -0,0 +1,145 @@
+"""Local load test for the scoring API.
+
+Usage:
+    python benchmarks/load_test_api.py --concurrency 32 --requests 20000
+    python benchmarks/load_test_api.py --url http://127.0.0.1:8000 --batch-size 100
+
+Starts ``fibromyalgia_api.py`` in a subprocess (unless ``--url`` points at a
+running server), opens ``--concurrency`` keep-alive connections and sends
+random assessments to ``/score`` (or ``/score/batch`` with ``--batch-size``).
+Reports p50/p99 latency and requests per second.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from fibromyalgia_scoring import PAIN_AREAS, OTHER_SYMPTOMS  # noqa: E402
+
+
+def random_assessment(rng):
+    return {
+        "pain_areas": [area for area in PAIN_AREAS if rng.random() < 0.35],
+        "other_symptoms": [symptom for symptom in OTHER_SYMPTOMS if rng.random() < 0.25],
+        "fatigue": rng.randint(0, 3),
+        "waking_unrefreshed": rng.randint(0, 3),
+        "cognitive_symptoms": rng.randint(0, 3)
+    }
+
+def build_request(host, path, payload):
+    body = json.dumps(payload).encode("utf-8")
+    head = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed the connection")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+async def worker(host, port, requests, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request in requests:
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+async def wait_for_server(host, port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"server did not start on {host}:{port}")
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    await wait_for_server(host, port)
+
+    rng = random.Random(args.seed)
+    path = "/score/batch" if args.batch_size else "/score"
+    requests = []
+    for _ in range(args.requests):
+        if args.batch_size:
+            payload = [random_assessment(rng) for _ in range(args.batch_size)]
+        else:
+            payload = random_assessment(rng)
+        requests.append(build_request(host, path, payload))
+
+    latencies, errors = [], []
+    per_worker = [requests[i::args.concurrency] for i in range(args.concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, chunk, latencies, errors) for chunk in per_worker if chunk))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    assessments = args.requests * (args.batch_size or 1)
+    print(f"endpoint:      {path}")
+    print(f"requests:      {len(latencies):,} ({len(errors)} errors) over {args.concurrency} connections")
+    print(f"p50 latency:   {percentile(latencies, 0.50) * 1000:.2f} ms")
+    print(f"p99 latency:   {percentile(latencies, 0.99) * 1000:.2f} ms")
+    print(f"throughput:    {len(latencies) / elapsed:,.0f} requests/s "
+          f"({assessments / elapsed:,.0f} assessments/s)")
+    return 1 if errors else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="running server to test (default: start one locally)")
+    parser.add_argument("--port", type=int, default=8765, help="port for the local server")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=0, help="assessments per /score/batch call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url is None:
+        args.url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "fibromyalgia_api.py"), "--port", str(args.port)],
+            stderr=subprocess.DEVNULL
+        )
+    try:
+        return asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
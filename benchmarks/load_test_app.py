@@ -0,0 +1,272 @@
+"""Concurrent-session load test for the Streamlit app.
+
+Usage:
+    python benchmarks/load_test_app.py --sessions 10 --iterations 20
+    python benchmarks/load_test_app.py --sessions 1 5 10 25 --json capacity.json
+
+Drives N simulated patients at once through the real script with
+Streamlit's AppTest harness, one thread per session as in a Streamlit
+server. Each iteration a session ticks a random subset of the
+``pain_{i}`` and ``symptom_{i}`` checkboxes and severities, submits the
+form, builds both downloads (what a download click runs) and now and then
+starts a new assessment.
+
+AppTest sets up a process-wide runtime for each run, so runs go through a
+lock. Reruns are CPU-bound and share one GIL in a server process too, so
+the time spent waiting for the lock stands in for queueing and is included
+in the latency. Each session count runs in a fresh interpreter so memory
+freed by one level does not hide the growth of the next.
+
+Reports for each session count:
+
+- p50/p95/p99 latency of each interaction and of all reruns together
+- throughput in interactions per second
+- resident memory per session (RSS growth over a warmed-up process,
+  divided by the number of live sessions)
+- how ``st.session_state`` grows: keys and approximate bytes per session
+  after the first run, after the first submission and at the end
+
+Assessments are not written to the app's database (FIBRO_STORE_PATH="").
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+os.environ["FIBRO_STORE_PATH"] = ""
+
+from fibromyalgia_scoring import PAIN_AREA_OPTIONS, OTHER_SYMPTOMS, SEVERITY_OPTIONS  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "fibromyalgia_app.py")
+
+SEVERITY_KEYS = ["fatigue", "waking", "cognitive"]
+
+# Only one AppTest run at a time (see the module docstring)
+_RUN_LOCK = threading.Lock()
+
+
+def current_rss_mb():
+    """Resident memory now (Linux), or the peak elsewhere"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def approx_size(value, seen=None):
+    """Rough deep size in bytes of plain containers and objects with __slots__"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, seen) for item in value)
+    elif hasattr(value, "__slots__"):
+        size += sum(approx_size(getattr(value, slot), seen)
+                    for slot in value.__slots__ if hasattr(value, slot))
+    elif hasattr(value, "__dict__"):
+        size += approx_size(vars(value), seen)
+    return size
+
+def session_state_stats(at):
+    state = at.session_state.to_dict()
+    return len(state), approx_size(state)
+
+def quiet_streamlit():
+    # Widget label and deprecation warnings would otherwise print on every rerun
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+
+class Session:
+    """One simulated patient"""
+
+    def __init__(self, index, seed, reset_probability):
+        from streamlit.testing.v1 import AppTest
+        self.rng = random.Random(seed * 100_003 + index)
+        self.reset_probability = reset_probability
+        self.at = AppTest.from_file(APP_PATH, default_timeout=300)
+        self.latencies = {"first_run": [], "submit": [], "download": [], "new_assessment": []}
+        self.state_growth = []
+
+    def timed(self, name, func):
+        start = time.perf_counter()
+        with _RUN_LOCK:
+            func()
+        self.latencies[name].append(time.perf_counter() - start)
+
+    def fill_form(self):
+        at, rng = self.at, self.rng
+        pain_p, symptom_p = rng.random(), rng.random() * 0.6
+        for i in range(len(PAIN_AREA_OPTIONS)):
+            at.checkbox(key=f"pain_{i}").set_value(rng.random() < pain_p)
+        for i in range(len(OTHER_SYMPTOMS)):
+            at.checkbox(key=f"symptom_{i}").set_value(rng.random() < symptom_p)
+        for key in SEVERITY_KEYS:
+            at.radio(key=key).set_value(rng.choice(SEVERITY_OPTIONS))
+
+    def run(self, iterations):
+        from fibromyalgia_app import export_files
+        at = self.at
+        self.timed("first_run", at.run)
+        self.state_growth.append(("first run", *session_state_stats(at)))
+        for iteration in range(iterations):
+            self.fill_form()
+            self.timed("submit", lambda: at.button[0].click().run())
+            if at.exception:
+                raise RuntimeError(f"app raised: {at.exception[0].message}")
+            if iteration == 0:
+                self.state_growth.append(("first submit", *session_state_stats(at)))
+            # A download click reruns only the export fragment, which builds both files
+            record = at.session_state["assessment"]
+            self.timed("download", lambda: export_files(record))
+            if self.rng.random() < self.reset_probability:
+                self.timed("new_assessment", lambda: at.button[1].click().run())
+        self.state_growth.append(("end", *session_state_stats(at)))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))]
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "mean_ms": statistics.mean(values) * 1000 if values else float("nan"),
+    }
+
+def run_level(sessions, iterations, seed, reset_probability):
+    """Run `sessions` concurrent sessions; returns a result dict"""
+    rss_before = current_rss_mb()
+    workers = [Session(index, seed, reset_probability) for index in range(sessions)]
+    errors = []
+    start_barrier = threading.Barrier(sessions)
+
+    def work(session):
+        try:
+            start_barrier.wait()
+            session.run(iterations)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=work, args=(session,)) for session in workers]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+
+    # Sessions are still alive here, as they would be on a server
+    rss_after = current_rss_mb()
+    latencies = {name: [] for name in workers[0].latencies}
+    for session in workers:
+        for name, values in session.latencies.items():
+            latencies[name].extend(values)
+    reruns = latencies["first_run"] + latencies["submit"] + latencies["new_assessment"]
+    interactions = sum(len(values) for values in latencies.values())
+
+    growth = {}
+    for stage, *_ in workers[0].state_growth:
+        rows = [next(row for row in session.state_growth if row[0] == stage) for session in workers]
+        growth[stage] = {
+            "keys": statistics.mean(row[1] for row in rows),
+            "bytes": statistics.mean(row[2] for row in rows),
+        }
+    return {
+        "sessions": sessions,
+        "iterations": iterations,
+        "seconds": elapsed,
+        "throughput_per_s": interactions / elapsed,
+        "reruns_per_s": len(reruns) / elapsed,
+        "reruns": summarize(reruns),
+        "interactions": {name: summarize(values) for name, values in latencies.items() if values},
+        "rss_mb": {"before": rss_before, "after": rss_after,
+                   "per_session": (rss_after - rss_before) / sessions},
+        "session_state": growth,
+    }
+
+def print_level(result):
+    print(f"\n{result['sessions']} concurrent sessions x {result['iterations']} iterations "
+          f"in {result['seconds']:.1f}s: {result['throughput_per_s']:.1f} interactions/s, "
+          f"{result['reruns_per_s']:.1f} reruns/s")
+    print(f"  {'interaction':<16} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, stats in list(result["interactions"].items()) + [("all reruns", result["reruns"])]:
+        print(f"  {name:<16} {stats['count']:>6} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+    rss = result["rss_mb"]
+    print(f"  RSS: {rss['before']:.0f} -> {rss['after']:.0f} MB, {rss['per_session']:.2f} MB per session")
+    print("  session_state per session: " + ", ".join(
+        f"{stage} {stats['keys']:.0f} keys / {stats['bytes'] / 1024:.1f} KB"
+        for stage, stats in result["session_state"].items()))
+
+def run_level_process(sessions, args):
+    """Run one session count in a fresh interpreter; returns its result dict"""
+    with tempfile.TemporaryDirectory(prefix="fibro-load-") as tmp_dir:
+        path = os.path.join(tmp_dir, "result.json")
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--sessions", str(sessions),
+             "--iterations", str(args.iterations), "--reset-probability", str(args.reset_probability),
+             "--seed", str(args.seed), "--json", path],
+            check=True
+        )
+        with open(path, encoding="utf-8") as stream:
+            return json.load(stream)[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10],
+                        help="concurrent session counts to run, e.g. 1 5 10 25")
+    parser.add_argument("--iterations", type=int, default=10, help="form submissions per session")
+    parser.add_argument("--reset-probability", type=float, default=0.2,
+                        help="chance of 'Start New Assessment' after each submission")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    if len(args.sessions) == 1:
+        # Warm up imports and the shared caches so the per-session memory is only the sessions
+        warmup = Session(-1, args.seed, 0)
+        warmup.run(1)
+        quiet_streamlit()
+        del warmup
+
+    if len(args.sessions) > 1:
+        results = [run_level_process(sessions, args) for sessions in args.sessions]
+    else:
+        result = run_level(args.sessions[0], args.iterations, args.seed, args.reset_probability)
+        print_level(result)
+        results = [result]
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as stream:
+            json.dump(results, stream, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
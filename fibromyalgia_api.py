@@ -0,0 +1,303 @@
+"""Headless HTTP scoring service.
+
+Usage:
+    python fibromyalgia_api.py --host 127.0.0.1 --port 8000
+
+Endpoints (JSON in, JSON out):
+
+- ``POST /score``: one assessment with the JSON export answer fields
+  (``pain_areas``, ``other_symptoms``, ``fatigue``, ``waking_unrefreshed``,
+  ``cognitive_symptoms`` and optionally ``assessment_date``). Returns the
+  same ``export_data`` dict the app offers for download.
+- ``POST /score/batch``: a list of assessments (or ``{"assessments": [...]}``).
+  Returns ``{"results": [...]}`` in input order; an item that cannot be
+  scored becomes ``{"error": "..."}``.
+- ``GET /export``: stored assessments streamed with chunked transfer
+  encoding. Query parameters: ``format`` (csv, jsonl, arrow, parquet),
+  ``layout`` (bitmask, boolean), ``from``, ``to`` and ``meets_criteria``.
+  Reads the store at FIBRO_STORE_PATH (see fibromyalgia_store).
+- ``GET /health``: liveness check.
+
+Built on asyncio streams only, so it does not import Streamlit, Plotly or
+pandas and starts in a fraction of the app's time.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs
+
+from fibromyalgia_cli import record_from_answers
+from fibromyalgia_record import DATE_FORMAT
+from fibromyalgia_store import default_store_path, query_records
+from fibromyalgia_export import CONTENT_TYPES, iter_export
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_HEADER_LINES = 100
+MAX_BATCH_SIZE = 10_000
+
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE_TIMEOUT = 30
+
+
+class HTTPError(Exception):
+    """Error that is sent back to the client with the given status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def score_answers(data):
+    """Score one assessment and return its export dict"""
+    record = record_from_answers(data)
+    if record.assessment_date is None:
+        record.assessment_date = datetime.now().strftime(DATE_FORMAT)
+    return record.to_export_dict()
+
+def handle_health(body):
+    return {"status": "ok"}
+
+def handle_score(body):
+    try:
+        return score_answers(_parse_json(body))
+    except (ValueError, TypeError) as exc:
+        raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, str(exc)) from None
+
+def handle_batch(body):
+    data = _parse_json(body)
+    if isinstance(data, dict) and "assessments" in data:
+        data = data["assessments"]
+    if not isinstance(data, list):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "expected a list of assessments")
+    if len(data) > MAX_BATCH_SIZE:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                        f"batch is limited to {MAX_BATCH_SIZE} assessments")
+
+    results = []
+    for item in data:
+        try:
+            results.append(score_answers(item))
+        except (ValueError, TypeError) as exc:
+            results.append({"error": str(exc)})
+    return {"results": results}
+
+def handle_export(query):
+    """Return (content type, byte chunk iterator) for GET /export"""
+    path = default_store_path()
+    if not path or not os.path.exists(path):
+        raise HTTPError(HTTPStatus.NOT_FOUND, "no assessment store")
+    params = {name: values[-1] for name, values in parse_qs(query).items()}
+    meets_criteria = params.get("meets_criteria")
+    if meets_criteria is not None:
+        if meets_criteria.lower() not in ("true", "false", "1", "0"):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "meets_criteria must be true or false")
+        meets_criteria = meets_criteria.lower() in ("true", "1")
+    fmt = params.get("format", "csv")
+    try:
+        chunks = iter_export(
+            query_records(path, date_from=params.get("from"), date_to=params.get("to"),
+                          meets_criteria=meets_criteria),
+            fmt, params.get("layout", "bitmask")
+        )
+    except ValueError as exc:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, str(exc)) from None
+    return CONTENT_TYPES[fmt], chunks
+
+ROUTES = {
+    ("GET", "/health"): handle_health,
+    ("POST", "/score"): handle_score,
+    ("POST", "/score/batch"): handle_batch,
+}
+
+# Routes slow enough (about 25 ms per 1,000 assessments) to run on a worker
+# thread, so other connections are served while they score
+THREAD_ROUTES = {("POST", "/score/batch")}
+
+# Routes whose handler takes the query string and streams its response
+STREAM_ROUTES = {
+    ("GET", "/export"): handle_export,
+}
+
+def _parse_json(body):
+    try:
+        return json.loads(body)
+    except (ValueError, UnicodeDecodeError, RecursionError):
+        # RecursionError: nested too deeply for the decoder
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "request body is not valid JSON") from None
+
+def _handler_response(handler, body, keep_alive):
+    return _response(HTTPStatus.OK, handler(body), keep_alive)
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode("utf-8")
+    status = HTTPStatus(status)
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    return head.encode("latin-1") + body
+
+async def _stream_response(writer, content_type, chunks, keep_alive):
+    """Send chunks with chunked transfer encoding"""
+    head = (
+        "HTTP/1.1 200 OK\r\n"
+        f"Content-Type: {content_type}\r\n"
+        "Transfer-Encoding: chunked\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    writer.write(head.encode("latin-1"))
+    loop = asyncio.get_running_loop()
+    # SQLite connections must stay on the thread that opened them
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        try:
+            while True:
+                data = await loop.run_in_executor(executor, next, chunks, None)
+                if data is None:
+                    break
+                if data:
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    await writer.drain()
+        finally:
+            await loop.run_in_executor(executor, chunks.close)
+    writer.write(b"0\r\n\r\n")
+
+async def _read_line(reader):
+    """readline that answers a line over the stream limit with a 400"""
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        # readline reports LimitOverrunError as ValueError
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "request line or header too long") from None
+
+async def _read_request(reader):
+    """Read one request; returns (method, path, query, headers, body) or None at EOF"""
+    request_line = await _read_line(reader)
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line") from None
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await _read_line(reader)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "too many headers")
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "chunked request bodies are not supported")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "invalid Content-Length") from None
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+
+    headers[":version"] = version
+    path, _, query = target.partition("?")
+    return method.upper(), path, query, headers, body
+
+def _wants_keep_alive(headers):
+    connection = headers.get("connection", "").lower()
+    if headers.get(":version") == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+async def handle_connection(reader, writer):
+    """Serve requests on one connection until it closes"""
+    try:
+        while True:
+            try:
+                request = await asyncio.wait_for(_read_request(reader), KEEP_ALIVE_TIMEOUT)
+            except HTTPError as exc:
+                writer.write(_response(exc.status, {"error": exc.message}, keep_alive=False))
+                break
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                break
+            if request is None:
+                break
+
+            method, path, query, headers, body = request
+            keep_alive = _wants_keep_alive(headers)
+            handler = ROUTES.get((method, path))
+            stream_handler = STREAM_ROUTES.get((method, path))
+            try:
+                if stream_handler is not None:
+                    content_type, chunks = stream_handler(query)
+                    try:
+                        await _stream_response(writer, content_type, chunks, keep_alive)
+                    except ConnectionError:
+                        raise
+                    except Exception as exc:
+                        # Headers are already sent; all we can do is cut the response short
+                        print(f"error streaming {method} {path}: {exc!r}", file=sys.stderr)
+                        break
+                    await writer.drain()
+                    if not keep_alive:
+                        break
+                    continue
+                if handler is None:
+                    if any(route_path == path for _, route_path in list(ROUTES) + list(STREAM_ROUTES)):
+                        raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {path}")
+                    raise HTTPError(HTTPStatus.NOT_FOUND, f"no route for {path}")
+                if (method, path) in THREAD_ROUTES:
+                    response = await asyncio.get_running_loop().run_in_executor(
+                        None, _handler_response, handler, body, keep_alive)
+                else:
+                    response = _handler_response(handler, body, keep_alive)
+            except HTTPError as exc:
+                response = _response(exc.status, {"error": exc.message}, keep_alive)
+            except Exception as exc:
+                print(f"error handling {method} {path}: {exc!r}", file=sys.stderr)
+                response = _response(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"},
+                                     keep_alive)
+
+            writer.write(response)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(host="127.0.0.1", port=8000):
+    server = await asyncio.start_server(handle_connection, host, port)
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"Fibromyalgia scoring API listening on {addresses}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the fibromyalgia scoring API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
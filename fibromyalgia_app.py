@@ -1,93 +1,303 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
 from datetime import datetime
 import json
+import sys
+import uuid
 
-# Page configuration
-st.set_page_config(
-    page_title="Fibromyalgia Diagnostic Assessment",
-    page_icon="🏥",
-    layout="wide",
-    initial_sidebar_state="expanded"
+from fibromyalgia_scoring import (
+    NONE_OF_THESE_AREAS, PAIN_AREAS, PAIN_AREA_OPTIONS, OTHER_SYMPTOMS, SEVERITY_OPTIONS
+)
+# Defined here before they moved to fibromyalgia_scoring; kept importable from the app
+from fibromyalgia_scoring import (  # noqa: F401
+    calculate_wpi_score, calculate_ss_score_2a, calculate_ss_score_2b, evaluate_diagnostic_criteria
+)
+from fibromyalgia_record import AssessmentRecord, DATE_FORMAT, REGION_SIZES, decode_mask, region_counts
+from fibromyalgia_charts import scores_figure, pain_figure, patient_trend_figure
+from fibromyalgia_store import open_default_store, clean_patient_id
+from fibromyalgia_criteria import PRIMARY_CRITERIA, default_criteria, breakdown_markdown
+from fibromyalgia_metrics import (
+    ENABLED as METRICS_ENABLED, PROFILING_ENABLED,
+    phase, timed, count_submission, touch_session, profiled, start_exporters
 )
 
-# Custom CSS for styling
-st.markdown("""
-<style>
-    .main-header {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 2rem;
-        border-radius: 10px;
-        text-align: center;
-        color: white;
-        margin-bottom: 2rem;
-    }
-    .score-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border-left: 5px solid #667eea;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-    }
-    .diagnostic-result {
-        padding: 2rem;
-        border-radius: 10px;
-        text-align: center;
-        font-size: 1.2em;
-        font-weight: bold;
-    }
-    .meets-criteria {
-        background: linear-gradient(135deg, #ff9a9e 0%, #fecfef 100%);
-        border: 2px solid #ff6b6b;
-    }
-    .not-meets-criteria {
-        background: linear-gradient(135deg, #a8edea 0%, #fed6e3 100%);
-        border: 2px solid #4ecdc4;
-    }
-    .body-diagram {
-        border: 2px solid #ddd;
-        border-radius: 10px;
-        padding: 1rem;
-        background: white;
-    }
-    .stCheckbox > label {
-        font-size: 14px !important;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-def calculate_wpi_score(pain_areas):
-    """Calculate Widespread Pain Index score"""
-    return len([area for area in pain_areas if area != "None of these areas"])
-
-def calculate_ss_score_2a(fatigue, waking, cognitive):
-    """Calculate Symptom Severity Score Part 2a"""
-    return fatigue + waking + cognitive
-
-def calculate_ss_score_2b(symptoms_count):
-    """Calculate Symptom Severity Score Part 2b based on symptom count"""
-    if symptoms_count == 0:
-        return 0
-    elif 1 <= symptoms_count <= 10:
-        return 1
-    elif 11 <= symptoms_count <= 24:
-        return 2
-    else:
-        return 3
+# Summary headings for each body region, in REGION_NAMES order
+REGION_HEADINGS = ["🧠 Head/Neck", "💪 Arms & Shoulders", "🫁 Torso", "🦵 Hips & Legs"]
 
-def evaluate_diagnostic_criteria(wpi_score, ss_score):
-    """Evaluate if patient meets fibromyalgia diagnostic criteria"""
-    # Criterion 1a: WPI ≥ 7 AND SS ≥ 5
-    criterion_1a = wpi_score >= 7 and ss_score >= 5
-    
-    # Criterion 1b: WPI 3-6 AND SS ≥ 9
-    criterion_1b = 3 <= wpi_score <= 6 and ss_score >= 9
-    
-    return criterion_1a or criterion_1b
+def configure_page():
+    """Set page options and inject the custom CSS"""
+    st.set_page_config(
+        page_title="Fibromyalgia Diagnostic Assessment",
+        page_icon="🏥",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+    # Custom CSS for styling
+    st.markdown("""
+    <style>
+        .main-header {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            padding: 2rem;
+            border-radius: 10px;
+            text-align: center;
+            color: white;
+            margin-bottom: 2rem;
+        }
+        .score-card {
+            background: white;
+            padding: 1.5rem;
+            border-radius: 10px;
+            border-left: 5px solid #667eea;
+            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
+        }
+        .diagnostic-result {
+            padding: 2rem;
+            border-radius: 10px;
+            text-align: center;
+            font-size: 1.2em;
+            font-weight: bold;
+        }
+        .meets-criteria {
+            background: linear-gradient(135deg, #ff9a9e 0%, #fecfef 100%);
+            border: 2px solid #ff6b6b;
+        }
+        .not-meets-criteria {
+            background: linear-gradient(135deg, #a8edea 0%, #fed6e3 100%);
+            border: 2px solid #4ecdc4;
+        }
+        .body-diagram {
+            border: 2px solid #ddd;
+            border-radius: 10px;
+            padding: 1rem;
+            background: white;
+        }
+        .stCheckbox > label {
+            font-size: 14px !important;
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+@st.cache_resource
+def get_store():
+    """Assessment store shared by all sessions (None when disabled)"""
+    return open_default_store()
+
+@st.cache_resource
+def start_metrics():
+    """Start the configured metrics exporters once per process"""
+    return start_exporters()
+
+def track_session():
+    """Count this session as active in the metrics"""
+    if "metrics_session_id" not in st.session_state:
+        st.session_state.metrics_session_id = uuid.uuid4().hex
+    touch_session(st.session_state.metrics_session_id)
+
+# Each results section is a fragment: an interaction inside one (such as a
+# download click) reruns only that section instead of the whole script.
+
+@st.fragment
+def show_score_cards(record):
+    """Score cards and the diagnostic criteria breakdown"""
+    # Display scores in cards
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.markdown("""
+        <div class="score-card">
+            <h3 style='color: #667eea; margin-bottom: 0;'>WPI Score</h3>
+            <h1 style='color: #333; margin-top: 0;'>{}/19</h1>
+            <p><strong>Widespread Pain Index</strong><br>
+            <small>Counts how many body areas have pain</small></p>
+        </div>
+        """.format(record.wpi_score), unsafe_allow_html=True)
+
+    with col2:
+        st.markdown("""
+        <div class="score-card">
+            <h3 style='color: #667eea; margin-bottom: 0;'>SS Score 2a</h3>
+            <h1 style='color: #333; margin-top: 0;'>{}/9</h1>
+            <p><strong>Core Symptoms Severity</strong><br>
+            <small>Fatigue + Sleep + Thinking problems</small></p>
+        </div>
+        """.format(record.ss_2a_score), unsafe_allow_html=True)
+
+    with col3:
+        st.markdown("""
+        <div class="score-card">
+            <h3 style='color: #667eea; margin-bottom: 0;'>SS Score 2b</h3>
+            <h1 style='color: #333; margin-top: 0;'>{}/3</h1>
+            <p><strong>Additional Symptoms</strong><br>
+            <small>Based on count of other symptoms</small></p>
+        </div>
+        """.format(record.ss_2b_score), unsafe_allow_html=True)
+
+    with col4:
+        st.markdown("""
+        <div class="score-card">
+            <h3 style='color: #667eea; margin-bottom: 0;'>Total SS Score</h3>
+            <h1 style='color: #333; margin-top: 0;'>{}/12</h1>
+            <p><strong>Combined Severity Score</strong><br>
+            <small>SS 2a + SS 2b = Total symptom burden</small></p>
+        </div>
+        """.format(record.total_ss_score), unsafe_allow_html=True)
+
+    # Diagnostic criteria result
+    st.markdown("### 🎯 Diagnostic Criteria Assessment")
+
+    criteria_class = "meets-criteria" if record.meets_criteria else "not-meets-criteria"
+    criteria_text = "MEETS" if record.meets_criteria else "DOES NOT MEET"
+    criteria_emoji = "✅" if record.meets_criteria else "❌"
+
+    st.markdown(f"""
+    <div class="diagnostic-result {criteria_class}">
+        {criteria_emoji} Patient {criteria_text} the New Fibromyalgia Diagnostic Criteria
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Detailed explanation, generated from the criteria definitions
+    st.markdown("#### Diagnostic Criteria Breakdown:")
+    criteria = default_criteria()
+    result = criteria.evaluate_record(record)
+    st.markdown(breakdown_markdown(result, PRIMARY_CRITERIA))
+
+    with st.expander("📚 Other Criteria Revisions"):
+        st.caption("Duration (symptoms for at least 3 months) is not asked and must be confirmed separately.")
+        for criteria_set in criteria.criteria_sets:
+            if criteria_set.key == PRIMARY_CRITERIA:
+                continue
+            met = result.meets[criteria_set.key]
+            st.markdown(f"##### {'✅' if met else '❌'} {criteria_set.name}: {'MET' if met else 'NOT MET'}")
+            st.caption(criteria_set.reference)
+            st.markdown(breakdown_markdown(result, criteria_set.key))
+
+@st.fragment
+@timed("charts")
+def show_charts(record):
+    """Score and pain distribution charts"""
+    # Visualizations
+    # Figures are cached on their inputs and shared across sessions
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Score comparison chart
+        fig_scores = scores_figure(record.wpi_score, record.ss_2a_score,
+                                   record.ss_2b_score, record.total_ss_score)
+        st.plotly_chart(fig_scores, use_container_width=True)
+
+    with col2:
+        # Pain areas distribution
+        if record.wpi_score and not record.no_pain_areas:
+            fig_pain = pain_figure(record.region_counts)
+            st.plotly_chart(fig_pain, use_container_width=True)
+        else:
+            st.info("No pain areas selected for visualization")
+
+@st.fragment
+def show_summary(record):
+    """Selected pain areas and symptoms"""
+    # Additional information  
+    st.markdown("---")
+    st.markdown("### 📋 Assessment Summary")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("**Pain Areas Selected:**")
+        pain_areas = record.pain_areas
+        if pain_areas:
+            for area in pain_areas:
+                st.markdown(f"• {area}")
+        else:
+            st.markdown("• None selected")
+
+    with col2:
+        symptoms = record.symptoms
+        st.markdown(f"**Other Symptoms Selected:** ({len(symptoms)} total)")
+        if symptoms:
+            # Show first 10 symptoms, then indicate if there are more
+            for symptom in symptoms[:10]:
+                st.markdown(f"• {symptom}")
+            if len(symptoms) > 10:
+                st.markdown(f"• ... and {len(symptoms) - 10} more")
+        else:
+            st.markdown("• None selected")
+
+@st.fragment
+@timed("export")
+def show_export(record):
+    """JSON and CSV downloads"""
+    # Export functionality
+    st.markdown("---")
+    st.markdown("### 💾 Export Results")
+
+    json_str, csv_str = export_files(record)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    # JSON download
+    st.download_button(
+        label="📄 Download Results (JSON)",
+        data=json_str,
+        file_name=f"fibromyalgia_assessment_{timestamp}.json",
+        mime="application/json"
+    )
+
+    # CSV download
+    st.download_button(
+        label="📊 Download Results (CSV)",
+        data=csv_str,
+        file_name=f"fibromyalgia_assessment_{timestamp}.csv",
+        mime="text/csv"
+    )
+
+def export_files(record):
+    """(JSON, CSV) download contents for a record"""
+    # Create export data
+    export_data = record.to_export_dict()
+    json_str = json.dumps(export_data, indent=2)
+
+    import pandas as pd
+
+    results_df = pd.DataFrame([{
+        'Assessment Date': export_data['assessment_date'],
+        'WPI Score': export_data['wpi_score'],
+        'SS 2a Score': export_data['ss_2a_score'],
+        'SS 2b Score': export_data['ss_2b_score'],
+        'Total SS Score': export_data['total_ss_score'],
+        'Meets Criteria': export_data['meets_diagnostic_criteria'],
+        'Pain Areas Count': record.wpi_score,
+        'Other Symptoms Count': record.symptom_count
+    }])
+    return json_str, results_df.to_csv(index=False)
+
+@st.fragment
+def show_patient_trend(patient_id, record):
+    """The patient's scores over time, including this assessment"""
+    st.markdown("---")
+    st.markdown(f"### 📈 History for Patient {patient_id}")
+
+    trend = get_store().trend(patient_id)
+    # The background writer may not have committed this assessment yet
+    if not trend or trend[-1][0] != record.assessment_date:
+        trend.append((record.assessment_date, record.wpi_score, record.total_ss_score))
+    if len(trend) < 2:
+        st.info("This is the patient's first stored assessment; their trend appears after the next one.")
+        return
+    st.plotly_chart(patient_trend_figure(trend), use_container_width=True)
+    st.caption(f"{len(trend):,} assessments. See the Patient History page for the full history.")
+
+def reset_assessment():
+    """Clear every answer and result for a new assessment"""
+    for key in list(st.session_state.keys()):
+        if key != "metrics_session_id":
+            del st.session_state[key]
 
 def main():
+    configure_page()
+    if METRICS_ENABLED:
+        start_metrics()
+        track_session()
+    
     # Header
     st.markdown("""
     <div class="main-header">
@@ -110,12 +320,14 @@ def main():
     3. Diagnostic Criteria Evaluation
     """)
     
+    store = get_store()
+
     # Initialize session state
     if 'assessment_complete' not in st.session_state:
         st.session_state.assessment_complete = False
     
     # Create form for the assessment
-    with st.form("fibromyalgia_assessment"):
+    with phase("form_render"), st.form("fibromyalgia_assessment"):
         st.subheader("Part 1: Widespread Pain Index (WPI)")
         st.markdown("""
         **The WPI measures how many body areas have pain (0-19 total areas):**
@@ -130,53 +342,32 @@ def main():
         
         with col1:
             # Pain area options
-            pain_areas_options = [
-                "Shoulder girdle, left", "Shoulder girdle, right",
-                "Upper arm, left", "Upper arm, right",
-                "Lower arm, left", "Lower arm, right",
-                "Hip (buttock) left", "Hip (buttock) right",
-                "Upper leg left", "Upper leg right",
-                "Lower leg left", "Lower leg right",
-                "Jaw left", "Jaw right",
-                "Chest", "Abdomen", "Neck",
-                "Upper back", "Lower back",
-                "None of these areas"
-            ]
+            pain_areas_options = PAIN_AREA_OPTIONS
             
             # Create checkboxes in 4 columns for more compact layout
             pain_cols = st.columns(4)
-            selected_pain_areas = []
+            pain_mask = 0
+            no_pain_areas = False
             
             for i, area in enumerate(pain_areas_options):
                 with pain_cols[i % 4]:
                     if st.checkbox(area, key=f"pain_{i}"):
-                        selected_pain_areas.append(area)
+                        if area == NONE_OF_THESE_AREAS:
+                            no_pain_areas = True
+                        else:
+                            pain_mask |= 1 << i
+            
+            selected_pain_areas = decode_mask(pain_mask, PAIN_AREAS)
         
         with col2:
             # Show simple but effective pain area summary
             st.markdown("### Pain Area Summary")
             
-            # Group areas by body region
-            regions = {
-                "🧠 Head/Neck": ['Neck', 'Jaw left', 'Jaw right'],
-                "💪 Arms & Shoulders": [
-                    'Shoulder girdle, left', 'Shoulder girdle, right',
-                    'Upper arm, left', 'Upper arm, right', 
-                    'Lower arm, left', 'Lower arm, right'
-                ],
-                "🫁 Torso": ['Chest', 'Abdomen', 'Upper back', 'Lower back'],
-                "🦵 Hips & Legs": [
-                    'Hip (buttock) left', 'Hip (buttock) right',
-                    'Upper leg left', 'Upper leg right',
-                    'Lower leg left', 'Lower leg right'
-                ]
-            }
-            
+            # Count pain areas per body region from the region masks
             total_pain_areas = 0
-            for region, areas in regions.items():
-                pain_count = sum(1 for area in areas if area in selected_pain_areas and area != "None of these areas")
-                total_areas = len(areas)
-                percentage = (pain_count / total_areas * 100) if total_areas > 0 else 0
+            for region, pain_count, total_areas in zip(
+                    REGION_HEADINGS, region_counts(pain_mask), REGION_SIZES):
+                percentage = pain_count / total_areas * 100
                 
                 # Display region summary
                 st.markdown(f"**{region}**")
@@ -195,11 +386,10 @@ def main():
                      delta=f"WPI Score: {total_pain_areas}")
             
             # Show selected areas in expandable section
-            if selected_pain_areas and "None of these areas" not in selected_pain_areas:
+            if selected_pain_areas and not no_pain_areas:
                 with st.expander("📋 View All Selected Pain Areas"):
                     for area in selected_pain_areas:
-                        if area != "None of these areas":
-                            st.write(f"🔴 {area}")
+                        st.write(f"🔴 {area}")
             
             # Add helpful tip
             st.info("💡 **Tip:** A WPI score of 7+ suggests widespread pain pattern")
@@ -217,12 +407,7 @@ def main():
         **Indicate your level of symptom severity over the past week:**
         """)
         
-        severity_options = [
-            "0 = No problem",
-            "1 = Slight or mild problems; generally mild or intermittent", 
-            "2 = Moderate; considerable problems; often present and/or at a moderate level",
-            "3 = Severe: pervasive, continuous, life disturbing problems"
-        ]
+        severity_options = SEVERITY_OPTIONS
         
         col1, col2, col3 = st.columns(3)
         
@@ -253,266 +438,75 @@ def main():
         **Check each of the following OTHER SYMPTOMS that you have experienced over the past week:**
         """)
         
-        other_symptoms = [
-            "Muscle pain", "Irritable bowel syndrome", "Fatigue/tiredness", "Thinking or remembering problem",
-            "Muscle Weakness", "Headache", "Pain/cramps in abdomen", "Numbness/tingling",
-            "Dizziness", "Insomnia", "Depression", "Constipation",
-            "Pain in upper abdomen", "Nausea", "Nervousness", "Chest pain",
-            "Blurred vision", "Fever", "Diarrhea", "Dry mouth",
-            "Itching", "Wheezing", "Raynauld's (fingers/toes turn white/blue in cold)", "Hives/welts",
-            "Ringing in ears", "Vomiting", "Heartburn", "Oral ulcers",
-            "Loss/change in taste", "Seizures", "Dry eyes", "Shortness of breath",
-            "Loss of appetite", "Rash", "Sun sensitivity", "Hearing difficulties",
-            "Easy bruising", "Hair loss", "Frequent urination", "Painful urination", "Bladder spasms"
-        ]
+        other_symptoms = OTHER_SYMPTOMS
         
         # Display symptoms in 4 columns
         symptom_cols = st.columns(4)
-        selected_symptoms = []
+        symptom_mask = 0
         
         for i, symptom in enumerate(other_symptoms):
             with symptom_cols[i % 4]:
                 if st.checkbox(symptom, key=f"symptom_{i}"):
-                    selected_symptoms.append(symptom)
+                    symptom_mask |= 1 << i
         
+        # Optional patient ID for longitudinal tracking
+        st.markdown("---")
+        if store is not None:
+            patient_id = st.text_input("Patient ID (optional)", key="patient_id",
+                                       help="Adds this assessment to the patient's history")
+        else:
+            patient_id = ""
+
         # Submit button
         st.markdown("---")
         submitted = st.form_submit_button("🔍 Calculate Assessment Results", type="primary")
     
     # Process results when form is submitted
     if submitted:
-        st.session_state.assessment_complete = True
-        
-        # Calculate scores
-        wpi_score = calculate_wpi_score(selected_pain_areas)
-        ss_2a_score = calculate_ss_score_2a(fatigue_value, waking_value, cognitive_value)
-        ss_2b_score = calculate_ss_score_2b(len(selected_symptoms))
-        total_ss_score = ss_2a_score + ss_2b_score
-        
-        # Store results in session state
-        st.session_state.wpi_score = wpi_score
-        st.session_state.ss_score = total_ss_score
-        st.session_state.ss_2a_score = ss_2a_score  
-        st.session_state.ss_2b_score = ss_2b_score
-        st.session_state.pain_areas = selected_pain_areas
-        st.session_state.symptoms = selected_symptoms
-        st.session_state.meets_criteria = evaluate_diagnostic_criteria(wpi_score, total_ss_score)
+        try:
+            patient_id = clean_patient_id(patient_id)
+        except ValueError as exc:
+            st.error(f"Patient ID: {exc}")
+            submitted = False
+
+    if submitted:
+        with phase("scoring"):
+            # Store the answers as a compact record; scores are derived from it
+            record = AssessmentRecord(
+                pain_mask, symptom_mask, fatigue_value, waking_value, cognitive_value,
+                no_pain_areas=no_pain_areas,
+                assessment_date=datetime.now().strftime(DATE_FORMAT)
+            )
+            meets_criteria = record.meets_criteria
+        
+        with phase("session_state_write"):
+            st.session_state.assessment_complete = True
+            st.session_state.assessment = record
+            st.session_state.assessment_patient_id = patient_id
+        count_submission(meets_criteria)
+        
+        # Queue the submission for the local store; written in the background
+        if store is not None:
+            with phase("store_submit"):
+                store.submit(record, patient_id)
     
     # Display results if assessment is complete
     if st.session_state.assessment_complete:
-        st.markdown("---")
-        st.markdown("## 📊 Assessment Results")
-        
-        # Display scores in cards
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.markdown("""
-            <div class="score-card">
-                <h3 style='color: #667eea; margin-bottom: 0;'>WPI Score</h3>
-                <h1 style='color: #333; margin-top: 0;'>{}/19</h1>
-                <p><strong>Widespread Pain Index</strong><br>
-                <small>Counts how many body areas have pain</small></p>
-            </div>
-            """.format(st.session_state.wpi_score), unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown("""
-            <div class="score-card">
-                <h3 style='color: #667eea; margin-bottom: 0;'>SS Score 2a</h3>
-                <h1 style='color: #333; margin-top: 0;'>{}/9</h1>
-                <p><strong>Core Symptoms Severity</strong><br>
-                <small>Fatigue + Sleep + Thinking problems</small></p>
-            </div>
-            """.format(st.session_state.ss_2a_score), unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown("""
-            <div class="score-card">
-                <h3 style='color: #667eea; margin-bottom: 0;'>SS Score 2b</h3>
-                <h1 style='color: #333; margin-top: 0;'>{}/3</h1>
-                <p><strong>Additional Symptoms</strong><br>
-                <small>Based on count of other symptoms</small></p>
-            </div>
-            """.format(st.session_state.ss_2b_score), unsafe_allow_html=True)
-        
-        with col4:
-            st.markdown("""
-            <div class="score-card">
-                <h3 style='color: #667eea; margin-bottom: 0;'>Total SS Score</h3>
-                <h1 style='color: #333; margin-top: 0;'>{}/12</h1>
-                <p><strong>Combined Severity Score</strong><br>
-                <small>SS 2a + SS 2b = Total symptom burden</small></p>
-            </div>
-            """.format(st.session_state.ss_score), unsafe_allow_html=True)
-        
-        # Diagnostic criteria result
-        st.markdown("### 🎯 Diagnostic Criteria Assessment")
-        
-        criteria_class = "meets-criteria" if st.session_state.meets_criteria else "not-meets-criteria"
-        criteria_text = "MEETS" if st.session_state.meets_criteria else "DOES NOT MEET"
-        criteria_emoji = "✅" if st.session_state.meets_criteria else "❌"
-        
-        st.markdown(f"""
-        <div class="diagnostic-result {criteria_class}">
-            {criteria_emoji} Patient {criteria_text} the New Fibromyalgia Diagnostic Criteria
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Detailed explanation
-        st.markdown("#### Diagnostic Criteria Breakdown:")
-        
-        wpi = st.session_state.wpi_score
-        ss = st.session_state.ss_score
-        
-        st.markdown(f"""
-        **Criterion 1a:** WPI ≥ 7 AND SS ≥ 5
-        - Your WPI: {wpi} ({'✅' if wpi >= 7 else '❌'} {'≥ 7' if wpi >= 7 else '< 7'})
-        - Your SS: {ss} ({'✅' if ss >= 5 else '❌'} {'≥ 5' if ss >= 5 else '< 5'})
-        - Criterion 1a: {'✅ MET' if wpi >= 7 and ss >= 5 else '❌ NOT MET'}
+        record = st.session_state.assessment
         
-        **Criterion 1b:** WPI 3-6 AND SS ≥ 9  
-        - Your WPI: {wpi} ({'✅' if 3 <= wpi <= 6 else '❌'} {'3-6' if 3 <= wpi <= 6 else 'outside 3-6 range'})
-        - Your SS: {ss} ({'✅' if ss >= 9 else '❌'} {'≥ 9' if ss >= 9 else '< 9'})
-        - Criterion 1b: {'✅ MET' if 3 <= wpi <= 6 and ss >= 9 else '❌ NOT MET'}
-        """)
-        
-        # Visualizations
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Score comparison chart
-            fig_scores = go.Figure()
-            
-            fig_scores.add_trace(go.Bar(
-                name='Your Scores',
-                x=['WPI Score', 'SS Score 2a', 'SS Score 2b', 'Total SS'],
-                y=[st.session_state.wpi_score, st.session_state.ss_2a_score, 
-                   st.session_state.ss_2b_score, st.session_state.ss_score],
-                marker_color=['#667eea', '#764ba2', '#f093fb', '#f5576c']
-            ))
-            
-            fig_scores.add_trace(go.Bar(
-                name='Maximum Possible',
-                x=['WPI Score', 'SS Score 2a', 'SS Score 2b', 'Total SS'],
-                y=[19, 9, 3, 12],
-                marker_color=['rgba(102,126,234,0.3)', 'rgba(118,75,162,0.3)', 
-                             'rgba(240,147,251,0.3)', 'rgba(245,87,108,0.3)']
-            ))
-            
-            fig_scores.update_layout(
-                title="Assessment Scores Breakdown",
-                barmode='group',
-                height=400
-            )
-            
-            st.plotly_chart(fig_scores, use_container_width=True)
-        
-        with col2:
-            # Pain areas distribution
-            if st.session_state.pain_areas and "None of these areas" not in st.session_state.pain_areas:
-                pain_categories = {
-                    'Upper Body': 0, 'Lower Body': 0, 'Core': 0, 'Head/Neck': 0
-                }
-                
-                for area in st.session_state.pain_areas:
-                    if 'arm' in area.lower() or 'shoulder' in area.lower():
-                        pain_categories['Upper Body'] += 1
-                    elif 'leg' in area.lower() or 'hip' in area.lower():
-                        pain_categories['Lower Body'] += 1
-                    elif 'chest' in area.lower() or 'abdomen' in area.lower() or 'back' in area.lower():
-                        pain_categories['Core'] += 1
-                    elif 'jaw' in area.lower() or 'neck' in area.lower():
-                        pain_categories['Head/Neck'] += 1
-                
-                fig_pain = px.pie(
-                    values=list(pain_categories.values()),
-                    names=list(pain_categories.keys()),
-                    title="Pain Distribution by Body Region",
-                    color_discrete_sequence=['#667eea', '#764ba2', '#f093fb', '#f5576c']
-                )
-                fig_pain.update_layout(height=400)
-                
-                st.plotly_chart(fig_pain, use_container_width=True)
-            else:
-                st.info("No pain areas selected for visualization")
-        
-        # Additional information  
         st.markdown("---")
-        st.markdown("### 📋 Assessment Summary")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("**Pain Areas Selected:**")
-            if st.session_state.pain_areas:
-                for area in st.session_state.pain_areas:
-                    if area != "None of these areas":
-                        st.markdown(f"• {area}")
-            else:
-                st.markdown("• None selected")
-        
-        with col2:
-            st.markdown(f"**Other Symptoms Selected:** ({len(st.session_state.symptoms)} total)")
-            if st.session_state.symptoms:
-                # Show first 10 symptoms, then indicate if there are more
-                for symptom in st.session_state.symptoms[:10]:
-                    st.markdown(f"• {symptom}")
-                if len(st.session_state.symptoms) > 10:
-                    st.markdown(f"• ... and {len(st.session_state.symptoms) - 10} more")
-            else:
-                st.markdown("• None selected")
-        
-        # Export functionality
-        st.markdown("---")
-        st.markdown("### 💾 Export Results")
-        
-        # Create export data
-        export_data = {
-            "assessment_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "wpi_score": st.session_state.wpi_score,
-            "ss_2a_score": st.session_state.ss_2a_score,
-            "ss_2b_score": st.session_state.ss_2b_score,
-            "total_ss_score": st.session_state.ss_score,
-            "meets_diagnostic_criteria": st.session_state.meets_criteria,
-            "pain_areas": st.session_state.pain_areas,
-            "other_symptoms": st.session_state.symptoms
-        }
-        
-        # JSON download
-        json_str = json.dumps(export_data, indent=2)
-        st.download_button(
-            label="📄 Download Results (JSON)",
-            data=json_str,
-            file_name=f"fibromyalgia_assessment_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json"
-        )
-        
-        # CSV download
-        results_df = pd.DataFrame([{
-            'Assessment Date': export_data['assessment_date'],
-            'WPI Score': export_data['wpi_score'],
-            'SS 2a Score': export_data['ss_2a_score'], 
-            'SS 2b Score': export_data['ss_2b_score'],
-            'Total SS Score': export_data['total_ss_score'],
-            'Meets Criteria': export_data['meets_diagnostic_criteria'],
-            'Pain Areas Count': len([a for a in export_data['pain_areas'] if a != "None of these areas"]),
-            'Other Symptoms Count': len(export_data['other_symptoms'])
-        }])
+        st.markdown("## 📊 Assessment Results")
         
-        csv_str = results_df.to_csv(index=False)
-        st.download_button(
-            label="📊 Download Results (CSV)",
-            data=csv_str,
-            file_name=f"fibromyalgia_assessment_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
-        )
+        show_score_cards(record)
+        show_charts(record)
+        show_summary(record)
+        patient_id = st.session_state.get("assessment_patient_id")
+        if patient_id and store is not None:
+            show_patient_trend(patient_id, record)
+        show_export(record)
         
-        # Reset button
-        if st.button("🔄 Start New Assessment", type="secondary"):
-            for key in list(st.session_state.keys()):
-                del st.session_state[key]
-            st.experimental_rerun()
+        # Reset button; the click's own rerun shows the cleared form
+        st.button("🔄 Start New Assessment", type="secondary", on_click=reset_assessment)
     
     # Footer with disclaimer
     st.markdown("---")
@@ -526,5 +520,18 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+def run():
+    """Run main(), profiled when FIBRO_PROFILING allows it and the URL has ?profile=1"""
+    if PROFILING_ENABLED and st.query_params.get("profile") == "1":
+        with profiled("rerun"):
+            main()
+    else:
+        with phase("rerun"):
+            main()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # `python -m fibromyalgia_app score|export|simulate|ingest ...` runs the headless CLI
+    if sys.argv[1:2] in (["score"], ["export"], ["simulate"], ["ingest"]):
+        from fibromyalgia_cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    run()
\ No newline at end of file
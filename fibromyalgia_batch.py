@@ -0,0 +1,93 @@
+"""Vectorized scoring of whole cohorts with NumPy.
+
+Each function mirrors one of the scalar scoring functions in
+``fibromyalgia_scoring`` but works on column arrays, one row per patient:
+
+- pain flags: 2-D array-like of shape (n, 19), columns in ``PAIN_AREAS`` order
+- severities: 1-D arrays of 0-3 values for fatigue, waking and cognitive
+- symptom flags: 2-D array-like of shape (n, 41), columns in ``OTHER_SYMPTOMS`` order
+
+pandas DataFrames can be passed directly for the flag matrices. Separate
+1-D columns can be combined with ``np.column_stack`` first.
+"""
+
+import numpy as np
+
+from fibromyalgia_scoring import (
+    PAIN_AREAS, OTHER_SYMPTOMS,
+    calculate_ss_score_2b
+)
+
+# SS 2b for every possible symptom count, built from the scalar rule
+SS_2B_BY_SYMPTOM_COUNT = np.array(
+    [calculate_ss_score_2b(count) for count in range(len(OTHER_SYMPTOMS) + 1)],
+    dtype=np.int64
+)
+
+
+def _as_flag_matrix(flags, width, name):
+    """Return flags as a boolean (n, width) array"""
+    matrix = np.asarray(flags)
+    if matrix.ndim != 2 or matrix.shape[1] != width:
+        raise ValueError(f"{name} must have shape (n, {width}), got {matrix.shape}")
+    return matrix.astype(bool, copy=False)
+
+def batch_wpi_score(pain_flags):
+    """Calculate Widespread Pain Index scores for a batch"""
+    pain = _as_flag_matrix(pain_flags, len(PAIN_AREAS), "pain_flags")
+    return np.count_nonzero(pain, axis=1).astype(np.int64)
+
+def batch_symptom_count(symptom_flags):
+    """Count the other symptoms selected in each row"""
+    symptoms = _as_flag_matrix(symptom_flags, len(OTHER_SYMPTOMS), "symptom_flags")
+    return np.count_nonzero(symptoms, axis=1).astype(np.int64)
+
+def batch_ss_score_2a(fatigue, waking, cognitive):
+    """Calculate Symptom Severity Score Part 2a for a batch"""
+    return (np.asarray(fatigue, dtype=np.int64)
+            + np.asarray(waking, dtype=np.int64)
+            + np.asarray(cognitive, dtype=np.int64))
+
+def batch_ss_score_2b(symptoms_count):
+    """Calculate Symptom Severity Score Part 2b for a batch of symptom counts"""
+    counts = np.asarray(symptoms_count, dtype=np.int64)
+    if counts.size and (counts.min() < 0 or counts.max() >= len(SS_2B_BY_SYMPTOM_COUNT)):
+        raise ValueError(f"symptom counts must be between 0 and {len(OTHER_SYMPTOMS)}")
+    return SS_2B_BY_SYMPTOM_COUNT[counts]
+
+def batch_evaluate_diagnostic_criteria(wpi_score, ss_score):
+    """Evaluate the diagnostic criteria for a batch of WPI and SS scores"""
+    wpi = np.asarray(wpi_score)
+    ss = np.asarray(ss_score)
+
+    # Criterion 1a: WPI ≥ 7 AND SS ≥ 5
+    criterion_1a = (wpi >= 7) & (ss >= 5)
+
+    # Criterion 1b: WPI 3-6 AND SS ≥ 9
+    criterion_1b = (wpi >= 3) & (wpi <= 6) & (ss >= 9)
+
+    return criterion_1a | criterion_1b
+
+def score_batch(pain_flags, fatigue, waking, cognitive, symptom_flags):
+    """Score a batch of assessments.
+
+    Returns a dict of arrays keyed like the JSON export: ``wpi_score``,
+    ``ss_2a_score``, ``ss_2b_score``, ``total_ss_score`` and
+    ``meets_diagnostic_criteria``.
+    """
+    wpi_score = batch_wpi_score(pain_flags)
+    ss_2a_score = batch_ss_score_2a(fatigue, waking, cognitive)
+    ss_2b_score = batch_ss_score_2b(batch_symptom_count(symptom_flags))
+
+    if not (wpi_score.shape == ss_2a_score.shape == ss_2b_score.shape):
+        raise ValueError("all inputs must have the same number of rows")
+
+    total_ss_score = ss_2a_score + ss_2b_score
+
+    return {
+        "wpi_score": wpi_score,
+        "ss_2a_score": ss_2a_score,
+        "ss_2b_score": ss_2b_score,
+        "total_ss_score": total_ss_score,
+        "meets_diagnostic_criteria": batch_evaluate_diagnostic_criteria(wpi_score, total_ss_score)
+    }
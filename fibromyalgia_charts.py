@@ -0,0 +1,308 @@
+"""Results charts, memoized on their inputs.
+
+Both charts depend only on a handful of small integers, so each distinct
+input is built once and the figure is shared by every session in the
+process through a bounded LRU cache. Cached figures are shared: callers must
+not modify them (``st.plotly_chart`` only reads the figure).
+
+The cohort charts at the bottom are built from CohortAggregates on every
+render; their inputs change with each stored assessment, so they are not
+cached.
+
+Patient trend charts are downsampled on the server with
+Largest-Triangle-Three-Buckets (LTTB), which keeps the peaks and dips a
+line chart needs, so a history of thousands of assessments ships at most
+TREND_MAX_POINTS points per trace to the browser.
+
+Every figure is sent to the browser as JSON on each rerun that shows it.
+Plotly's default template adds about 7 KB to each one, more than the data
+of any results chart. Streamlit applies its own theme in the browser anyway,
+so FIBRO_CHART_MODE=compact (the default) builds figures with an empty
+template and only the explicit colours. FIBRO_CHART_MODE=full keeps the
+template. ``python benchmarks/bench_chart_payload.py`` measures both.
+
+Plotly is imported inside the builders so importing this module stays cheap.
+"""
+
+import os
+from functools import lru_cache
+from itertools import islice, product
+
+from fibromyalgia_scoring import (
+    PAIN_AREAS, OTHER_SYMPTOMS, MAX_WPI_SCORE, MAX_SS_2A_SCORE, MAX_SS_2B_SCORE, MAX_SS_SCORE
+)
+from fibromyalgia_record import REGION_NAMES, REGION_SIZES, PAIN_AREA_REGION
+from fibromyalgia_metrics import register_caches
+
+SCORE_LABELS = ['WPI Score', 'SS Score 2a', 'SS Score 2b', 'Total SS']
+SCORE_COLORS = ['#667eea', '#764ba2', '#f093fb', '#f5576c']
+MAX_SCORE_COLORS = ['rgba(102,126,234,0.3)', 'rgba(118,75,162,0.3)',
+                    'rgba(240,147,251,0.3)', 'rgba(245,87,108,0.3)']
+MAX_SCORES = [MAX_WPI_SCORE, MAX_SS_2A_SCORE, MAX_SS_2B_SCORE, MAX_SS_SCORE]
+
+# Pie chart categories as (name, index into REGION_NAMES)
+PAIN_CATEGORIES = [('Upper Body', 1), ('Lower Body', 3), ('Core', 2), ('Head/Neck', 0)]
+
+# Pie colour of each region, in REGION_NAMES order
+REGION_COLORS = [SCORE_COLORS[[region for _, region in PAIN_CATEGORIES].index(index)]
+                 for index in range(len(REGION_NAMES))]
+
+# Points per trace a patient trend chart sends to the browser
+TREND_MAX_POINTS = int(os.environ.get("FIBRO_TREND_MAX_POINTS", "300"))
+
+CHART_MODES = ("compact", "full")
+CHART_MODE = os.environ.get("FIBRO_CHART_MODE", "compact")
+if CHART_MODE not in CHART_MODES:
+    raise ValueError(f"FIBRO_CHART_MODE must be one of {', '.join(CHART_MODES)}, not {CHART_MODE!r}")
+
+# Figures kept per chart; each figure holds roughly 50-100 KB with the full template
+FIGURE_CACHE_SIZE = int(os.environ.get("FIBRO_FIGURE_CACHE_SIZE", "256"))
+
+
+def chart_template():
+    """Layout template for figures in the configured chart mode"""
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    return go.layout.Template() if CHART_MODE == "compact" else pio.templates.default
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def scores_figure(wpi_score, ss_2a_score, ss_2b_score, total_ss_score):
+    """Assessment Scores Breakdown bar chart"""
+    import plotly.graph_objects as go
+
+    fig_scores = go.Figure()
+
+    fig_scores.add_trace(go.Bar(
+        name='Your Scores',
+        x=SCORE_LABELS,
+        y=[wpi_score, ss_2a_score, ss_2b_score, total_ss_score],
+        marker_color=SCORE_COLORS
+    ))
+
+    fig_scores.add_trace(go.Bar(
+        name='Maximum Possible',
+        x=SCORE_LABELS,
+        y=MAX_SCORES,
+        marker_color=MAX_SCORE_COLORS
+    ))
+
+    fig_scores.update_layout(
+        title="Assessment Scores Breakdown",
+        barmode='group',
+        height=400,
+        template=chart_template()
+    )
+    return fig_scores
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def pain_figure(region_counts):
+    """Pain Distribution by Body Region pie chart.
+
+    ``region_counts`` is a tuple of pain area counts in REGION_NAMES order.
+    """
+    import plotly.express as px
+
+    fig_pain = px.pie(
+        values=[region_counts[region] for _, region in PAIN_CATEGORIES],
+        names=[name for name, _ in PAIN_CATEGORIES],
+        title="Pain Distribution by Body Region",
+        color_discrete_sequence=SCORE_COLORS
+    )
+    fig_pain.update_layout(height=400, template=chart_template())
+    return fig_pain
+
+def score_domain():
+    """Every (wpi, ss_2a, ss_2b, total_ss) the bar chart can show"""
+    for wpi, ss_2a, ss_2b in product(range(MAX_WPI_SCORE + 1), range(MAX_SS_2A_SCORE + 1),
+                                     range(MAX_SS_2B_SCORE + 1)):
+        yield wpi, ss_2a, ss_2b, ss_2a + ss_2b
+
+def region_domain():
+    """Every region count tuple the pie chart can show (at least one area)"""
+    for counts in product(*(range(size + 1) for size in REGION_SIZES)):
+        if any(counts):
+            yield counts
+
+def prewarm_figure_cache(limit=None):
+    """Build figures ahead of time; returns how many were built.
+
+    ``limit`` caps the figures built per chart. With ``limit=None`` the
+    whole input domain is built (800 bar charts and 979 pies), which is only
+    all kept when FIGURE_CACHE_SIZE is at least that large.
+    """
+    built = 0
+    for key in islice(score_domain(), limit):
+        scores_figure(*key)
+        built += 1
+    for counts in islice(region_domain(), limit):
+        pain_figure(counts)
+        built += 1
+    return built
+
+def figure_cache_info():
+    """Hit/miss counters and size for each figure cache"""
+    return {
+        "scores_figure": scores_figure.cache_info()._asdict(),
+        "pain_figure": pain_figure.cache_info()._asdict()
+    }
+
+register_caches(figure_cache_info)
+
+def clear_figure_cache():
+    scores_figure.cache_clear()
+    pain_figure.cache_clear()
+
+
+def cohort_scores_figure(aggregates):
+    """Distribution of WPI and total SS scores across the cohort"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(rows=1, cols=2, subplot_titles=(SCORE_LABELS[0], SCORE_LABELS[3]))
+    fig.add_trace(go.Bar(x=list(range(MAX_WPI_SCORE + 1)), y=aggregates.wpi_counts,
+                         marker_color=SCORE_COLORS[0], name=SCORE_LABELS[0]), row=1, col=1)
+    fig.add_trace(go.Bar(x=list(range(MAX_SS_SCORE + 1)), y=aggregates.ss_counts,
+                         marker_color=SCORE_COLORS[3], name=SCORE_LABELS[3]), row=1, col=2)
+    fig.update_layout(title="Score Distribution", showlegend=False, height=400,
+                      template=chart_template())
+    return fig
+
+def cohort_heatmap_figure(aggregates):
+    """Assessments per (WPI, total SS) pair"""
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Heatmap(
+        z=aggregates.wpi_ss_counts,
+        x=list(range(MAX_SS_SCORE + 1)),
+        y=list(range(MAX_WPI_SCORE + 1)),
+        colorscale=[[0, 'white'], [1, SCORE_COLORS[1]]],
+        hovertemplate="WPI %{y}, SS %{x}: %{z}<extra></extra>"
+    ))
+    fig.update_layout(title="WPI vs Total SS", xaxis_title=SCORE_LABELS[3],
+                      yaxis_title=SCORE_LABELS[0], height=400, template=chart_template())
+    return fig
+
+def cohort_trend_figure(aggregates):
+    """Assessments per day and the share meeting criteria"""
+    import plotly.graph_objects as go
+
+    days = [day for day, _, _ in aggregates.daily]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=days, y=[count for _, count, _ in aggregates.daily],
+                         name='Assessments', marker_color=MAX_SCORE_COLORS[0]))
+    fig.add_trace(go.Scatter(x=days, y=[meets / count for _, count, meets in aggregates.daily],
+                             name='Meets Criteria', yaxis='y2', mode='lines',
+                             line_color=SCORE_COLORS[3]))
+    fig.update_layout(
+        title="Criteria Met Over Time",
+        yaxis=dict(title='Assessments'),
+        yaxis2=dict(title='Meets Criteria', overlaying='y', side='right',
+                    tickformat='.0%', range=[0, 1]),
+        height=400,
+        template=chart_template()
+    )
+    return fig
+
+def cohort_pain_areas_figure(aggregates):
+    """How often each pain area is reported, grouped and coloured by region"""
+    import plotly.graph_objects as go
+
+    order = sorted(range(len(PAIN_AREAS)), key=lambda bit: PAIN_AREA_REGION[bit])
+    total = aggregates.total or 1
+    fig = go.Figure(go.Bar(
+        x=[aggregates.pain_area_counts[bit] / total for bit in order],
+        y=[PAIN_AREAS[bit] for bit in order],
+        orientation='h',
+        marker_color=[REGION_COLORS[PAIN_AREA_REGION[bit]] for bit in order]
+    ))
+    fig.update_layout(title="Pain Area Frequency", xaxis_tickformat='.0%',
+                      yaxis_autorange='reversed', height=600, template=chart_template())
+    return fig
+
+def cohort_symptoms_figure(aggregates, top=15):
+    """The most frequently reported other symptoms"""
+    import plotly.graph_objects as go
+
+    total = aggregates.total or 1
+    ranked = sorted(zip(aggregates.symptom_counts, OTHER_SYMPTOMS), reverse=True)[:top]
+    fig = go.Figure(go.Bar(
+        x=[count / total for count, _ in ranked],
+        y=[symptom for _, symptom in ranked],
+        orientation='h',
+        marker_color=SCORE_COLORS[2]
+    ))
+    fig.update_layout(title=f"Top {len(ranked)} Other Symptoms", xaxis_tickformat='.0%',
+                      yaxis_autorange='reversed', height=600, template=chart_template())
+    return fig
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps.
+
+    Always keeps the first and last point; returns every index when there
+    are no more than ``threshold`` points.
+    """
+    import numpy as np
+
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # threshold - 2 buckets between the first and last point
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        # Twice the area of the triangle (selected point, candidate, next bucket's mean)
+        area = np.abs((x[selected] - next_x) * (y[start:end] - y[selected])
+                      - (x[selected] - x[start:end]) * (next_y - y[selected]))
+        selected = start + int(area.argmax())
+        keep[i + 1] = selected
+    return keep
+
+def _trend_x(dates):
+    """Seconds since the epoch for each date, or None if any is missing"""
+    import numpy as np
+
+    if not dates or any(date is None for date in dates):
+        return None
+    return np.array(dates, dtype="datetime64[s]").astype("int64")
+
+def patient_trend_figure(trend, max_points=None):
+    """WPI and SS scores over a patient's history, with the 1a thresholds.
+
+    ``trend`` holds (assessment_date, wpi_score, total_ss_score) rows in
+    order; each score line is downsampled to at most ``max_points`` points.
+    """
+    import plotly.graph_objects as go
+
+    max_points = TREND_MAX_POINTS if max_points is None else max_points
+    dates = [row[0] for row in trend]
+    x = _trend_x(dates)
+    if x is None:
+        # Undated entries: plot against the entry number
+        dates = x = list(range(1, len(trend) + 1))
+    fig = go.Figure()
+    for column, name, color, threshold in ((1, 'WPI Score', SCORE_COLORS[0], 7),
+                                           (2, 'Total SS', SCORE_COLORS[3], 5)):
+        scores = [row[column] for row in trend]
+        keep = lttb_indices(x, scores, max_points)
+        fig.add_trace(go.Scatter(x=[dates[i] for i in keep], y=[scores[i] for i in keep],
+                                 name=name, mode='lines+markers' if len(keep) <= 60 else 'lines',
+                                 line_color=color))
+        fig.add_hline(y=threshold, line_dash='dot', line_color=color, opacity=0.5,
+                      annotation_text=f"{name} {threshold}", annotation_position='top left')
+    fig.update_layout(
+        title="Scores Over Time",
+        yaxis=dict(title='Score', range=[0, MAX_WPI_SCORE + 0.5]),
+        hovermode='x unified',
+        height=400,
+        template=chart_template()
+    )
+    return fig
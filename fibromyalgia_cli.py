@@ -0,0 +1,450 @@
+"""Headless command-line scorer for assessment files.
+
+Usage:
+    python -m fibromyalgia_app score answers.jsonl -o scored.jsonl
+    python fibromyalgia_cli.py score answers.csv -o scored.csv --rejects bad.jsonl
+    python fibromyalgia_cli.py export --from 2024-01-01 -o cohort.parquet
+
+Input rows hold the raw answers:
+
+- JSONL: one object per line with the JSON export fields ``pain_areas``,
+  ``other_symptoms``, ``fatigue``, ``waking_unrefreshed`` and
+  ``cognitive_symptoms`` (``assessment_date`` is optional)
+- CSV: one column per pain area and symptom label holding a yes/no flag,
+  plus ``fatigue``, ``waking_unrefreshed``, ``cognitive_symptoms`` and
+  optionally ``assessment_date`` and ``None of these areas``
+
+Rows are read, scored and written one at a time, so memory stays flat for
+any input size. Rows that cannot be scored go to the reject file as JSONL
+with their line number and the error.
+
+``export`` streams stored assessments out of the assessment store (see
+fibromyalgia_export for the formats and layouts).
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+from fibromyalgia_scoring import NONE_OF_THESE_AREAS, PAIN_AREAS, OTHER_SYMPTOMS
+from fibromyalgia_record import AssessmentRecord
+from fibromyalgia_store import DEFAULT_STORE_PATH, default_store_path, query_records
+from fibromyalgia_export import EXPORT_FORMATS, LAYOUTS, write_export
+
+FORMATS = ("jsonl", "csv")
+
+SEVERITY_FIELDS = ["fatigue", "waking_unrefreshed", "cognitive_symptoms"]
+
+# Columns a raw-answer CSV must have
+REQUIRED_CSV_COLUMNS = PAIN_AREAS + OTHER_SYMPTOMS + SEVERITY_FIELDS
+
+# Columns of the scored CSV output, lists are joined with LIST_SEPARATOR
+OUTPUT_CSV_COLUMNS = [
+    "assessment_date", "wpi_score", "ss_2a_score", "ss_2b_score", "total_ss_score",
+    "meets_diagnostic_criteria", "fatigue", "waking_unrefreshed", "cognitive_symptoms",
+    "pain_areas", "other_symptoms"
+]
+LIST_SEPARATOR = "; "
+
+TRUE_FLAGS = {"1", "true", "yes", "y", "x"}
+FALSE_FLAGS = {"", "0", "false", "no", "n"}
+
+ScoreStats = namedtuple("ScoreStats", ["rows", "rejected", "seconds"])
+
+
+def guess_format(path, default="jsonl"):
+    """Pick jsonl or csv from a file name"""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in ("json", "jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    return default
+
+def parse_flag(value):
+    """Parse a yes/no cell from a raw-answer CSV"""
+    text = value.strip().lower()
+    if text in TRUE_FLAGS:
+        return True
+    if text in FALSE_FLAGS:
+        return False
+    raise ValueError(f"not a yes/no value: {value!r}")
+
+def parse_severity(value):
+    """Parse a 0-3 severity answer from JSON or CSV"""
+    if isinstance(value, bool):
+        raise ValueError(f"not a severity value: {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise ValueError(f"not a severity value: {value!r}")
+
+def record_from_answers(data):
+    """Build an AssessmentRecord from a JSON object of raw answers"""
+    if not isinstance(data, dict):
+        raise ValueError("row is not a JSON object")
+    for field in ("pain_areas", "other_symptoms"):
+        if not isinstance(data.get(field), list):
+            raise ValueError(f"{field} must be a list of labels")
+    answers = dict(data)
+    for field in SEVERITY_FIELDS:
+        if field not in answers:
+            raise ValueError(f"missing field: {field}")
+        answers[field] = parse_severity(answers[field])
+    return AssessmentRecord.from_export_dict(answers)
+
+def record_from_csv_row(row):
+    """Build an AssessmentRecord from a raw-answer CSV row"""
+    if None in row:
+        raise ValueError("row has more cells than the header")
+    if any(row[column] is None for column in REQUIRED_CSV_COLUMNS):
+        raise ValueError("row has fewer cells than the header")
+
+    pain_mask = 0
+    for i, area in enumerate(PAIN_AREAS):
+        if parse_flag(row[area]):
+            pain_mask |= 1 << i
+    symptom_mask = 0
+    for i, symptom in enumerate(OTHER_SYMPTOMS):
+        if parse_flag(row[symptom]):
+            symptom_mask |= 1 << i
+
+    return AssessmentRecord(
+        pain_mask, symptom_mask,
+        *(parse_severity(row[field]) for field in SEVERITY_FIELDS),
+        no_pain_areas=parse_flag(row.get(NONE_OF_THESE_AREAS) or ""),
+        assessment_date=row.get("assessment_date") or None
+    )
+
+def iter_jsonl_rows(stream):
+    """Yield (line_number, raw_line) for each non-blank line, still as bytes"""
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            yield line_number, line.rstrip(b"\r\n")
+
+def check_csv_columns(columns):
+    """Raise ValueError naming the raw-answer columns missing from a header"""
+    columns = set(columns or [])
+    missing = [column for column in REQUIRED_CSV_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"CSV input is missing columns: {', '.join(missing[:5])}"
+                         + (f" and {len(missing) - 5} more" if len(missing) > 5 else ""))
+
+def decode_lines(lines, bad_lines):
+    """Decode byte lines as UTF-8, setting aside the ones that are not.
+
+    A bad line is decoded with replacement characters so the CSV reader can
+    keep going, and its bytes are kept in ``bad_lines`` by line number.
+    """
+    for line_number, line in enumerate(lines, 1):
+        try:
+            yield line.decode("utf-8")
+        except UnicodeDecodeError:
+            bad_lines[line_number] = line
+            yield line.decode("utf-8", "replace")
+
+def iter_csv_rows(stream):
+    """Yield (line_number, row_dict) after checking the header.
+
+    A row spanning a line that is not valid UTF-8 is yielded as the bytes
+    of those lines instead, for ``parse_csv_row`` to reject.
+    """
+    bad_lines = {}
+    reader = csv.DictReader(decode_lines(stream, bad_lines))
+    check_csv_columns(reader.fieldnames)
+    if bad_lines:
+        raise ValueError("CSV header is not valid UTF-8")
+    for row in reader:
+        if bad_lines:
+            bad = sorted(n for n in bad_lines if n <= reader.line_num)
+            if bad:
+                yield reader.line_num, b"".join(bad_lines.pop(n) for n in bad)
+                continue
+        yield reader.line_num, row
+
+def parse_csv_row(row):
+    if isinstance(row, bytes):
+        row.decode("utf-8")
+    return record_from_csv_row(row)
+
+def parse_jsonl_row(line):
+    return record_from_answers(json.loads(line.decode("utf-8")))
+
+def iter_input(stream, input_format):
+    """Return (rows, parse) for a raw-answer stream of byte lines"""
+    if input_format == "csv":
+        return iter_csv_rows(stream), parse_csv_row
+    return iter_jsonl_rows(stream), parse_jsonl_row
+
+def score_rows(rows, parse):
+    """Yield (line_number, raw, export_dict, error) for each input row.
+
+    Rows are decoded by ``parse``, so a row that is not valid UTF-8 is
+    rejected like any other malformed row, as is JSON nested too deeply to
+    parse (RecursionError). Rejected raw bytes are returned decoded with
+    replacement characters.
+    """
+    for line_number, raw in rows:
+        try:
+            record = parse(raw)
+        except (ValueError, TypeError, RecursionError) as exc:
+            if isinstance(raw, bytes):
+                raw = raw.decode("utf-8", "replace").rstrip("\r\n")
+            yield line_number, raw, None, str(exc)
+        else:
+            yield line_number, raw, record.to_export_dict(), None
+
+def export_to_csv_row(export_data):
+    """Flatten an export dict into an OUTPUT_CSV_COLUMNS row"""
+    row = dict(export_data)
+    row["pain_areas"] = LIST_SEPARATOR.join(export_data["pain_areas"])
+    row["other_symptoms"] = LIST_SEPARATOR.join(export_data["other_symptoms"])
+    return row
+
+def make_writer(stream, output_format, header=True):
+    """Return a function that writes one export dict to stream"""
+    if output_format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=OUTPUT_CSV_COLUMNS, lineterminator="\n")
+        if header:
+            writer.writeheader()
+        return lambda export_data: writer.writerow(export_to_csv_row(export_data))
+    return lambda export_data: stream.write(json.dumps(export_data) + "\n")
+
+
+class RejectWriter:
+    """Appends rejected rows to a JSONL file, opened on the first reject"""
+
+    def __init__(self, path):
+        self.path = path
+        self._stream = None
+
+    def write(self, line_number, raw, error):
+        if self._stream is None:
+            self._stream = open(self.path, "w", encoding="utf-8")
+        self._stream.write(json.dumps({"line": line_number, "error": error, "raw": raw}) + "\n")
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+
+
+def score_stream(input_stream, output_stream, rejects, input_format="jsonl", output_format="jsonl",
+                 progress=None, progress_interval=5.0, header=True):
+    """Score every row of input_stream into output_stream.
+
+    ``input_stream`` can be any iterable of byte lines, such as a file
+    opened in binary mode. ``rejects`` gets a
+    ``write(line_number, raw, error)`` call for each bad row. ``progress``
+    is called with running ScoreStats about every ``progress_interval``
+    seconds. ``header=False`` leaves out the CSV output header. Returns the
+    final ScoreStats.
+    """
+    rows, parse = iter_input(input_stream, input_format)
+    write = make_writer(output_stream, output_format, header)
+
+    scored = rejected = 0
+    start = last_report = time.perf_counter()
+    for line_number, raw, export_data, error in score_rows(rows, parse):
+        if error is None:
+            write(export_data)
+            scored += 1
+        else:
+            rejects.write(line_number, raw, error)
+            rejected += 1
+
+        if progress is not None and (scored + rejected) % 1000 == 0:
+            now = time.perf_counter()
+            if now - last_report >= progress_interval:
+                progress(ScoreStats(scored, rejected, now - start))
+                last_report = now
+
+    return ScoreStats(scored, rejected, time.perf_counter() - start)
+
+def format_stats(stats):
+    total = stats.rows + stats.rejected
+    rate = total / stats.seconds if stats.seconds else 0.0
+    return (f"{stats.rows:,} scored, {stats.rejected:,} rejected "
+            f"in {stats.seconds:.2f}s ({rate:,.0f} rows/s)")
+
+def open_text(path, mode):
+    """Open path for text I/O, with "-" meaning stdin/stdout"""
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if "r" in mode else sys.stdout)
+    return open(path, mode, encoding="utf-8", newline="")
+
+def open_binary_input(path):
+    """Open path for reading bytes, with "-" meaning stdin"""
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin.buffer)
+    return open(path, "rb")
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m fibromyalgia_app",
+        description="Score fibromyalgia assessment files without the Streamlit UI."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    score = commands.add_parser("score", help="score a JSONL or CSV file of raw answers")
+    score.add_argument("input", help="raw-answer file, or - for stdin")
+    score.add_argument("-o", "--output", default="-", help="scored output file (default: stdout)")
+    score.add_argument("--input-format", choices=FORMATS, help="default: from the input file name")
+    score.add_argument("--output-format", choices=FORMATS, help="default: from the output file name")
+    score.add_argument("--rejects", help="file for malformed rows (default: <output>.rejects.jsonl)")
+    score.add_argument("--workers", type=int, default=1,
+                       help="score in N processes (input must be a file, default: 1)")
+    score.add_argument("--quiet", action="store_true", help="do not report progress on stderr")
+
+    export = commands.add_parser("export", help="stream stored assessments to CSV, JSONL, Arrow or Parquet")
+    export.add_argument("-o", "--output", default="-", help="export file (default: stdout)")
+    export.add_argument("--store", default=default_store_path() or DEFAULT_STORE_PATH,
+                        help="assessment store (default: FIBRO_STORE_PATH or %(default)s)")
+    export.add_argument("--format", choices=EXPORT_FORMATS,
+                        help="default: from the output file name, else csv")
+    export.add_argument("--layout", choices=LAYOUTS, default="bitmask",
+                        help="pain area and symptom columns (default: %(default)s)")
+    export.add_argument("--from", dest="date_from", help="first date to include, e.g. 2024-01-01")
+    export.add_argument("--to", dest="date_to", help="date to stop before")
+    export.add_argument("--meets-criteria", action="store_true", default=None,
+                        help="only assessments that meet the criteria")
+    export.add_argument("--quiet", action="store_true", help="do not report on stderr")
+
+    simulate = commands.add_parser("simulate", help="simulate how stable the criteria result is under small answer changes")
+    simulate.add_argument("--respondents", type=int, default=1_000_000, help="default: %(default)s")
+    simulate.add_argument("--distribution", default="mixed",
+                          help="answer distribution preset (uniform, mixed, community, pain_clinic; default: %(default)s)")
+    simulate.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (default: all cores)")
+    simulate.add_argument("--chunk-size", type=int, default=250_000, help="respondents per chunk (default: %(default)s)")
+    simulate.add_argument("--seed", type=int, default=0)
+    simulate.add_argument("--quiet", action="store_true", help="do not report progress on stderr")
+
+    ingest = commands.add_parser("ingest", help="ingest a directory tree of downloaded export files into a dataset")
+    ingest.add_argument("root", help="directory to scan for fibromyalgia_assessment_*.json and *.csv files")
+    ingest.add_argument("-o", "--output", required=True, help="dataset directory (Parquet parts and manifest)")
+    ingest.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (default: all cores)")
+    ingest.add_argument("--pattern", action="append", dest="patterns",
+                        help="file name pattern to ingest, may be repeated (default: the export file names)")
+    ingest.add_argument("--quiet", action="store_true", help="do not report progress on stderr")
+    return parser
+
+def export_main(args):
+    """Run the export subcommand"""
+    if not os.path.exists(args.store):
+        print(f"error: no assessment store at {args.store}", file=sys.stderr)
+        return 2
+    fmt = args.format or guess_export_format(args.output)
+    records = query_records(args.store, date_from=args.date_from, date_to=args.date_to,
+                            meets_criteria=args.meets_criteria)
+    start = time.perf_counter()
+    try:
+        if args.output == "-":
+            written = write_export(records, sys.stdout.buffer, fmt, args.layout)
+        else:
+            with open(args.output, "wb") as stream:
+                written = write_export(records, stream, fmt, args.layout)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    if not args.quiet:
+        print(f"exported {written:,} bytes in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+def simulate_main(args):
+    """Run the simulate subcommand"""
+    from fibromyalgia_simulation import format_summary, simulate
+
+    def report(summary):
+        print(f"{summary.respondents:,} respondents ({summary.throughput:,.0f}/s)", file=sys.stderr)
+
+    try:
+        summary = simulate(args.distribution, args.respondents, args.workers, args.chunk_size, args.seed,
+                           progress=None if args.quiet else report)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    print(format_summary(summary))
+    return 0
+
+def ingest_main(args):
+    """Run the ingest subcommand"""
+    from fibromyalgia_ingest import DEFAULT_PATTERNS, format_ingest_stats, ingest
+
+    def report(stats):
+        print(format_ingest_stats(stats), file=sys.stderr)
+
+    if not os.path.isdir(args.root):
+        print(f"error: not a directory: {args.root}", file=sys.stderr)
+        return 2
+    try:
+        stats = ingest(args.root, args.output, args.workers, args.patterns or DEFAULT_PATTERNS,
+                       progress=None if args.quiet else report)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    if not args.quiet:
+        report(stats)
+    return 0
+
+def guess_export_format(path):
+    """Pick an export format from a file name, defaulting to csv"""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in ("json", "ndjson"):
+        return "jsonl"
+    return extension if extension in EXPORT_FORMATS else "csv"
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        return export_main(args)
+    if args.command == "simulate":
+        return simulate_main(args)
+    if args.command == "ingest":
+        return ingest_main(args)
+
+    input_format = args.input_format or guess_format(args.input)
+    output_format = args.output_format or guess_format(args.output, default=input_format)
+    rejects_path = args.rejects or (
+        "rejects.jsonl" if args.output == "-" else args.output + ".rejects.jsonl"
+    )
+
+    def report(stats):
+        print(format_stats(stats), file=sys.stderr)
+
+    if args.workers > 1 and args.input == "-":
+        parser.error("--workers needs an input file, not stdin")
+
+    try:
+        if args.workers > 1:
+            from fibromyalgia_parallel import score_file_parallel
+            stats = score_file_parallel(args.input, args.output, rejects_path, args.workers,
+                                        input_format, output_format)
+        else:
+            rejects = RejectWriter(rejects_path)
+            try:
+                with open_binary_input(args.input) as input_stream, \
+                        open_text(args.output, "w") as output_stream:
+                    stats = score_stream(input_stream, output_stream, rejects,
+                                         input_format, output_format,
+                                         progress=None if args.quiet else report)
+            finally:
+                rejects.close()
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+
+    if not args.quiet:
+        report(stats)
+        if stats.rejected:
+            print(f"rejected rows written to {rejects_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""Declarative diagnostic criteria for several published revisions.
+
+A criteria set is plain data. It lists rules, any one of which is enough.
+Each rule lists conditions that must all hold. Each condition is a measure
+with an inclusive minimum and/or maximum. Measures are computed from the
+raw answers (the pain area and symptom masks and the three severities) and
+are data too:
+
+- ``pain_groups``: how many of the groups of pain areas have any pain
+- ``severities``: the sum (or the max) of some of the 0-3 severities
+- ``symptoms``: how many of the listed symptoms are present
+- ``symptom_count_score``: adds the 2010 SS 2b score for the symptom count
+
+``compile_criteria()`` flattens the definitions once into tables of
+distinct conditions, rules and sets. ``CompiledCriteria.evaluate()`` then
+computes each measure and each distinct condition a single time for a whole
+batch with NumPy, and combines them into every rule and every set with two
+small matrix products. ``evaluate_one()`` walks the same tables in plain
+Python for a single assessment, and ``breakdown_markdown()`` renders the
+results page breakdown from the definitions.
+
+``PRIMARY_CRITERIA`` is the set reported as "meets criteria" by the
+results banner, exports and the store. It only uses the WPI and SS
+measures, so ``meets_primary_criteria()`` looks its outcome up in a table
+built from the definition for every (WPI, SS) pair.
+
+Only what the questionnaire records is evaluated. The published
+requirements that symptoms have lasted three months, and the 2010
+exclusion of other disorders, are left to the clinician. The 2016 and 2019
+pain regions and sites are built from the 19 WPI areas.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+from fibromyalgia_scoring import (
+    PAIN_AREAS, OTHER_SYMPTOMS, MAX_WPI_SCORE, MAX_SS_SCORE, calculate_ss_score_2b
+)
+
+Measure = namedtuple("Measure", ["label", "pain_groups", "severities", "combine", "symptoms",
+                                 "symptom_count_score"], defaults=((), (), "sum", (), False))
+Condition = namedtuple("Condition", ["measure", "minimum", "maximum"], defaults=(None, None))
+Rule = namedtuple("Rule", ["name", "conditions"])
+CriteriaSet = namedtuple("CriteriaSet", ["key", "name", "reference", "rules"])
+
+SEVERITIES = ("fatigue", "waking", "cognitive")
+
+# 2016 generalized pain regions; jaw, chest and abdomen do not count
+PAIN_REGIONS_2016 = (
+    ("Shoulder girdle, left", "Upper arm, left", "Lower arm, left"),
+    ("Shoulder girdle, right", "Upper arm, right", "Lower arm, right"),
+    ("Hip (buttock) left", "Upper leg left", "Lower leg left"),
+    ("Hip (buttock) right", "Upper leg right", "Lower leg right"),
+    ("Neck", "Upper back", "Lower back"),
+)
+
+# AAPT 2019 multisite pain: head, arms, chest, abdomen, upper and lower back, legs
+PAIN_SITES_AAPT = (
+    ("Jaw left", "Jaw right"),
+    ("Shoulder girdle, left", "Upper arm, left", "Lower arm, left"),
+    ("Shoulder girdle, right", "Upper arm, right", "Lower arm, right"),
+    ("Chest",),
+    ("Abdomen",),
+    ("Neck", "Upper back"),
+    ("Lower back", "Hip (buttock) left", "Hip (buttock) right"),
+    ("Upper leg left", "Lower leg left"),
+    ("Upper leg right", "Lower leg right"),
+)
+
+MEASURES = {
+    "wpi": Measure("WPI", pain_groups=tuple((area,) for area in PAIN_AREAS)),
+    "ss": Measure("SS", severities=SEVERITIES, symptom_count_score=True),
+    "ss_2011": Measure("SS (2011)", severities=SEVERITIES,
+                       symptoms=("Headache", "Pain/cramps in abdomen", "Depression")),
+    "pain_regions": Measure("Pain regions", pain_groups=PAIN_REGIONS_2016),
+    "pain_sites": Measure("Pain sites", pain_groups=PAIN_SITES_AAPT),
+    "fatigue_or_sleep": Measure("Fatigue or unrefreshed waking", severities=("fatigue", "waking"),
+                                combine="max"),
+}
+
+CRITERIA_SETS = (
+    CriteriaSet("2010", "ACR 2010 criteria", "Wolfe F, et al. Arthritis Care Res 2010;62:600-10", (
+        Rule("Criterion 1a", (Condition("wpi", 7), Condition("ss", 5))),
+        Rule("Criterion 1b", (Condition("wpi", 3, 6), Condition("ss", 9))),
+    )),
+    CriteriaSet("2011", "2011 self-report criteria", "Wolfe F, et al. J Rheumatol 2011;38:1113-22", (
+        Rule("Criterion 1a", (Condition("wpi", 7), Condition("ss_2011", 5))),
+        Rule("Criterion 1b", (Condition("wpi", 3, 6), Condition("ss_2011", 9))),
+    )),
+    CriteriaSet("2016", "2016 revised criteria", "Wolfe F, et al. Semin Arthritis Rheum 2016;46:319-29", (
+        Rule("Criterion 1a", (Condition("wpi", 7), Condition("ss_2011", 5), Condition("pain_regions", 4))),
+        Rule("Criterion 1b", (Condition("wpi", 4, 6), Condition("ss_2011", 9), Condition("pain_regions", 4))),
+    )),
+    CriteriaSet("2019", "AAPT 2019 criteria", "Arnold LM, et al. J Pain 2019;20:611-28", (
+        Rule("Core criteria", (Condition("pain_sites", 6), Condition("fatigue_or_sleep", 2))),
+    )),
+)
+
+CRITERIA_KEYS = tuple(criteria_set.key for criteria_set in CRITERIA_SETS)
+
+# Set behind AssessmentRecord.meets_criteria; may only use the wpi and ss measures
+PRIMARY_CRITERIA = "2010"
+
+# Results of evaluate_one(): measure values, then per set whether it is met
+# and (rule, met, [(condition, value, ok), ...]) for each rule
+CriteriaResult = namedtuple("CriteriaResult", ["measures", "meets", "rules"])
+
+# Results of evaluate(): arrays keyed by measure name and set key, plus the
+# (n, rules) array in CompiledCriteria.rules order
+BatchCriteriaResult = namedtuple("BatchCriteriaResult", ["measures", "meets", "rules"])
+
+
+def _bit_mask(labels, options):
+    return sum(1 << options.index(label) for label in labels)
+
+def condition_holds(condition, value):
+    return ((condition.minimum is None or value >= condition.minimum)
+            and (condition.maximum is None or value <= condition.maximum))
+
+def describe_condition(condition):
+    """Threshold text of a condition, e.g. "≥ 7" or "3-6" """
+    if condition.minimum is not None and condition.maximum is not None:
+        return f"{condition.minimum}-{condition.maximum}"
+    if condition.minimum is not None:
+        return f"≥ {condition.minimum}"
+    return f"≤ {condition.maximum}"
+
+
+class CompiledCriteria:
+    """Criteria sets flattened into condition, rule and set tables"""
+
+    def __init__(self, criteria_sets, measures):
+        self.criteria_sets = tuple(criteria_sets)
+        # Only the measures some condition uses, each with its bit masks
+        used = []
+        self.conditions = []
+        self.rules = []
+        rule_conditions = []
+        set_rules = []
+        for criteria_set in self.criteria_sets:
+            rule_indexes = []
+            for rule in criteria_set.rules:
+                condition_indexes = []
+                for condition in rule.conditions:
+                    if condition.measure not in measures:
+                        raise ValueError(f"criteria set {criteria_set.key}: unknown measure {condition.measure!r}")
+                    if condition.measure not in used:
+                        used.append(condition.measure)
+                    if condition not in self.conditions:
+                        self.conditions.append(condition)
+                    condition_indexes.append(self.conditions.index(condition))
+                rule_indexes.append(len(self.rules))
+                self.rules.append((criteria_set.key, rule))
+                rule_conditions.append(condition_indexes)
+            set_rules.append(rule_indexes)
+        self.measures = {
+            name: (
+                measures[name],
+                tuple(_bit_mask(group, PAIN_AREAS) for group in measures[name].pain_groups),
+                _bit_mask(measures[name].symptoms, OTHER_SYMPTOMS),
+            )
+            for name in used
+        }
+        self.rule_conditions = rule_conditions
+        self.set_rules = set_rules
+
+    def measure_one(self, name, pain_mask, symptom_mask, severities):
+        """One measure's value for one assessment; severities maps name -> 0-3"""
+        measure, group_masks, symptoms_mask = self.measures[name]
+        value = sum(1 for group_mask in group_masks if pain_mask & group_mask)
+        if measure.severities:
+            values = [severities[severity] for severity in measure.severities]
+            value += max(values) if measure.combine == "max" else sum(values)
+        value += bin(symptom_mask & symptoms_mask).count("1")
+        if measure.symptom_count_score:
+            value += calculate_ss_score_2b(bin(symptom_mask).count("1"))
+        return value
+
+    def evaluate_one(self, pain_mask, symptom_mask, fatigue, waking, cognitive):
+        """CriteriaResult for one assessment"""
+        severities = {"fatigue": fatigue, "waking": waking, "cognitive": cognitive}
+        values = {name: self.measure_one(name, pain_mask, symptom_mask, severities) for name in self.measures}
+        passed = [condition_holds(condition, values[condition.measure]) for condition in self.conditions]
+        meets = {}
+        rules = {}
+        for criteria_set, rule_indexes in zip(self.criteria_sets, self.set_rules):
+            rules[criteria_set.key] = []
+            for rule_index in rule_indexes:
+                _, rule = self.rules[rule_index]
+                checks = [(self.conditions[i], values[self.conditions[i].measure], passed[i])
+                          for i in self.rule_conditions[rule_index]]
+                rules[criteria_set.key].append((rule, all(ok for _, _, ok in checks), checks))
+            meets[criteria_set.key] = any(met for _, met, _ in rules[criteria_set.key])
+        return CriteriaResult(values, meets, rules)
+
+    def evaluate_record(self, record):
+        """CriteriaResult for an AssessmentRecord"""
+        return self.evaluate_one(record.pain_mask, record.symptom_mask,
+                                 record.fatigue, record.waking, record.cognitive)
+
+    def evaluate(self, pain_mask, symptom_mask, fatigue, waking, cognitive):
+        """BatchCriteriaResult for arrays of masks and severities, in one pass"""
+        import numpy as np
+
+        pain_mask = np.asarray(pain_mask, dtype=np.int64)
+        symptom_mask = np.asarray(symptom_mask, dtype=np.int64)
+        severities = {"fatigue": np.asarray(fatigue), "waking": np.asarray(waking),
+                      "cognitive": np.asarray(cognitive)}
+        symptom_count = None
+        values = {}
+        for name, (measure, group_masks, symptoms_mask) in self.measures.items():
+            value = np.zeros(len(pain_mask), dtype=np.int16)
+            for group_mask in group_masks:
+                value += (pain_mask & group_mask) != 0
+            if measure.severities:
+                stacked = np.stack([severities[severity] for severity in measure.severities])
+                value += stacked.max(axis=0) if measure.combine == "max" else stacked.sum(axis=0)
+            if symptoms_mask:
+                value += _popcount(symptom_mask & symptoms_mask)
+            if measure.symptom_count_score:
+                from fibromyalgia_batch import SS_2B_BY_SYMPTOM_COUNT
+                if symptom_count is None:
+                    symptom_count = _popcount(symptom_mask)
+                value += SS_2B_BY_SYMPTOM_COUNT[symptom_count].astype(np.int16)
+            values[name] = value
+
+        # Every distinct condition once, as an (n, conditions) array
+        measure_names = list(self.measures)
+        matrix = np.stack([values[name] for name in measure_names], axis=1)
+        columns = [measure_names.index(condition.measure) for condition in self.conditions]
+        minimum = np.array([-1 if c.minimum is None else c.minimum for c in self.conditions])
+        maximum = np.array([np.iinfo(np.int16).max if c.maximum is None else c.maximum
+                            for c in self.conditions])
+        passed = (matrix[:, columns] >= minimum) & (matrix[:, columns] <= maximum)
+
+        # A rule holds when none of its conditions failed; a set when any rule holds
+        rule_matrix = np.zeros((len(self.conditions), len(self.rules)), dtype=np.float32)
+        for rule_index, condition_indexes in enumerate(self.rule_conditions):
+            rule_matrix[condition_indexes, rule_index] = 1
+        rules = ((~passed).astype(np.float32) @ rule_matrix) == 0
+        set_matrix = np.zeros((len(self.rules), len(self.criteria_sets)), dtype=np.float32)
+        for set_index, rule_indexes in enumerate(self.set_rules):
+            set_matrix[rule_indexes, set_index] = 1
+        sets = (rules.astype(np.float32) @ set_matrix) > 0
+        meets = {criteria_set.key: sets[:, i] for i, criteria_set in enumerate(self.criteria_sets)}
+        return BatchCriteriaResult(values, meets, rules)
+
+    def criteria_set(self, key):
+        for criteria_set in self.criteria_sets:
+            if criteria_set.key == key:
+                return criteria_set
+        raise KeyError(key)
+
+def _popcount(values):
+    import numpy as np
+
+    bits = np.unpackbits(np.ascontiguousarray(values, dtype=np.int64).view(np.uint8).reshape(-1, 8), axis=1)
+    return bits.sum(axis=1, dtype=np.int16)
+
+def compile_criteria(criteria_sets=CRITERIA_SETS, measures=None):
+    """Compile criteria sets (CRITERIA_SETS by default) for evaluation"""
+    return CompiledCriteria(criteria_sets, MEASURES if measures is None else measures)
+
+@lru_cache(maxsize=1)
+def default_criteria():
+    """CRITERIA_SETS compiled once per process"""
+    return compile_criteria()
+
+@lru_cache(maxsize=1)
+def primary_criteria_table():
+    """PRIMARY_CRITERIA outcome for every reachable score pair, as table[wpi][ss]"""
+    criteria_set = default_criteria().criteria_set(PRIMARY_CRITERIA)
+    conditions = [condition for rule in criteria_set.rules for condition in rule.conditions]
+    other = {condition.measure for condition in conditions} - {"wpi", "ss"}
+    if other:
+        raise ValueError(f"primary criteria set {PRIMARY_CRITERIA} uses {', '.join(sorted(other))}; "
+                         "only wpi and ss are supported")
+    return tuple(
+        tuple(any(all(condition_holds(condition, {"wpi": wpi, "ss": ss}[condition.measure])
+                      for condition in rule.conditions) for rule in criteria_set.rules)
+              for ss in range(MAX_SS_SCORE + 1))
+        for wpi in range(MAX_WPI_SCORE + 1)
+    )
+
+def meets_primary_criteria(wpi_score, ss_score):
+    """Whether a WPI and total SS score meet PRIMARY_CRITERIA"""
+    return primary_criteria_table()[wpi_score][ss_score]
+
+
+def breakdown_markdown(result, key):
+    """Markdown breakdown of one criteria set for a CriteriaResult"""
+    lines = []
+    for rule, met, checks in result.rules[key]:
+        lines.append(f"**{rule.name}:** " + " AND ".join(
+            f"{MEASURES[condition.measure].label} {describe_condition(condition)}" for condition, _, _ in checks))
+        for condition, value, ok in checks:
+            threshold = describe_condition(condition)
+            if not ok:
+                threshold = f"outside {threshold} range" if condition.minimum is not None \
+                    and condition.maximum is not None else threshold.replace("≥", "<").replace("≤", ">")
+            lines.append(f"- Your {MEASURES[condition.measure].label}: {value} ({'✅' if ok else '❌'} {threshold})")
+        lines.append(f"- {rule.name}: {'✅ MET' if met else '❌ NOT MET'}")
+        lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,237 @@
+"""Streaming bulk export of stored assessments.
+
+Usage:
+    python fibromyalgia_app.py export --from 2024-01-01 --to 2024-02-01 -o january.parquet
+    for chunk in iter_export(store.query(meets_criteria=True), "csv"):
+        response.write(chunk)
+
+``iter_export()`` turns any iterable of AssessmentRecords into a stream of
+byte chunks, ``chunk_size`` records at a time, so memory stays flat however
+many assessments are exported. Formats:
+
+- ``csv`` and ``jsonl``: text, one row per assessment
+- ``arrow``: an Arrow IPC stream of record batches (needs pyarrow)
+- ``parquet``: one row group per chunk (needs pyarrow)
+
+Pain areas and symptoms use one of two compact layouts:
+
+- ``bitmask``: ``pain_mask`` and ``symptom_mask`` integer columns, bit i set
+  for PAIN_AREAS[i] / OTHER_SYMPTOMS[i] (see fibromyalgia_record)
+- ``boolean``: one flag column per pain area and symptom label
+"""
+
+import csv
+import io
+import json
+
+from fibromyalgia_scoring import NONE_OF_THESE_AREAS, PAIN_AREAS, OTHER_SYMPTOMS
+
+EXPORT_FORMATS = ("csv", "jsonl", "arrow", "parquet")
+LAYOUTS = ("bitmask", "boolean")
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+SCORE_COLUMNS = [
+    "assessment_date", "wpi_score", "ss_2a_score", "ss_2b_score", "total_ss_score",
+    "meets_diagnostic_criteria", "fatigue", "waking_unrefreshed", "cognitive_symptoms"
+]
+BITMASK_COLUMNS = ["no_pain_areas", "pain_mask", "symptom_mask"]
+FLAG_COLUMNS = [NONE_OF_THESE_AREAS] + PAIN_AREAS + OTHER_SYMPTOMS
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+_PAIN_BITS = range(len(PAIN_AREAS))
+_SYMPTOM_BITS = range(len(OTHER_SYMPTOMS))
+
+
+def export_columns(layout="bitmask"):
+    """Column names of an export in the given layout"""
+    if layout not in LAYOUTS:
+        raise ValueError(f"unknown layout {layout!r}, expected one of {', '.join(LAYOUTS)}")
+    return SCORE_COLUMNS + (BITMASK_COLUMNS if layout == "bitmask" else FLAG_COLUMNS)
+
+def export_row(record, layout="bitmask", flag=bool):
+    """Values of one record in export_columns(layout) order.
+
+    ``flag`` converts the boolean columns, e.g. ``int`` for 0/1 in CSV.
+    """
+    row = [
+        record.assessment_date, record.wpi_score, record.ss_2a_score, record.ss_2b_score,
+        record.total_ss_score, flag(record.meets_criteria),
+        record.fatigue, record.waking, record.cognitive, flag(record.no_pain_areas)
+    ]
+    if layout == "bitmask":
+        row += [record.pain_mask, record.symptom_mask]
+    else:
+        pain_mask, symptom_mask = record.pain_mask, record.symptom_mask
+        row += [flag(pain_mask >> bit & 1) for bit in _PAIN_BITS]
+        row += [flag(symptom_mask >> bit & 1) for bit in _SYMPTOM_BITS]
+    return row
+
+def _chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_csv(records, layout="bitmask", chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield CSV bytes, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(export_columns(layout))
+    for chunk in _chunks(records, chunk_size):
+        writer.writerows(export_row(record, layout, int) for record in chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def iter_jsonl(records, layout="bitmask", chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield JSONL bytes, one object per record"""
+    columns = export_columns(layout)
+    for chunk in _chunks(records, chunk_size):
+        lines = [json.dumps(dict(zip(columns, export_row(record, layout)))) for record in chunk]
+        lines.append("")
+        yield "\n".join(lines).encode("utf-8")
+
+
+def _require_pyarrow(fmt):
+    try:
+        import pyarrow
+    except ImportError:
+        raise ValueError(f"{fmt} export needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+def arrow_schema(layout="bitmask"):
+    """pyarrow schema of an export in the given layout"""
+    pa = _require_pyarrow("arrow")
+    flag_column = "no_pain_areas" if layout == "bitmask" else NONE_OF_THESE_AREAS
+    fields = [
+        ("assessment_date", pa.string()), ("wpi_score", pa.int8()), ("ss_2a_score", pa.int8()),
+        ("ss_2b_score", pa.int8()), ("total_ss_score", pa.int8()),
+        ("meets_diagnostic_criteria", pa.bool_()), ("fatigue", pa.int8()),
+        ("waking_unrefreshed", pa.int8()), ("cognitive_symptoms", pa.int8()),
+        (flag_column, pa.bool_()),
+    ]
+    if layout == "bitmask":
+        fields += [("pain_mask", pa.uint32()), ("symptom_mask", pa.uint64())]
+    else:
+        fields += [(label, pa.bool_()) for label in PAIN_AREAS + OTHER_SYMPTOMS]
+    return pa.schema(fields)
+
+def record_batch(records, layout="bitmask"):
+    """One pyarrow RecordBatch for a list of records"""
+    import numpy as np
+    pa = _require_pyarrow("arrow")
+    schema = arrow_schema(layout)
+    columns = [
+        [record.assessment_date for record in records],
+        [record.wpi_score for record in records],
+        [record.ss_2a_score for record in records],
+        [record.ss_2b_score for record in records],
+        [record.total_ss_score for record in records],
+        [record.meets_criteria for record in records],
+        [record.fatigue for record in records],
+        [record.waking for record in records],
+        [record.cognitive for record in records],
+        [record.no_pain_areas for record in records],
+    ]
+    pain_masks = np.fromiter((record.pain_mask for record in records), np.uint32, len(records))
+    symptom_masks = np.fromiter((record.symptom_mask for record in records), np.uint64, len(records))
+    if layout == "bitmask":
+        columns += [pain_masks, symptom_masks]
+    else:
+        # Unpack the masks column-wise rather than record by record
+        columns += list(((pain_masks[:, None] >> np.arange(len(PAIN_AREAS), dtype=np.uint32)) & 1)
+                        .astype(bool).T)
+        columns += list(((symptom_masks[:, None] >> np.arange(len(OTHER_SYMPTOMS), dtype=np.uint64)) & 1)
+                        .astype(bool).T)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+    )
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only file that hands its bytes back through drain()"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+def _iter_pyarrow(records, layout, chunk_size, open_writer):
+    sink = _DrainSink()
+    writer = open_writer(sink, arrow_schema(layout))
+    for chunk in _chunks(records, chunk_size):
+        writer.write_batch(record_batch(chunk, layout))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+def iter_arrow(records, layout="bitmask", chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield an Arrow IPC stream, one record batch per chunk"""
+    pa = _require_pyarrow("arrow")
+    return _iter_pyarrow(records, layout, chunk_size, pa.ipc.new_stream)
+
+def iter_parquet(records, layout="bitmask", chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield a Parquet file, one row group per chunk"""
+    _require_pyarrow("parquet")
+    import pyarrow.parquet as pq
+    return _iter_pyarrow(records, layout, chunk_size, pq.ParquetWriter)
+
+EXPORTERS = {
+    "csv": iter_csv,
+    "jsonl": iter_jsonl,
+    "arrow": iter_arrow,
+    "parquet": iter_parquet,
+}
+
+def iter_export(records, fmt="csv", layout="bitmask", chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the export of records as byte chunks.
+
+    Raises ValueError up front for an unknown format or layout, or when
+    pyarrow is needed and missing.
+    """
+    if fmt not in EXPORTERS:
+        raise ValueError(f"unknown export format {fmt!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    export_columns(layout)
+    if fmt in ("arrow", "parquet"):
+        _require_pyarrow(fmt)
+    return EXPORTERS[fmt](records, layout, chunk_size)
+
+def write_export(records, stream, fmt="csv", layout="bitmask", chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write the export to a binary stream; returns the bytes written"""
+    written = 0
+    for data in iter_export(records, fmt, layout, chunk_size):
+        stream.write(data)
+        written += len(data)
+    return written
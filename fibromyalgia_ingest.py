@@ -0,0 +1,432 @@
+"""Bulk ingest of downloaded assessment export files into one dataset.
+
+Usage:
+    python -m fibromyalgia_app ingest exports/ -o dataset/ --workers 8
+
+Scans a directory tree for the files the app's export section downloads
+(``fibromyalgia_assessment_*.json`` and ``*.csv``). Each file is parsed and
+validated in a worker pool. Three shapes are accepted:
+
+- ``json``: the current JSON export, with answers and severities
+- ``json-v1``: JSON exported before the severities were included (pain
+  areas and symptoms only)
+- ``csv``: the one-row CSV export (scores, pain area and symptom counts)
+
+The stored scores are re-checked against the scoring functions as far as
+each shape allows (SS 2a needs the severities), and every row records the
+fields that disagree in ``mismatched_fields``; the stored values are kept.
+Rows are deduplicated by a SHA-256 hash of their parsed content, so the
+same assessment downloaded twice, or re-saved with other whitespace, is
+ingested once. A JSON and a CSV export of the same assessment have
+different content and are both kept.
+
+The output directory holds Parquet parts (needs pyarrow) and
+``manifest.jsonl``, one line per file processed with its size, mtime,
+status and the hashes of all its rows. Each hash is written to a part
+once; a file whose rows were all seen in other files is a ``duplicate``
+entry that still lists them. Files are committed in batches. A batch's part is
+written and renamed into place, then its entries are appended with a
+closing ``{"commit": part}`` line. Entries without a commit line after
+them, and parts no committed entry names, are from an interrupted run;
+they are discarded and those files are processed again. A re-run
+therefore only processes files that are new or changed since they were
+committed. ``read_dataset`` keeps a row while the latest entry of any
+file lists its hash, so a changed file's new rows supersede those of its
+earlier version, and content it shared with other files stays.
+"""
+
+import csv
+import fnmatch
+import hashlib
+import io
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from fibromyalgia_scoring import (
+    OTHER_SYMPTOMS, MAX_SEVERITY, MAX_WPI_SCORE, MAX_SS_SCORE,
+    calculate_ss_score_2b, evaluate_diagnostic_criteria
+)
+from fibromyalgia_record import encode_pain_areas, encode_symptoms
+from fibromyalgia_cli import SEVERITY_FIELDS
+
+DEFAULT_PATTERNS = ("fibromyalgia_assessment_*.json", "fibromyalgia_assessment_*.csv")
+
+MANIFEST_NAME = "manifest.jsonl"
+
+# Files per Parquet part (and per manifest flush)
+DEFAULT_BATCH_FILES = 5_000
+
+SCORE_RANGES = {
+    "wpi_score": MAX_WPI_SCORE,
+    "ss_2a_score": 3 * MAX_SEVERITY,
+    "ss_2b_score": 3,
+    "total_ss_score": MAX_SS_SCORE,
+}
+
+# Column headers of the app's CSV export -> dataset fields
+CSV_EXPORT_FIELDS = {
+    "Assessment Date": "assessment_date",
+    "WPI Score": "wpi_score",
+    "SS 2a Score": "ss_2a_score",
+    "SS 2b Score": "ss_2b_score",
+    "Total SS Score": "total_ss_score",
+    "Meets Criteria": "meets_diagnostic_criteria",
+    "Pain Areas Count": "pain_area_count",
+    "Other Symptoms Count": "symptom_count",
+}
+CSV_EXPORT_COLUMNS = list(CSV_EXPORT_FIELDS)
+
+DATASET_COLUMNS = [
+    "content_hash", "source_path", "source_row", "source_format", "assessment_date",
+    "wpi_score", "ss_2a_score", "ss_2b_score", "total_ss_score", "meets_diagnostic_criteria",
+    "fatigue", "waking_unrefreshed", "cognitive_symptoms", "no_pain_areas", "pain_mask",
+    "symptom_mask", "symptom_count", "mismatched_fields"
+]
+
+IngestStats = namedtuple("IngestStats", [
+    "files", "skipped", "rows", "duplicates", "rejected", "mismatches", "seconds"
+])
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ValueError("ingest writes Parquet and needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+def dataset_schema():
+    """pyarrow schema of the ingested dataset"""
+    pa = _require_pyarrow()
+    types = {
+        "content_hash": pa.string(), "source_path": pa.string(), "source_row": pa.int32(),
+        "source_format": pa.string(), "assessment_date": pa.string(),
+        "meets_diagnostic_criteria": pa.bool_(), "no_pain_areas": pa.bool_(),
+        "pain_mask": pa.uint32(), "symptom_mask": pa.uint64(), "mismatched_fields": pa.string(),
+    }
+    return pa.schema([(name, types.get(name, pa.int8())) for name in DATASET_COLUMNS])
+
+def find_files(root, patterns=DEFAULT_PATTERNS):
+    """Paths under root whose names match any pattern, sorted"""
+    paths = []
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories.sort()
+        paths.extend(os.path.join(directory, name) for name in sorted(names)
+                     if any(fnmatch.fnmatch(name, pattern) for pattern in patterns))
+    return paths
+
+
+def _int_field(data, field, maximum):
+    value = data.get(field)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{field} must be an integer, got {value!r}")
+    if not 0 <= value <= maximum:
+        raise ValueError(f"{field} out of range 0-{maximum}: {value}")
+    return value
+
+def _label_list(data, field):
+    value = data.get(field)
+    if not isinstance(value, list) or not all(isinstance(label, str) for label in value):
+        raise ValueError(f"{field} must be a list of labels")
+    return value
+
+def score_mismatches(row, ss_2a_score=None):
+    """Fields whose stored score disagrees with the scoring functions.
+
+    ``row`` needs the stored scores plus ``pain_area_count`` and
+    ``symptom_count``; ``ss_2a_score`` is the SS 2a rescored from the
+    severities, when known.
+    """
+    expected = {
+        "wpi_score": row["pain_area_count"],
+        "ss_2a_score": row["ss_2a_score"] if ss_2a_score is None else ss_2a_score,
+        "ss_2b_score": calculate_ss_score_2b(row["symptom_count"]),
+    }
+    expected["total_ss_score"] = expected["ss_2a_score"] + expected["ss_2b_score"]
+    expected["meets_diagnostic_criteria"] = evaluate_diagnostic_criteria(
+        expected["wpi_score"], expected["total_ss_score"])
+    return [field for field, value in expected.items() if row[field] != value]
+
+def parse_json_export(data):
+    """Validate one JSON export; returns (source_format, values, mismatched fields)"""
+    if not isinstance(data, dict):
+        raise ValueError("not a JSON object")
+    date = data.get("assessment_date")
+    if date is not None and not isinstance(date, str):
+        raise ValueError("assessment_date must be a string")
+    row = {field: _int_field(data, field, maximum) for field, maximum in SCORE_RANGES.items()}
+    if not isinstance(data.get("meets_diagnostic_criteria"), bool):
+        raise ValueError("meets_diagnostic_criteria must be true or false")
+    row["meets_diagnostic_criteria"] = data["meets_diagnostic_criteria"]
+    pain_mask, no_pain_areas = encode_pain_areas(_label_list(data, "pain_areas"))
+    symptom_mask = encode_symptoms(_label_list(data, "other_symptoms"))
+    row.update(assessment_date=date, pain_mask=pain_mask, no_pain_areas=no_pain_areas,
+               symptom_mask=symptom_mask, pain_area_count=bin(pain_mask).count("1"),
+               symptom_count=bin(symptom_mask).count("1"))
+
+    present = [field for field in SEVERITY_FIELDS if field in data]
+    if not present:
+        row.update({field: None for field in SEVERITY_FIELDS})
+        return "json-v1", row, score_mismatches(row)
+    if len(present) < len(SEVERITY_FIELDS):
+        raise ValueError(f"missing field: {(set(SEVERITY_FIELDS) - set(present)).pop()}")
+    row.update({field: _int_field(data, field, MAX_SEVERITY) for field in SEVERITY_FIELDS})
+    return "json", row, score_mismatches(row, sum(row[field] for field in SEVERITY_FIELDS))
+
+def parse_csv_export_row(values):
+    """Validate one CSV export row keyed by CSV_EXPORT_COLUMNS; returns (values, mismatched fields)"""
+    # DictReader fills a short row with None and keys extra cells under None
+    if None in values:
+        raise ValueError(f"{len(values[None])} more cells than columns")
+    missing = [column for column in CSV_EXPORT_COLUMNS if values.get(column) is None]
+    if missing:
+        raise ValueError(f"missing cells: {', '.join(missing)}")
+    numbers = {}
+    ranges = dict(SCORE_RANGES, pain_area_count=MAX_WPI_SCORE, symptom_count=len(OTHER_SYMPTOMS))
+    for column, field in CSV_EXPORT_FIELDS.items():
+        if field not in ranges:
+            continue
+        try:
+            numbers[field] = int(values[column])
+        except ValueError:
+            raise ValueError(f"{column} must be an integer, got {values[column]!r}") from None
+        if not 0 <= numbers[field] <= ranges[field]:
+            raise ValueError(f"{column} out of range: {numbers[field]}")
+    if values["Meets Criteria"] not in ("True", "False"):
+        raise ValueError(f"Meets Criteria must be True or False, got {values['Meets Criteria']!r}")
+    row = dict(numbers, assessment_date=values["Assessment Date"] or None,
+               meets_diagnostic_criteria=values["Meets Criteria"] == "True",
+               pain_mask=None, no_pain_areas=None, symptom_mask=None,
+               **{field: None for field in SEVERITY_FIELDS})
+    return row, score_mismatches(row)
+
+def _content_hash(source_format, content):
+    canonical = json.dumps([source_format, content], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def parse_file(path):
+    """Worker: parse and validate one export file.
+
+    Returns (path, rows, error): dataset rows without ``source_path``, or
+    the reason the file was rejected.
+    """
+    try:
+        with open(path, "rb") as f:
+            text = f.read().decode("utf-8-sig")
+        rows = []
+        if path.lower().endswith(".json"):
+            data = json.loads(text)
+            source_format, row, mismatches = parse_json_export(data)
+            rows.append((1, source_format, _content_hash(source_format, data), row, mismatches))
+        else:
+            reader = csv.DictReader(io.StringIO(text, newline=""))
+            missing = [column for column in CSV_EXPORT_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"missing CSV columns: {', '.join(missing)}")
+            for line, values in enumerate(reader, start=2):
+                try:
+                    row, mismatches = parse_csv_export_row(values)
+                except ValueError as exc:
+                    raise ValueError(f"line {line}: {exc}") from None
+                content = {column: values[column] for column in CSV_EXPORT_COLUMNS}
+                rows.append((line, "csv", _content_hash("csv", content), row, mismatches))
+            if not rows:
+                raise ValueError("no rows")
+    except (OSError, UnicodeDecodeError, ValueError) as exc:
+        return path, [], str(exc)
+    return path, [
+        dict({name: row.get(name) for name in DATASET_COLUMNS}, content_hash=content_hash,
+             source_row=source_row, source_format=source_format,
+             mismatched_fields=",".join(mismatches))
+        for source_row, source_format, content_hash, row, mismatches in rows
+    ], None
+
+
+def _read_manifest(path):
+    """(committed entries, bytes up to the last commit line) of a manifest file"""
+    entries, pending, committed_size = [], [], 0
+    if not os.path.exists(path):
+        return entries, committed_size
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            entry = json.loads(line)
+            if "commit" in entry:
+                entries.extend(pending)
+                pending = []
+                committed_size = f.tell()
+            else:
+                pending.append(entry)
+    return entries, committed_size
+
+def read_manifest(output_dir):
+    """Committed manifest entries of a dataset directory, oldest first.
+
+    Entries after the last ``{"commit": ...}`` line are from a batch an
+    interrupted run did not finish, and are left out.
+    """
+    return _read_manifest(os.path.join(output_dir, MANIFEST_NAME))[0]
+
+def current_entries(entries):
+    """The latest manifest entry of each path"""
+    return {entry["path"]: entry for entry in entries}
+
+def read_dataset(output_dir):
+    """The ingested dataset as one pyarrow Table, one row per current hash.
+
+    A row is kept while the latest manifest entry of any file lists its
+    hash. If a hash was written more than once (its first file changed,
+    then it came back), the row whose file still lists it is preferred.
+    """
+    _require_pyarrow()
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    entries = read_manifest(output_dir)
+    parts = sorted({entry["part"] for entry in entries if entry.get("part")})
+    tables = [pq.read_table(os.path.join(output_dir, part)) for part in parts]
+    if not tables:
+        return dataset_schema().empty_table()
+    table = pa.concat_tables(tables)
+    current = current_entries(entries)
+    live = pa.array(list({content_hash for entry in current.values()
+                          for content_hash in entry.get("hashes", ())}), pa.string())
+    table = table.filter(pc.is_in(table.column("content_hash"), value_set=live))
+    if not table.num_rows:
+        return table
+
+    pairs = pa.array([f"{path}\0{content_hash}" for path, entry in current.items()
+                      for content_hash in entry.get("hashes", ())], pa.string())
+    keys = pc.binary_join_element_wise(table.column("source_path"), table.column("content_hash"), "\0")
+    # Order rows from files that still list them first, then keep the first of each hash
+    rows = table.num_rows
+    stale = pc.invert(pc.is_in(keys, value_set=pairs)).to_numpy(zero_copy_only=False)
+    order = stale.astype(np.int64) * rows + np.arange(rows)
+    first = pa.table({"hash": table.column("content_hash"), "order": order}).group_by("hash").aggregate(
+        [("order", "min")]).column("order_min").to_numpy()
+    return table.take(np.sort(first % rows))
+
+def _file_key(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def _write_part(output_dir, index, rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = dataset_schema()
+    name = f"part-{index:05d}.parquet"
+    table = pa.Table.from_pydict({field.name: [row[field.name] for row in rows] for field in schema},
+                                 schema=schema)
+    temporary = os.path.join(output_dir, name + ".tmp")
+    pq.write_table(table, temporary)
+    os.replace(temporary, os.path.join(output_dir, name))
+    return name
+
+def _commit_batch(output_dir, manifest, part_index, rows, entries):
+    """Write a part for rows, then record entries and a commit line in the manifest"""
+    part = _write_part(output_dir, part_index, rows) if rows else None
+    for entry in entries:
+        if entry.pop("new_rows", 0):
+            entry["part"] = part
+    # Readers ignore entries without a commit line after them, so a batch
+    # cut short by a crash is redone as a whole
+    manifest.write("".join(json.dumps(entry) + "\n" for entry in entries + [{"commit": part}]))
+    manifest.flush()
+    os.fsync(manifest.fileno())
+
+def ingest(root, output_dir, workers=1, patterns=DEFAULT_PATTERNS, batch_files=DEFAULT_BATCH_FILES,
+           progress=None):
+    """Ingest export files under root into the dataset in output_dir.
+
+    Files already in the manifest with the same size and mtime are
+    skipped. ``progress`` is called with the running IngestStats after
+    each batch. Returns the final IngestStats.
+    """
+    _require_pyarrow()
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    entries, committed_size = _read_manifest(manifest_path)
+    if os.path.exists(manifest_path) and os.path.getsize(manifest_path) > committed_size:
+        # Drop an unfinished batch so the next commit line does not cover it
+        with open(manifest_path, "r+b") as f:
+            f.truncate(committed_size)
+    current = current_entries(entries)
+    done = {path: (entry["size"], entry["mtime_ns"]) for path, entry in current.items()}
+    # A re-ingested file supersedes its earlier rows, so only current hashes count
+    hashes = {content_hash for entry in current.values() for content_hash in entry.get("hashes", ())}
+    previous = {path: set(entry.get("hashes", ())) for path, entry in current.items()}
+    parts = {entry["part"] for entry in entries if entry.get("part")}
+    for name in os.listdir(output_dir):
+        if name.startswith("part-") and name not in parts:
+            os.remove(os.path.join(output_dir, name))
+    part_index = max((int(part[5:10]) for part in parts), default=-1) + 1
+
+    paths, keys, skipped = [], {}, 0
+    for path in find_files(root, patterns):
+        path = os.path.abspath(path)
+        keys[path] = _file_key(path)
+        if done.get(path) == keys[path]:
+            skipped += 1
+        else:
+            paths.append(path)
+
+    stats = IngestStats(0, skipped, 0, 0, 0, 0, 0.0)
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            results = pool.map(parse_file, paths, chunksize=64) if pool else map(parse_file, paths)
+            batch_rows, batch_entries = [], []
+            for path, rows, error in results:
+                size, mtime_ns = keys[path]
+                entry = {"path": path, "size": size, "mtime_ns": mtime_ns}
+                # Rows this file already had (it was touched or re-saved) are
+                # neither new nor duplicates; they stay where they were written
+                own = previous.get(path, set())
+                new_rows, duplicates = [], 0
+                for row in rows:
+                    if row["content_hash"] in own:
+                        continue
+                    if row["content_hash"] in hashes:
+                        duplicates += 1
+                    else:
+                        hashes.add(row["content_hash"])
+                        new_rows.append(dict(row, source_path=path))
+                if error:
+                    entry.update(status="rejected", error=error)
+                else:
+                    entry.update(status="duplicate" if duplicates == len(rows) else "ingested",
+                                 hashes=[row["content_hash"] for row in rows], new_rows=len(new_rows))
+                batch_rows.extend(new_rows)
+                batch_entries.append(entry)
+                stats = stats._replace(
+                    files=stats.files + 1, rows=stats.rows + len(new_rows),
+                    duplicates=stats.duplicates + duplicates,
+                    rejected=stats.rejected + bool(error),
+                    mismatches=stats.mismatches + sum(1 for row in new_rows if row["mismatched_fields"]))
+                if len(batch_entries) >= batch_files:
+                    _commit_batch(output_dir, manifest, part_index, batch_rows, batch_entries)
+                    part_index += bool(batch_rows)
+                    batch_rows, batch_entries = [], []
+                    if progress:
+                        progress(stats._replace(seconds=time.perf_counter() - start))
+            if batch_entries:
+                _commit_batch(output_dir, manifest, part_index, batch_rows, batch_entries)
+        finally:
+            if pool:
+                pool.shutdown()
+    return stats._replace(seconds=time.perf_counter() - start)
+
+def format_ingest_stats(stats):
+    """One-line summary of an ingest run"""
+    rate = stats.files / stats.seconds if stats.seconds else 0.0
+    return (f"{stats.files:,} files in {stats.seconds:.1f}s ({rate:,.0f} files/s), "
+            f"{stats.skipped:,} already ingested: {stats.rows:,} rows added, "
+            f"{stats.duplicates:,} duplicates, {stats.rejected:,} files rejected, "
+            f"{stats.mismatches:,} rows with score mismatches")
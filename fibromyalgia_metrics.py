@@ -0,0 +1,299 @@
+"""Phase timings, counters and optional per-request profiling for the app.
+
+Everything is off unless FIBRO_METRICS=1. When off, ``phase()`` returns a
+shared no-op context manager and ``timed()`` returns the function unchanged,
+so instrumented code pays for little more than a function call.
+
+Settings (environment variables):
+
+- ``FIBRO_METRICS=1``: collect phase timings and counters
+- ``FIBRO_METRICS_PORT``: serve Prometheus text format on
+  ``http://<FIBRO_METRICS_HOST>:<port>/metrics`` (default 9464, "" for none)
+- ``FIBRO_METRICS_LOG_INTERVAL``: also log a JSON snapshot every N seconds
+- ``FIBRO_PROFILING=1``: allow profiling a single rerun with ``?profile=1``
+  in the app URL; stats go to FIBRO_PROFILE_DIR and the log
+
+Usage:
+    with metrics.phase("scoring"):
+        ...
+    metrics.count_submission(record.meets_criteria)
+
+Modules with caches make their counters visible with
+``metrics.register_caches(func)``, where ``func`` returns
+``{cache_name: {"hits": ..., "misses": ..., "currsize": ...}}``.
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("FIBRO_METRICS", "") == "1"
+PROFILING_ENABLED = os.environ.get("FIBRO_PROFILING", "") == "1"
+METRICS_HOST = os.environ.get("FIBRO_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = os.environ.get("FIBRO_METRICS_PORT", "9464")
+LOG_INTERVAL = float(os.environ.get("FIBRO_METRICS_LOG_INTERVAL", "0") or 0)
+PROFILE_DIR = os.environ.get("FIBRO_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "fibromyalgia-profiles"))
+
+# A session counts as active if it reran within this many seconds
+SESSION_TTL = float(os.environ.get("FIBRO_METRICS_SESSION_TTL", "300"))
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PHASES = ("rerun", "form_render", "scoring", "session_state_write", "store_submit", "charts", "export")
+
+COUNTERS = {
+    "submissions": "Assessments submitted",
+    "criteria_met": "Submitted assessments that meet the diagnostic criteria",
+    "profiled_reruns": "Reruns profiled with ?profile=1",
+    "store_retries": "Store commits retried after an SQLite error",
+    "store_failures": "Assessments the store could not commit, spooled to <store>.failed.jsonl",
+}
+
+
+class PhaseHistogram:
+    """Cumulative-bucket histogram of one phase's durations"""
+
+    __slots__ = ("bucket_counts", "count", "total")
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+
+class Metrics:
+    """Thread-safe registry of phase histograms, counters and sessions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {name: PhaseHistogram() for name in PHASES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._sessions = {}
+        self._cache_sources = []
+
+    def register_caches(self, cache_info):
+        with self._lock:
+            self._cache_sources.append(cache_info)
+
+    def cache_stats(self):
+        """{cache_name: info dict} from every registered source"""
+        with self._lock:
+            sources = list(self._cache_sources)
+        stats = {}
+        for cache_info in sources:
+            stats.update(cache_info())
+        return stats
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = PhaseHistogram()
+            histogram.observe(seconds)
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def touch_session(self, session_id):
+        with self._lock:
+            self._sessions[session_id] = time.monotonic()
+
+    def active_sessions(self):
+        cutoff = time.monotonic() - SESSION_TTL
+        with self._lock:
+            for session_id in [sid for sid, seen in self._sessions.items() if seen < cutoff]:
+                del self._sessions[session_id]
+            return len(self._sessions)
+
+    def snapshot(self):
+        """Plain-dict copy of every metric, for JSON logging"""
+        active = self.active_sessions()
+        caches = self.cache_stats()
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "active_sessions": active,
+                "caches": {name: {"hits": info["hits"], "misses": info["misses"], "size": info["currsize"]}
+                           for name, info in caches.items()},
+                "phases": {
+                    name: {"count": histogram.count, "total_seconds": histogram.total,
+                           "mean_ms": histogram.total / histogram.count * 1000 if histogram.count else 0.0}
+                    for name, histogram in self.phases.items()
+                },
+            }
+
+    def render_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        active = self.active_sessions()
+        caches = self.cache_stats()
+        lines = []
+        for field, kind, help_text in (("hits", "counter", "Cache lookups that found an entry"),
+                                       ("misses", "counter", "Cache lookups that built a new entry"),
+                                       ("currsize", "gauge", "Entries held in the cache")):
+            metric = f"fibro_cache_{field}_total" if kind == "counter" else "fibro_cache_entries"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            lines += [f'{metric}{{cache="{name}"}} {info[field]}' for name, info in caches.items()]
+        with self._lock:
+            for name, help_text in COUNTERS.items():
+                lines += [f"# HELP fibro_{name}_total {help_text}",
+                          f"# TYPE fibro_{name}_total counter",
+                          f"fibro_{name}_total {self.counters.get(name, 0)}"]
+            lines += ["# HELP fibro_active_sessions Sessions that reran in the last "
+                      f"{SESSION_TTL:g} seconds",
+                      "# TYPE fibro_active_sessions gauge",
+                      f"fibro_active_sessions {active}",
+                      "# HELP fibro_phase_seconds Server time per app phase",
+                      "# TYPE fibro_phase_seconds histogram"]
+            for name, histogram in self.phases.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'fibro_phase_seconds_bucket{{phase="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'fibro_phase_seconds_sum{{phase="{name}"}} {histogram.total:.6f}')
+                lines.append(f'fibro_phase_seconds_count{{phase="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+_NO_PHASE = contextlib.nullcontext()
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        metrics.observe(self.name, time.perf_counter() - self.start)
+
+def phase(name):
+    """Context manager timing one phase (a no-op when metrics are off)"""
+    return _Phase(name) if ENABLED else _NO_PHASE
+
+def timed(name):
+    """Decorator timing every call as a phase; leaves func as is when off"""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count_submission(meets_criteria):
+    if ENABLED:
+        metrics.increment("submissions")
+        if meets_criteria:
+            metrics.increment("criteria_met")
+
+def increment(counter, amount=1):
+    if ENABLED:
+        metrics.increment(counter, amount)
+
+def register_caches(cache_info):
+    """Report the caches described by ``cache_info()`` with the other metrics"""
+    metrics.register_caches(cache_info)
+
+def touch_session(session_id):
+    if ENABLED:
+        metrics.touch_session(session_id)
+
+
+@contextlib.contextmanager
+def profiled(label, top=25):
+    """Profile the block with cProfile; saves a .prof file and logs the top calls"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix=f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-",
+                                    suffix=".prof", dir=PROFILE_DIR)
+        os.close(fd)
+        profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(top)
+        _ensure_log_handler()
+        logger.info("Profiled %s, stats saved to %s\n%s", label, path, report.getvalue())
+        if ENABLED:
+            metrics.increment("profiled_reruns")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _ensure_log_handler():
+    # Streamlit only configures its own loggers; make ours visible too
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+def _log_loop(interval):
+    while True:
+        time.sleep(interval)
+        logger.info("metrics %s", json.dumps(metrics.snapshot()))
+
+def start_exporters():
+    """Start the /metrics server and JSON log thread that are configured.
+
+    Call once per process; returns the HTTP server (or None).
+    """
+    if not ENABLED:
+        return None
+    _ensure_log_handler()
+    if LOG_INTERVAL > 0:
+        threading.Thread(target=_log_loop, args=(LOG_INTERVAL,), name="metrics-log",
+                         daemon=True).start()
+    if not METRICS_PORT:
+        return None
+    try:
+        server = ThreadingHTTPServer((METRICS_HOST, int(METRICS_PORT)), _MetricsHandler)
+    except OSError as exc:
+        logger.warning("Metrics endpoint not started on port %s: %s", METRICS_PORT, exc)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%s/metrics", METRICS_HOST, server.server_port)
+    return server
@@ -0,0 +1,156 @@
+"""Multi-core scoring of large assessment files.
+
+The input file is split into byte ranges that start and end on line
+boundaries. Each range is scored in a worker process with the same
+``score_stream`` pipeline as the single-process scorer, written to a part
+file, and the parts are concatenated in input order. The output and reject
+files are identical to a single-process run, including reject line numbers.
+
+CSV input must keep each row on one line (no quoted newlines), which holds
+for raw-answer files since none of the cells contain line breaks.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from fibromyalgia_cli import RejectWriter, ScoreStats, iter_csv_rows, score_stream
+
+# Smallest byte range worth sending to a worker
+MIN_CHUNK_BYTES = 1 << 20
+
+# Chunks per worker, so a slow chunk does not leave the other workers idle
+CHUNKS_PER_WORKER = 4
+
+
+def split_byte_ranges(path, chunks, skip_header=False):
+    """Split a file into at most ``chunks`` (start, end) ranges on line boundaries.
+
+    Returns ``(header, ranges)`` where header is the first line when
+    ``skip_header`` is set (as bytes, otherwise ``b""``). There is always at
+    least one range, possibly empty.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline() if skip_header else b""
+        first = f.tell()
+        boundaries = [first]
+        for i in range(1, chunks):
+            target = first + (size - first) * i // chunks
+            if target <= boundaries[-1]:
+                continue
+            # Reading from one byte back lands on target if it is a line start
+            f.seek(target - 1)
+            f.readline()
+            position = f.tell()
+            if boundaries[-1] < position < size:
+                boundaries.append(position)
+    boundaries.append(max(size, first))
+    return header, list(zip(boundaries, boundaries[1:]))
+
+def _read_lines(path, start, end, counter):
+    """Yield the lines of a byte range, counting them in counter[0]"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            counter[0] += 1
+            yield line
+
+def _score_chunk(task):
+    """Worker: score one byte range into a part file"""
+    path, start, end, header, input_format, output_format, part_path, write_header = task
+
+    line_count = [0]
+    lines = _read_lines(path, start, end, line_count)
+    if header:
+        lines = chain([header], lines)
+
+    rejects = RejectWriter(part_path + ".rejects")
+    try:
+        with open(part_path, "w", encoding="utf-8", newline="") as output_stream:
+            stats = score_stream(lines, output_stream, rejects, input_format, output_format,
+                                 header=write_header)
+    finally:
+        rejects.close()
+    return stats, line_count[0]
+
+def _merge_parts(part_paths, output_stream):
+    for part_path in part_paths:
+        with open(part_path, "r", encoding="utf-8", newline="") as part:
+            shutil.copyfileobj(part, output_stream)
+
+def _merge_rejects(part_paths, line_offsets, rejects):
+    """Copy part rejects into rejects, shifting line numbers to the whole file"""
+    for part_path, offset in zip(part_paths, line_offsets):
+        rejects_path = part_path + ".rejects"
+        if not os.path.exists(rejects_path):
+            continue
+        with open(rejects_path, "r", encoding="utf-8") as part:
+            for line in part:
+                reject = json.loads(line)
+                rejects.write(reject["line"] + offset, reject["raw"], reject["error"])
+
+def score_file_parallel(input_path, output_path, rejects_path, workers, input_format="jsonl",
+                        output_format="jsonl", chunk_bytes=None):
+    """Score input_path into output_path using ``workers`` processes.
+
+    ``output_path`` may be ``"-"`` for stdout. ``chunk_bytes`` overrides the
+    target size of each byte range. Returns the combined ScoreStats.
+    """
+    start_time = time.perf_counter()
+    csv_input = input_format == "csv"
+
+    size = os.path.getsize(input_path)
+    if chunk_bytes:
+        chunks = max(1, size // chunk_bytes)
+    else:
+        chunks = max(1, min(workers * CHUNKS_PER_WORKER, size // MIN_CHUNK_BYTES))
+    header, ranges = split_byte_ranges(input_path, chunks, skip_header=csv_input)
+    if csv_input:
+        # Check the header once here rather than failing in every worker
+        list(iter_csv_rows([header]))
+
+    output_dir = None if output_path == "-" else os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryDirectory(prefix="fibro-score-", dir=output_dir) as tmp_dir:
+        part_paths = [os.path.join(tmp_dir, f"part-{i:05d}") for i in range(len(ranges))]
+        tasks = [
+            (input_path, start, end, header, input_format, output_format, part_path, i == 0)
+            for i, ((start, end), part_path) in enumerate(zip(ranges, part_paths))
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_score_chunk, tasks))
+
+        # Line numbers reported by each chunk start at 1 (the header for CSV)
+        line_offsets = []
+        lines_before = 1 if csv_input else 0
+        for _, line_count in results:
+            line_offsets.append(lines_before - (1 if csv_input else 0))
+            lines_before += line_count
+
+        if output_path == "-":
+            _merge_parts(part_paths, sys.stdout)
+        else:
+            with open(output_path, "w", encoding="utf-8", newline="") as output_stream:
+                _merge_parts(part_paths, output_stream)
+
+        rejects = RejectWriter(rejects_path)
+        try:
+            _merge_rejects(part_paths, line_offsets, rejects)
+        finally:
+            rejects.close()
+
+    return ScoreStats(
+        sum(stats.rows for stats, _ in results),
+        sum(stats.rejected for stats, _ in results),
+        time.perf_counter() - start_time
+    )
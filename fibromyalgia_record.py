@@ -0,0 +1,197 @@
+"""Compact, bit-packed assessment record.
+
+Pain areas are stored as a 19-bit mask and other symptoms as a 41-bit mask,
+with bit ``i`` set when ``PAIN_AREAS[i]`` / ``OTHER_SYMPTOMS[i]`` was checked.
+"""
+
+from fibromyalgia_scoring import (
+    NONE_OF_THESE_AREAS, PAIN_AREAS, OTHER_SYMPTOMS, BODY_REGIONS, MAX_SEVERITY,
+    calculate_ss_score_2a, calculate_ss_score_2b
+)
+from fibromyalgia_criteria import meets_primary_criteria
+
+PAIN_MASK_ALL = (1 << len(PAIN_AREAS)) - 1
+SYMPTOM_MASK_ALL = (1 << len(OTHER_SYMPTOMS)) - 1
+
+# Format of assessment_date in exports
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_PAIN_AREA_BITS = {area: 1 << i for i, area in enumerate(PAIN_AREAS)}
+_SYMPTOM_BITS = {symptom: 1 << i for i, symptom in enumerate(OTHER_SYMPTOMS)}
+
+# Static region index: region names in BODY_REGIONS order, the region of each
+# pain area bit, and one mask per region
+REGION_NAMES = tuple(BODY_REGIONS)
+REGION_SIZES = tuple(len(areas) for areas in BODY_REGIONS.values())
+PAIN_AREA_REGION = tuple(
+    next(r for r, areas in enumerate(BODY_REGIONS.values()) if area in areas)
+    for area in PAIN_AREAS
+)
+REGION_MASKS = tuple(
+    sum(_PAIN_AREA_BITS[area] for area in areas) for areas in BODY_REGIONS.values()
+)
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(mask):
+        """Count the set bits in mask"""
+        return bin(mask).count("1")
+
+
+def encode_pain_areas(pain_areas):
+    """Encode pain area labels as (mask, no_pain_areas)"""
+    mask = 0
+    no_pain_areas = False
+    for area in pain_areas:
+        if area == NONE_OF_THESE_AREAS:
+            no_pain_areas = True
+        elif area in _PAIN_AREA_BITS:
+            mask |= _PAIN_AREA_BITS[area]
+        else:
+            raise ValueError(f"Unknown pain area: {area!r}")
+    return mask, no_pain_areas
+
+def encode_symptoms(symptoms):
+    """Encode other symptom labels as a bit mask"""
+    mask = 0
+    for symptom in symptoms:
+        if symptom not in _SYMPTOM_BITS:
+            raise ValueError(f"Unknown symptom: {symptom!r}")
+        mask |= _SYMPTOM_BITS[symptom]
+    return mask
+
+def decode_mask(mask, labels):
+    """Return the labels whose bits are set in mask, in form order"""
+    return [label for i, label in enumerate(labels) if mask >> i & 1]
+
+def region_counts(pain_mask):
+    """Count the pain areas in each body region, in REGION_NAMES order"""
+    return tuple(popcount(pain_mask & region_mask) for region_mask in REGION_MASKS)
+
+
+class AssessmentRecord:
+    """One submitted assessment: the raw answers plus derived scores"""
+
+    __slots__ = (
+        "pain_mask", "symptom_mask", "no_pain_areas",
+        "fatigue", "waking", "cognitive", "assessment_date"
+    )
+
+    def __init__(self, pain_mask=0, symptom_mask=0, fatigue=0, waking=0, cognitive=0,
+                 no_pain_areas=False, assessment_date=None):
+        if not 0 <= pain_mask <= PAIN_MASK_ALL:
+            raise ValueError(f"pain_mask out of range: {pain_mask}")
+        if not 0 <= symptom_mask <= SYMPTOM_MASK_ALL:
+            raise ValueError(f"symptom_mask out of range: {symptom_mask}")
+        for name, value in (("fatigue", fatigue), ("waking", waking), ("cognitive", cognitive)):
+            if not 0 <= value <= MAX_SEVERITY:
+                raise ValueError(f"{name} must be between 0 and {MAX_SEVERITY}, got {value}")
+
+        self.pain_mask = int(pain_mask)
+        self.symptom_mask = int(symptom_mask)
+        self.no_pain_areas = bool(no_pain_areas)
+        self.fatigue = int(fatigue)
+        self.waking = int(waking)
+        self.cognitive = int(cognitive)
+        self.assessment_date = assessment_date
+
+    @classmethod
+    def from_labels(cls, pain_areas, symptoms, fatigue, waking, cognitive, assessment_date=None):
+        """Build a record from the label lists used on the form"""
+        pain_mask, no_pain_areas = encode_pain_areas(pain_areas)
+        return cls(pain_mask, encode_symptoms(symptoms), fatigue, waking, cognitive,
+                   no_pain_areas, assessment_date)
+
+    @classmethod
+    def from_export_dict(cls, data):
+        """Build a record from a JSON export dict"""
+        try:
+            return cls.from_labels(
+                data["pain_areas"], data["other_symptoms"],
+                data["fatigue"], data["waking_unrefreshed"], data["cognitive_symptoms"],
+                data.get("assessment_date")
+            )
+        except KeyError as exc:
+            raise ValueError(f"Missing field in assessment export: {exc.args[0]}") from None
+
+    # Raw answers
+    @property
+    def pain_areas(self):
+        """Selected pain areas, excluding "None of these areas" """
+        return decode_mask(self.pain_mask, PAIN_AREAS)
+
+    @property
+    def pain_area_labels(self):
+        """Pain area labels exactly as checked on the form"""
+        labels = self.pain_areas
+        if self.no_pain_areas:
+            labels.append(NONE_OF_THESE_AREAS)
+        return labels
+
+    @property
+    def symptoms(self):
+        """Selected other symptoms"""
+        return decode_mask(self.symptom_mask, OTHER_SYMPTOMS)
+
+    @property
+    def symptom_count(self):
+        return popcount(self.symptom_mask)
+
+    # Scores
+    @property
+    def wpi_score(self):
+        return popcount(self.pain_mask)
+
+    @property
+    def ss_2a_score(self):
+        return calculate_ss_score_2a(self.fatigue, self.waking, self.cognitive)
+
+    @property
+    def ss_2b_score(self):
+        return calculate_ss_score_2b(self.symptom_count)
+
+    @property
+    def total_ss_score(self):
+        return self.ss_2a_score + self.ss_2b_score
+
+    @property
+    def meets_criteria(self):
+        """Whether the answers meet PRIMARY_CRITERIA (see fibromyalgia_criteria)"""
+        return meets_primary_criteria(self.wpi_score, self.total_ss_score)
+
+    @property
+    def region_counts(self):
+        return region_counts(self.pain_mask)
+
+    def to_export_dict(self):
+        """Return the JSON export dict for this record"""
+        return {
+            "assessment_date": self.assessment_date,
+            "wpi_score": self.wpi_score,
+            "ss_2a_score": self.ss_2a_score,
+            "ss_2b_score": self.ss_2b_score,
+            "total_ss_score": self.total_ss_score,
+            "meets_diagnostic_criteria": self.meets_criteria,
+            "fatigue": self.fatigue,
+            "waking_unrefreshed": self.waking,
+            "cognitive_symptoms": self.cognitive,
+            "pain_areas": self.pain_area_labels,
+            "other_symptoms": self.symptoms
+        }
+
+    def _key(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if not isinstance(other, AssessmentRecord):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return (f"AssessmentRecord(pain_mask={self.pain_mask:#07x}, symptom_mask={self.symptom_mask:#013x}, "
+                f"fatigue={self.fatigue}, waking={self.waking}, cognitive={self.cognitive}, "
+                f"no_pain_areas={self.no_pain_areas}, assessment_date={self.assessment_date!r})")
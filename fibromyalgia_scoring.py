@@ -0,0 +1,94 @@
+"""Scoring rules for the fibromyalgia assessment.
+
+Kept free of Streamlit/Plotly/pandas imports so the scoring can be reused
+outside the app (batch scoring, command line, services).
+"""
+
+NONE_OF_THESE_AREAS = "None of these areas"
+
+# Pain area options, in the order shown on the form
+PAIN_AREAS = [
+    "Shoulder girdle, left", "Shoulder girdle, right",
+    "Upper arm, left", "Upper arm, right",
+    "Lower arm, left", "Lower arm, right",
+    "Hip (buttock) left", "Hip (buttock) right",
+    "Upper leg left", "Upper leg right",
+    "Lower leg left", "Lower leg right",
+    "Jaw left", "Jaw right",
+    "Chest", "Abdomen", "Neck",
+    "Upper back", "Lower back"
+]
+PAIN_AREA_OPTIONS = PAIN_AREAS + [NONE_OF_THESE_AREAS]
+
+OTHER_SYMPTOMS = [
+    "Muscle pain", "Irritable bowel syndrome", "Fatigue/tiredness", "Thinking or remembering problem",
+    "Muscle Weakness", "Headache", "Pain/cramps in abdomen", "Numbness/tingling",
+    "Dizziness", "Insomnia", "Depression", "Constipation",
+    "Pain in upper abdomen", "Nausea", "Nervousness", "Chest pain",
+    "Blurred vision", "Fever", "Diarrhea", "Dry mouth",
+    "Itching", "Wheezing", "Raynauld's (fingers/toes turn white/blue in cold)", "Hives/welts",
+    "Ringing in ears", "Vomiting", "Heartburn", "Oral ulcers",
+    "Loss/change in taste", "Seizures", "Dry eyes", "Shortness of breath",
+    "Loss of appetite", "Rash", "Sun sensitivity", "Hearing difficulties",
+    "Easy bruising", "Hair loss", "Frequent urination", "Painful urination", "Bladder spasms"
+]
+
+# Body regions used for the pain summaries, each area belongs to exactly one
+BODY_REGIONS = {
+    "Head/Neck": ['Neck', 'Jaw left', 'Jaw right'],
+    "Arms & Shoulders": [
+        'Shoulder girdle, left', 'Shoulder girdle, right',
+        'Upper arm, left', 'Upper arm, right',
+        'Lower arm, left', 'Lower arm, right'
+    ],
+    "Torso": ['Chest', 'Abdomen', 'Upper back', 'Lower back'],
+    "Hips & Legs": [
+        'Hip (buttock) left', 'Hip (buttock) right',
+        'Upper leg left', 'Upper leg right',
+        'Lower leg left', 'Lower leg right'
+    ]
+}
+
+SEVERITY_OPTIONS = [
+    "0 = No problem",
+    "1 = Slight or mild problems; generally mild or intermittent",
+    "2 = Moderate; considerable problems; often present and/or at a moderate level",
+    "3 = Severe: pervasive, continuous, life disturbing problems"
+]
+
+# Score ranges
+MAX_WPI_SCORE = len(PAIN_AREAS)
+MAX_SEVERITY = 3
+MAX_SS_2A_SCORE = 3 * MAX_SEVERITY
+MAX_SS_2B_SCORE = 3
+MAX_SS_SCORE = MAX_SS_2A_SCORE + MAX_SS_2B_SCORE
+
+
+def calculate_wpi_score(pain_areas):
+    """Calculate Widespread Pain Index score"""
+    return len([area for area in pain_areas if area != NONE_OF_THESE_AREAS])
+
+def calculate_ss_score_2a(fatigue, waking, cognitive):
+    """Calculate Symptom Severity Score Part 2a"""
+    return fatigue + waking + cognitive
+
+def calculate_ss_score_2b(symptoms_count):
+    """Calculate Symptom Severity Score Part 2b based on symptom count"""
+    if symptoms_count == 0:
+        return 0
+    elif 1 <= symptoms_count <= 10:
+        return 1
+    elif 11 <= symptoms_count <= 24:
+        return 2
+    else:
+        return 3
+
+def evaluate_diagnostic_criteria(wpi_score, ss_score):
+    """Evaluate if patient meets fibromyalgia diagnostic criteria"""
+    # Criterion 1a: WPI ≥ 7 AND SS ≥ 5
+    criterion_1a = wpi_score >= 7 and ss_score >= 5
+
+    # Criterion 1b: WPI 3-6 AND SS ≥ 9
+    criterion_1b = 3 <= wpi_score <= 6 and ss_score >= 9
+
+    return criterion_1a or criterion_1b
@@ -0,0 +1,292 @@
+"""Monte Carlo simulation of criteria stability and threshold sensitivity.
+
+Synthetic respondents are drawn over the full answer space (19 pain areas,
+three 0-3 severities, 41 other symptoms) from an answer ``Distribution``.
+For each one the engine computes:
+
+- whether the 2010 criteria (``evaluate_diagnostic_criteria``) are met
+- the probability that one random single-answer change flips that
+  result, separately for a pain area added or removed, a severity moved
+  one level, and a symptom added or removed, and over all such changes
+- the distance to the threshold: the fewest single-answer changes that
+  flip the result
+
+The result only depends on the WPI, the SS 2a sum and the symptom count,
+so flip probabilities and distances are looked up in tables over those
+8,400 states. The tables are built once from the scalar scoring functions
+and enumerate every neighbouring answer exactly; only the respondents are
+random. Chunks of respondents are generated from independent child seeds
+of one ``SeedSequence`` and summed into a ``SimulationSummary``. This
+makes the results the same for any number of worker processes.
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from fibromyalgia_scoring import (
+    PAIN_AREAS, OTHER_SYMPTOMS, MAX_SEVERITY, MAX_WPI_SCORE, MAX_SS_SCORE,
+    calculate_ss_score_2b, evaluate_diagnostic_criteria
+)
+
+DEFAULT_CHUNK_SIZE = 250_000
+
+MAX_SS_2A = 3 * MAX_SEVERITY
+
+# Largest possible distance: every pain area, severity step and symptom
+MAX_DISTANCE = len(PAIN_AREAS) + MAX_SS_2A + len(OTHER_SYMPTOMS)
+
+PERTURBATIONS = ("pain_area", "severity", "symptom", "any")
+
+# Answer distribution. Pain areas and symptoms are present with the given
+# probability (a scalar, or one per label). With ``concentration`` set,
+# each respondent instead gets their own probabilities, drawn from a Beta
+# distribution with that mean and concentration (alpha + beta), so the
+# respondents differ in how widespread their pain and symptoms are.
+# Severities are drawn from ``severity_weights`` for 0-3.
+Distribution = namedtuple("Distribution", [
+    "pain_probability", "symptom_probability", "severity_weights", "concentration"
+], defaults=(None,))
+
+# Illustrative presets, not epidemiological estimates
+DISTRIBUTIONS = {
+    "uniform": Distribution(0.5, 0.5, (0.25, 0.25, 0.25, 0.25)),
+    "mixed": Distribution(0.5, 0.5, (0.25, 0.25, 0.25, 0.25), concentration=2.0),
+    "community": Distribution(0.08, 0.08, (0.5, 0.3, 0.15, 0.05), concentration=2.0),
+    "pain_clinic": Distribution(0.4, 0.3, (0.1, 0.3, 0.35, 0.25), concentration=4.0),
+}
+
+
+class SimulationSummary(namedtuple("SimulationSummary", [
+        "respondents", "meets", "flip_sums", "distance_counts", "seconds"])):
+    """Totals over simulated respondents.
+
+    ``flip_sums[kind]`` is a pair of flip probabilities summed over the
+    respondents who do not and who do meet the criteria, for each of
+    PERTURBATIONS. ``distance_counts[meets][d]`` counts respondents at
+    distance ``d`` from the threshold.
+    """
+
+    __slots__ = ()
+
+    @property
+    def meets_rate(self):
+        return self.meets / self.respondents if self.respondents else 0.0
+
+    @property
+    def throughput(self):
+        return self.respondents / self.seconds if self.seconds else 0.0
+
+    def flip_probability(self, kind="any", meets=None):
+        """Mean flip probability, over everyone or only those (not) meeting the criteria"""
+        sums = self.flip_sums[kind]
+        if meets is None:
+            return sum(sums) / self.respondents if self.respondents else 0.0
+        group = self.meets if meets else self.respondents - self.meets
+        return sums[int(meets)] / group if group else 0.0
+
+    def distance_share(self, distance, meets=None):
+        """Share of respondents at most ``distance`` changes from flipping"""
+        counts = self.distance_counts if meets is None else self.distance_counts[int(meets)][None]
+        total = counts.sum()
+        return counts[..., 1:distance + 1].sum() / total if total else 0.0
+
+    def mean_distance(self, meets=None):
+        counts = self.distance_counts.sum(axis=0) if meets is None else self.distance_counts[int(meets)]
+        return (counts * np.arange(len(counts))).sum() / counts.sum() if counts.sum() else 0.0
+
+    def merge(self, other):
+        """Summary over both sets of respondents; seconds are added"""
+        return SimulationSummary(
+            self.respondents + other.respondents,
+            self.meets + other.meets,
+            {kind: tuple(a + b for a, b in zip(self.flip_sums[kind], other.flip_sums[kind]))
+             for kind in PERTURBATIONS},
+            self.distance_counts + other.distance_counts,
+            self.seconds + other.seconds,
+        )
+
+def empty_summary():
+    return SimulationSummary(0, 0, {kind: (0.0, 0.0) for kind in PERTURBATIONS},
+                             np.zeros((2, MAX_DISTANCE + 1), dtype=np.int64), 0.0)
+
+
+@lru_cache(maxsize=1)
+def state_tables():
+    """Lookup tables over (WPI, SS 2a, symptom count) states.
+
+    Returns a dict of arrays of shape (20, 10, 42): ``meets``, the flip
+    probabilities for one pain area (``pain_area``) or symptom
+    (``symptom``) toggled at random, whether one severity level up
+    (``severity_up``) or down (``severity_down``) flips the result, and
+    ``distance``.
+    """
+    meets_by_score = np.array([[evaluate_diagnostic_criteria(wpi, ss) for ss in range(MAX_SS_SCORE + 1)]
+                               for wpi in range(MAX_WPI_SCORE + 1)])
+    ss_2b = np.array([calculate_ss_score_2b(count) for count in range(len(OTHER_SYMPTOMS) + 1)])
+    wpi, ss_2a, count = np.meshgrid(np.arange(MAX_WPI_SCORE + 1), np.arange(MAX_SS_2A + 1),
+                                    np.arange(len(OTHER_SYMPTOMS) + 1), indexing="ij")
+    meets = meets_by_score[wpi, ss_2a + ss_2b[count]]
+
+    def flips(wpi, ss_2a, count):
+        """Whether moving to a state flips the result; False outside the answer space"""
+        valid = ((wpi >= 0) & (wpi <= MAX_WPI_SCORE) & (ss_2a >= 0) & (ss_2a <= MAX_SS_2A)
+                 & (count >= 0) & (count <= len(OTHER_SYMPTOMS)))
+        wpi, ss_2a, count = (np.clip(wpi, 0, MAX_WPI_SCORE), np.clip(ss_2a, 0, MAX_SS_2A),
+                             np.clip(count, 0, len(OTHER_SYMPTOMS)))
+        return valid & (meets_by_score[wpi, ss_2a + ss_2b[count]] != meets)
+
+    areas, symptoms = len(PAIN_AREAS), len(OTHER_SYMPTOMS)
+    tables = {
+        "meets": meets,
+        # Of the 19 areas, WPI are selected (removing one lowers WPI) and the rest are not
+        "pain_area": (wpi * flips(wpi - 1, ss_2a, count)
+                      + (areas - wpi) * flips(wpi + 1, ss_2a, count)) / areas,
+        "symptom": (count * flips(wpi, ss_2a, count - 1)
+                    + (symptoms - count) * flips(wpi, ss_2a, count + 1)) / symptoms,
+        "severity_up": flips(wpi, ss_2a + 1, count),
+        "severity_down": flips(wpi, ss_2a - 1, count),
+    }
+
+    # Each change moves one step along one axis, so the distance is the L1
+    # distance to the nearest state with the other result; relax until stable
+    distance = np.where(flips(wpi + 1, ss_2a, count) | flips(wpi - 1, ss_2a, count)
+                        | tables["severity_up"] | tables["severity_down"]
+                        | flips(wpi, ss_2a, count + 1) | flips(wpi, ss_2a, count - 1), 1, MAX_DISTANCE + 1)
+    while True:
+        relaxed = distance.copy()
+        for axis in range(3):
+            for shift in (1, -1):
+                neighbour = np.roll(distance, shift, axis=axis) + 1
+                edge = [slice(None)] * 3
+                edge[axis] = 0 if shift == 1 else -1
+                neighbour[tuple(edge)] = MAX_DISTANCE + 1
+                # Only through states with the same result; the other ones end the path
+                relaxed = np.where(np.roll(meets, shift, axis=axis) == meets,
+                                   np.minimum(relaxed, neighbour), relaxed)
+        if np.array_equal(relaxed, distance):
+            break
+        distance = relaxed
+    tables["distance"] = distance
+    return tables
+
+def draw_respondents(distribution, size, rng):
+    """Random answers: (pain_flags, severities, symptom_flags) with severities shaped (size, 3)"""
+
+    def flags(probability, width):
+        probability = np.broadcast_to(np.asarray(probability, dtype=np.float32), (width,))
+        if distribution.concentration:
+            # Per-respondent scale, keeping each label's relative probability;
+            # a scaled probability above 1 just means always present
+            mean = probability.mean()
+            if 0 < mean < 1:
+                scale = rng.beta(mean * distribution.concentration, (1 - mean) * distribution.concentration,
+                                 (size, 1)) / mean
+                probability = probability * scale.astype(np.float32)
+        # Comparing in float32 avoids upcasting the (size, width) draws
+        return rng.random((size, width), dtype=np.float32) < probability
+
+    pain_flags = flags(distribution.pain_probability, len(PAIN_AREAS))
+    symptom_flags = flags(distribution.symptom_probability, len(OTHER_SYMPTOMS))
+    weights = np.asarray(distribution.severity_weights, dtype=np.float64)
+    severities = rng.choice(MAX_SEVERITY + 1, size=(size, 3), p=weights / weights.sum()).astype(np.int8)
+    return pain_flags, severities, symptom_flags
+
+def respondent_stability(pain_flags, severities, symptom_flags):
+    """Per-respondent ``meets``, flip probabilities (PERTURBATIONS) and ``distance``"""
+    tables = state_tables()
+    wpi = np.count_nonzero(pain_flags, axis=1)
+    ss_2a = severities.sum(axis=1, dtype=np.int64)
+    count = np.count_nonzero(symptom_flags, axis=1)
+    state = (wpi, ss_2a, count)
+
+    # Each severity below 3 can move up and each above 0 down
+    ups = np.count_nonzero(severities < MAX_SEVERITY, axis=1)
+    downs = np.count_nonzero(severities > 0, axis=1)
+    severity_moves = ups + downs
+    severity = (ups * tables["severity_up"][state] + downs * tables["severity_down"][state]) / severity_moves
+    pain_area = tables["pain_area"][state]
+    symptom = tables["symptom"][state]
+    changes = len(PAIN_AREAS) + len(OTHER_SYMPTOMS) + severity_moves
+    return {
+        "meets": tables["meets"][state],
+        "pain_area": pain_area,
+        "severity": severity,
+        "symptom": symptom,
+        "any": (pain_area * len(PAIN_AREAS) + severity * severity_moves
+                + symptom * len(OTHER_SYMPTOMS)) / changes,
+        "distance": tables["distance"][state],
+    }
+
+def simulate_chunk(task):
+    """Simulate one chunk; task is (distribution, size, seed_sequence)"""
+    distribution, size, seed = task
+    start = time.perf_counter()
+    stability = respondent_stability(*draw_respondents(distribution, size, np.random.default_rng(seed)))
+    meets = stability["meets"]
+    flip_sums = {kind: (float(stability[kind][~meets].sum()), float(stability[kind][meets].sum()))
+                 for kind in PERTURBATIONS}
+    distance_counts = np.zeros((2, MAX_DISTANCE + 1), dtype=np.int64)
+    np.add.at(distance_counts, (meets.astype(np.int64), stability["distance"]), 1)
+    return SimulationSummary(size, int(np.count_nonzero(meets)), flip_sums, distance_counts,
+                             time.perf_counter() - start)
+
+def simulate(distribution, respondents, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, seed=0, progress=None):
+    """Simulate ``respondents`` answers from a Distribution (or preset name).
+
+    Chunks run in ``workers`` processes; the summary is the same for any
+    worker count. ``progress`` is called with the running summary after
+    each chunk. The returned summary's ``seconds`` is the wall time.
+    """
+    if isinstance(distribution, str):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"unknown distribution {distribution!r}, expected one of {', '.join(DISTRIBUTIONS)}")
+        distribution = DISTRIBUTIONS[distribution]
+    if respondents < 1 or chunk_size < 1:
+        raise ValueError("respondents and chunk size must be positive")
+
+    start = time.perf_counter()
+    sizes = [chunk_size] * (respondents // chunk_size) + ([respondents % chunk_size] if respondents % chunk_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(distribution, size, child) for size, child in zip(sizes, seeds)]
+    state_tables()  # built before forking, so workers inherit them
+
+    summary = empty_summary()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = pool.map(simulate_chunk, tasks)
+            for chunk in chunks:
+                summary = summary.merge(chunk)
+                if progress:
+                    progress(summary._replace(seconds=time.perf_counter() - start))
+    else:
+        for task in tasks:
+            summary = summary.merge(simulate_chunk(task))
+            if progress:
+                progress(summary._replace(seconds=time.perf_counter() - start))
+    return summary._replace(seconds=time.perf_counter() - start)
+
+def format_summary(summary, max_distance=5):
+    """Plain-text report of a SimulationSummary"""
+    lines = [
+        f"{summary.respondents:,} respondents in {summary.seconds:.2f}s ({summary.throughput:,.0f}/s)",
+        f"meet the 2010 criteria: {summary.meets_rate:.2%}",
+        "",
+        f"{'flip probability':<22} {'all':>8} {'not met':>8} {'met':>8}",
+    ]
+    for kind in PERTURBATIONS:
+        lines.append(f"  {kind.replace('_', ' '):<20} {summary.flip_probability(kind):>8.2%} "
+                     f"{summary.flip_probability(kind, False):>8.2%} {summary.flip_probability(kind, True):>8.2%}")
+    lines += [
+        "",
+        f"{'distance to threshold':<22} {'all':>8} {'not met':>8} {'met':>8}",
+        f"  {'mean changes':<20} {summary.mean_distance():>8.2f} {summary.mean_distance(False):>8.2f} "
+        f"{summary.mean_distance(True):>8.2f}",
+    ]
+    for distance in range(1, max_distance + 1):
+        lines.append(f"  {f'<= {distance}':<20} {summary.distance_share(distance):>8.2%} "
+                     f"{summary.distance_share(distance, False):>8.2%} {summary.distance_share(distance, True):>8.2%}")
+    return "\n".join(lines)
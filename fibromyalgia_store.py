@@ -0,0 +1,594 @@
+"""Persistent local store of submitted assessments.
+
+Assessments are appended to an SQLite database in WAL mode. ``submit()``
+only puts the record on a queue; a background thread drains the queue and
+writes whatever has accumulated in one transaction (group commit), so the
+caller never waits on disk I/O.
+
+Cohort aggregates (per pain area and symptom counts, a WPI x SS histogram
+and daily outcome counts) are updated in the same transaction as each
+insert, so reading them never scans the assessments table.
+
+Assessments submitted with a patient ID are also appended to that
+patient's history. Each entry stores its pain area and symptom masks as an
+XOR delta against the previous entry (weekly answers change little, and
+SQLite stores small integers in fewer bytes), with a full keyframe every
+KEYFRAME_INTERVAL entries so a recent window decodes without replaying the
+whole history. History rows refer to the patient by an integer key and
+hold dates as seconds since the epoch. The ``patients`` table keeps each
+patient's latest masks, so appending never reads the history.
+
+A batch whose commit raises an SQLite error is retried with exponential
+backoff. If every attempt fails, or the commit raises any other error,
+the writer thread keeps running and the batch's records are appended to
+``<path>.failed.jsonl`` (one ``{"patient_id", "record"}`` object per line,
+``record`` being the export dict) rather than dropped.
+
+Usage:
+    store = AssessmentStore("assessments.db")
+    store.submit(record)
+    store.flush()  # wait for pending writes, e.g. before querying
+    for record in store.query(date_from="2024-01-01", meets_criteria=True):
+        ...
+"""
+
+import atexit
+import calendar
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+
+from fibromyalgia_scoring import PAIN_AREAS, OTHER_SYMPTOMS, MAX_WPI_SCORE, MAX_SS_SCORE
+from fibromyalgia_record import AssessmentRecord, DATE_FORMAT
+from fibromyalgia_metrics import increment
+
+logger = logging.getLogger(__name__)
+
+# Database used by the app; set FIBRO_STORE_PATH to "" to disable storing
+DEFAULT_STORE_PATH = "fibromyalgia_assessments.db"
+
+# Commit attempts per batch before it is spooled, and the first retry delay
+# in seconds (doubled after each attempt)
+WRITE_ATTEMPTS = 5
+RETRY_DELAY = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY,
+    assessment_date TEXT,
+    wpi_score INTEGER NOT NULL,
+    ss_2a_score INTEGER NOT NULL,
+    ss_2b_score INTEGER NOT NULL,
+    total_ss_score INTEGER NOT NULL,
+    meets_criteria INTEGER NOT NULL,
+    pain_mask INTEGER NOT NULL,
+    symptom_mask INTEGER NOT NULL,
+    no_pain_areas INTEGER NOT NULL,
+    fatigue INTEGER NOT NULL,
+    waking INTEGER NOT NULL,
+    cognitive INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_assessments_date ON assessments (assessment_date);
+CREATE INDEX IF NOT EXISTS idx_assessments_wpi ON assessments (wpi_score);
+CREATE INDEX IF NOT EXISTS idx_assessments_ss ON assessments (total_ss_score);
+CREATE INDEX IF NOT EXISTS idx_assessments_meets ON assessments (meets_criteria, assessment_date);
+"""
+
+AGGREGATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agg_pain_area (
+    bit INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_symptom (
+    bit INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_wpi_ss (
+    wpi_score INTEGER NOT NULL,
+    total_ss_score INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (wpi_score, total_ss_score)
+);
+CREATE TABLE IF NOT EXISTS agg_daily (
+    day TEXT PRIMARY KEY,
+    assessments INTEGER NOT NULL,
+    meets_criteria INTEGER NOT NULL
+);
+"""
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    patient_key INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL UNIQUE,
+    entries INTEGER NOT NULL,
+    pain_mask INTEGER NOT NULL,
+    symptom_mask INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS patient_history (
+    patient_key INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    assessment_time,
+    pain_delta INTEGER NOT NULL,
+    symptom_delta INTEGER NOT NULL,
+    no_pain_areas INTEGER NOT NULL,
+    fatigue INTEGER NOT NULL,
+    waking INTEGER NOT NULL,
+    cognitive INTEGER NOT NULL,
+    wpi_score INTEGER NOT NULL,
+    total_ss_score INTEGER NOT NULL,
+    PRIMARY KEY (patient_key, seq)
+) WITHOUT ROWID;
+"""
+
+# Every KEYFRAME_INTERVAL-th history entry holds full masks instead of deltas
+KEYFRAME_INTERVAL = 64
+
+MAX_PATIENT_ID_LENGTH = 64
+
+# Stored in PRAGMA user_version once the aggregate tables match the assessments
+AGGREGATES_VERSION = 1
+
+INSERT_SQL = """
+INSERT INTO assessments (
+    assessment_date, wpi_score, ss_2a_score, ss_2b_score, total_ss_score, meets_criteria,
+    pain_mask, symptom_mask, no_pain_areas, fatigue, waking, cognitive
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+RECORD_COLUMNS = (
+    "pain_mask, symptom_mask, fatigue, waking, cognitive, no_pain_areas, assessment_date"
+)
+
+
+def connect(path):
+    """Open a connection to the store, creating the schema if needed"""
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA + AGGREGATE_SCHEMA + HISTORY_SCHEMA)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < AGGREGATES_VERSION:
+        rebuild_aggregates(conn)
+    return conn
+
+def record_row(record):
+    """Row for INSERT_SQL from an AssessmentRecord"""
+    return (
+        record.assessment_date, record.wpi_score, record.ss_2a_score, record.ss_2b_score,
+        record.total_ss_score, int(record.meets_criteria),
+        record.pain_mask, record.symptom_mask, int(record.no_pain_areas),
+        record.fatigue, record.waking, record.cognitive
+    )
+
+def _set_bit_counts(counts, mask):
+    while mask:
+        lowest = mask & -mask
+        counts[lowest.bit_length() - 1] += 1
+        mask ^= lowest
+
+def update_aggregates(conn, records):
+    """Add records to the aggregate tables (inside the caller's transaction)"""
+    pain_counts = [0] * len(PAIN_AREAS)
+    symptom_counts = [0] * len(OTHER_SYMPTOMS)
+    wpi_ss = Counter()
+    daily = Counter()
+    daily_meets = Counter()
+    for record in records:
+        _set_bit_counts(pain_counts, record.pain_mask)
+        _set_bit_counts(symptom_counts, record.symptom_mask)
+        wpi_ss[record.wpi_score, record.total_ss_score] += 1
+        if record.assessment_date:
+            day = record.assessment_date[:10]
+            daily[day] += 1
+            daily_meets[day] += record.meets_criteria
+
+    conn.executemany(
+        "INSERT INTO agg_pain_area (bit, count) VALUES (?, ?) "
+        "ON CONFLICT (bit) DO UPDATE SET count = count + excluded.count",
+        [(bit, count) for bit, count in enumerate(pain_counts) if count]
+    )
+    conn.executemany(
+        "INSERT INTO agg_symptom (bit, count) VALUES (?, ?) "
+        "ON CONFLICT (bit) DO UPDATE SET count = count + excluded.count",
+        [(bit, count) for bit, count in enumerate(symptom_counts) if count]
+    )
+    conn.executemany(
+        "INSERT INTO agg_wpi_ss (wpi_score, total_ss_score, count) VALUES (?, ?, ?) "
+        "ON CONFLICT (wpi_score, total_ss_score) DO UPDATE SET count = count + excluded.count",
+        [(wpi, ss, count) for (wpi, ss), count in wpi_ss.items()]
+    )
+    conn.executemany(
+        "INSERT INTO agg_daily (day, assessments, meets_criteria) VALUES (?, ?, ?) "
+        "ON CONFLICT (day) DO UPDATE SET assessments = assessments + excluded.assessments, "
+        "meets_criteria = meets_criteria + excluded.meets_criteria",
+        [(day, count, daily_meets[day]) for day, count in daily.items()]
+    )
+
+def rebuild_aggregates(conn):
+    """Recompute the aggregate tables from the assessments table"""
+    bit_sums = ", ".join(
+        [f"SUM((pain_mask >> {bit}) & 1)" for bit in range(len(PAIN_AREAS))]
+        + [f"SUM((symptom_mask >> {bit}) & 1)" for bit in range(len(OTHER_SYMPTOMS))]
+    )
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        # Another process may have rebuilt them while we waited for the lock
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= AGGREGATES_VERSION:
+            return
+        for table in ("agg_pain_area", "agg_symptom", "agg_wpi_ss", "agg_daily"):
+            conn.execute(f"DELETE FROM {table}")
+
+        sums = conn.execute(f"SELECT {bit_sums} FROM assessments").fetchone()
+        sums = [count or 0 for count in sums]
+        conn.executemany("INSERT INTO agg_pain_area (bit, count) VALUES (?, ?)",
+                         list(enumerate(sums[:len(PAIN_AREAS)])))
+        conn.executemany("INSERT INTO agg_symptom (bit, count) VALUES (?, ?)",
+                         list(enumerate(sums[len(PAIN_AREAS):])))
+        conn.execute(
+            "INSERT INTO agg_wpi_ss (wpi_score, total_ss_score, count) "
+            "SELECT wpi_score, total_ss_score, COUNT(*) FROM assessments "
+            "GROUP BY wpi_score, total_ss_score"
+        )
+        conn.execute(
+            "INSERT INTO agg_daily (day, assessments, meets_criteria) "
+            "SELECT substr(assessment_date, 1, 10), COUNT(*), SUM(meets_criteria) FROM assessments "
+            "WHERE assessment_date IS NOT NULL GROUP BY substr(assessment_date, 1, 10)"
+        )
+        conn.execute(f"PRAGMA user_version = {AGGREGATES_VERSION}")
+
+def clean_patient_id(patient_id):
+    """Stripped patient ID, or None if blank; ValueError if too long"""
+    patient_id = (patient_id or "").strip()
+    if len(patient_id) > MAX_PATIENT_ID_LENGTH:
+        raise ValueError(f"patient ID is longer than {MAX_PATIENT_ID_LENGTH} characters")
+    return patient_id or None
+
+def _encode_date(assessment_date):
+    # Seconds since the epoch; dates in another format are kept as text
+    try:
+        return calendar.timegm(time.strptime(assessment_date, DATE_FORMAT))
+    except (TypeError, ValueError):
+        return assessment_date
+
+def _decode_date(assessment_time):
+    if isinstance(assessment_time, int):
+        return time.strftime(DATE_FORMAT, time.gmtime(assessment_time))
+    return assessment_time
+
+def append_history(conn, patient_id, records):
+    """Append records to a patient's history (inside the caller's transaction)"""
+    head = conn.execute("SELECT patient_key, entries, pain_mask, symptom_mask FROM patients "
+                        "WHERE patient_id = ?", (patient_id,)).fetchone()
+    if head is None:
+        cursor = conn.execute("INSERT INTO patients (patient_id, entries, pain_mask, symptom_mask) "
+                              "VALUES (?, 0, 0, 0)", (patient_id,))
+        head = (cursor.lastrowid, 0, 0, 0)
+    patient_key, entries, pain_mask, symptom_mask = head
+    rows = []
+    for record in records:
+        if entries % KEYFRAME_INTERVAL == 0:
+            pain_mask = symptom_mask = 0
+        rows.append((
+            patient_key, entries, _encode_date(record.assessment_date),
+            record.pain_mask ^ pain_mask, record.symptom_mask ^ symptom_mask,
+            int(record.no_pain_areas), record.fatigue, record.waking, record.cognitive,
+            record.wpi_score, record.total_ss_score
+        ))
+        pain_mask, symptom_mask = record.pain_mask, record.symptom_mask
+        entries += 1
+    conn.executemany("INSERT INTO patient_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("UPDATE patients SET entries = ?, pain_mask = ?, symptom_mask = ? WHERE patient_key = ?",
+                 (entries, pain_mask, symptom_mask, patient_key))
+
+def insert_records(conn, records, patient_ids=None):
+    """Insert records and update the aggregates in one transaction.
+
+    ``patient_ids`` lines up with records; entries that are not None also
+    append the record to that patient's history, in submission order.
+    """
+    with conn:
+        conn.executemany(INSERT_SQL, (record_row(record) for record in records))
+        update_aggregates(conn, records)
+        if patient_ids:
+            by_patient = {}
+            for record, patient_id in zip(records, patient_ids):
+                if patient_id is not None:
+                    by_patient.setdefault(patient_id, []).append(record)
+            for patient_id, patient_records in by_patient.items():
+                append_history(conn, patient_id, patient_records)
+
+def read_history(conn, patient_id, last=None):
+    """Decode a patient's history into (seq, AssessmentRecord) pairs, oldest first.
+
+    ``last`` limits it to the most recent entries; decoding starts at the
+    keyframe before them.
+    """
+    head = conn.execute("SELECT patient_key, entries FROM patients WHERE patient_id = ?",
+                        (patient_id,)).fetchone()
+    if head is None:
+        return []
+    patient_key, entries = head
+    start = 0 if last is None else max(0, entries - last)
+    rows = conn.execute(
+        "SELECT seq, assessment_time, pain_delta, symptom_delta, no_pain_areas, fatigue, waking, cognitive "
+        "FROM patient_history WHERE patient_key = ? AND seq >= ? ORDER BY seq",
+        (patient_key, start - start % KEYFRAME_INTERVAL)
+    )
+    history = []
+    pain_mask = symptom_mask = 0
+    for seq, assessment_time, pain_delta, symptom_delta, no_pain_areas, fatigue, waking, cognitive in rows:
+        if seq % KEYFRAME_INTERVAL == 0:
+            pain_mask = symptom_mask = 0
+        pain_mask ^= pain_delta
+        symptom_mask ^= symptom_delta
+        if seq >= start:
+            history.append((seq, AssessmentRecord(pain_mask, symptom_mask, fatigue, waking, cognitive,
+                                                  bool(no_pain_areas), _decode_date(assessment_time))))
+    return history
+
+def read_trend(conn, patient_id):
+    """(assessment_date, wpi_score, total_ss_score) for each history entry, oldest first"""
+    rows = conn.execute(
+        "SELECT h.assessment_time, h.wpi_score, h.total_ss_score FROM patient_history h "
+        "JOIN patients p ON p.patient_key = h.patient_key WHERE p.patient_id = ? ORDER BY h.seq",
+        (patient_id,)
+    )
+    return [(_decode_date(assessment_time), wpi_score, total_ss_score)
+            for assessment_time, wpi_score, total_ss_score in rows]
+
+
+class CohortAggregates(namedtuple("CohortAggregates", [
+        "total", "pain_area_counts", "symptom_counts", "wpi_ss_counts", "daily"])):
+    """Running totals over every stored assessment.
+
+    ``pain_area_counts`` and ``symptom_counts`` follow PAIN_AREAS and
+    OTHER_SYMPTOMS order, ``wpi_ss_counts[wpi][ss]`` is a 20 x 13 histogram
+    and ``daily`` is a date-ordered list of (day, assessments, meets_criteria).
+    """
+
+    __slots__ = ()
+
+    @property
+    def wpi_counts(self):
+        return [sum(row) for row in self.wpi_ss_counts]
+
+    @property
+    def ss_counts(self):
+        return [sum(column) for column in zip(*self.wpi_ss_counts)]
+
+    @property
+    def meets_criteria(self):
+        return sum(meets for _, _, meets in self.daily)
+
+    def mean_wpi(self):
+        return sum(wpi * count for wpi, count in enumerate(self.wpi_counts)) / self.total if self.total else 0.0
+
+    def mean_ss(self):
+        return sum(ss * count for ss, count in enumerate(self.ss_counts)) / self.total if self.total else 0.0
+
+def read_aggregates(conn):
+    """Load CohortAggregates from the aggregate tables"""
+    pain_area_counts = [0] * len(PAIN_AREAS)
+    for bit, count in conn.execute("SELECT bit, count FROM agg_pain_area"):
+        pain_area_counts[bit] = count
+    symptom_counts = [0] * len(OTHER_SYMPTOMS)
+    for bit, count in conn.execute("SELECT bit, count FROM agg_symptom"):
+        symptom_counts[bit] = count
+    wpi_ss_counts = [[0] * (MAX_SS_SCORE + 1) for _ in range(MAX_WPI_SCORE + 1)]
+    for wpi, ss, count in conn.execute("SELECT wpi_score, total_ss_score, count FROM agg_wpi_ss"):
+        wpi_ss_counts[wpi][ss] = count
+    daily = conn.execute("SELECT day, assessments, meets_criteria FROM agg_daily ORDER BY day").fetchall()
+    total = sum(sum(row) for row in wpi_ss_counts)
+    return CohortAggregates(total, pain_area_counts, symptom_counts, wpi_ss_counts, daily)
+
+def build_filter(date_from=None, date_to=None, wpi_min=None, wpi_max=None,
+                 ss_min=None, ss_max=None, meets_criteria=None):
+    """Return (where_sql, params) for the indexed query filters.
+
+    ``date_from`` is inclusive and ``date_to`` exclusive; both compare as
+    "YYYY-MM-DD HH:MM:SS" strings, so a plain date works too.
+    """
+    clauses, params = [], []
+    for column, op, value in (
+        ("assessment_date", ">=", date_from), ("assessment_date", "<", date_to),
+        ("wpi_score", ">=", wpi_min), ("wpi_score", "<=", wpi_max),
+        ("total_ss_score", ">=", ss_min), ("total_ss_score", "<=", ss_max),
+    ):
+        if value is not None:
+            clauses.append(f"{column} {op} ?")
+            params.append(value)
+    if meets_criteria is not None:
+        clauses.append("meets_criteria = ?")
+        params.append(int(meets_criteria))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class AssessmentStore:
+    """Append-only assessment store with a background group-commit writer"""
+
+    def __init__(self, path, max_batch=1000, max_delay=0.2):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._closed = False
+        # Create the schema up front so queries work before the first write
+        connect(path).close()
+        self._writer = threading.Thread(target=self._write_loop, name="assessment-store-writer",
+                                        daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def submit(self, record, patient_id=None):
+        """Queue a record to be written; returns immediately.
+
+        With a patient ID the record is also appended to that patient's history.
+        """
+        if self._closed:
+            raise RuntimeError("store is closed")
+        self._queue.put((record, clean_patient_id(patient_id)))
+
+    def flush(self):
+        """Block until every submitted record has been committed"""
+        self._queue.join()
+
+    def close(self):
+        """Write pending records and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        conn = connect(self.path)
+        try:
+            stop = False
+            while not stop:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.max_delay
+                # Group commit: gather what arrives within max_delay, up to max_batch
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        batch.append(self._queue.get(timeout=timeout) if timeout > 0
+                                     else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                items = [item for item in batch if item is not None]
+                stop = len(items) != len(batch)
+                try:
+                    if items:
+                        self._store_batch(conn, items)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            conn.close()
+
+    def _store_batch(self, conn, items):
+        """Commit queued items, retrying with backoff and spooling them if that fails"""
+        records, patient_ids = zip(*items)
+        records = list(records)
+        patient_ids = list(patient_ids) if any(patient_ids) else None
+        delay = RETRY_DELAY
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                self._commit(conn, records, patient_ids)
+                return
+            except sqlite3.Error as exc:
+                if attempt == WRITE_ATTEMPTS:
+                    logger.error("Failed to store %d assessments after %d attempts: %s",
+                                 len(items), attempt, exc)
+                    break
+                logger.warning("Storing %d assessments failed (%s), retrying in %gs",
+                               len(items), exc, delay)
+                increment("store_retries")
+                time.sleep(delay)
+                delay *= 2
+            except Exception:
+                # Not a database condition that waiting could clear
+                logger.exception("Failed to store %d assessments", len(items))
+                break
+        increment("store_failures", len(items))
+        self._spool(items)
+
+    def _spool(self, items):
+        """Append items the database would not take to <path>.failed.jsonl"""
+        spool_path = self.path + ".failed.jsonl"
+        try:
+            with open(spool_path, "a", encoding="utf-8") as f:
+                for record, patient_id in items:
+                    f.write(json.dumps({"patient_id": patient_id, "record": record.to_export_dict()}) + "\n")
+        except Exception:
+            logger.exception("Lost %d assessments: could not write %s", len(items), spool_path)
+        else:
+            logger.error("Saved %d unstored assessments to %s", len(items), spool_path)
+
+    def _commit(self, conn, records, patient_ids=None):
+        insert_records(conn, records, patient_ids)
+
+    def insert_many(self, records, chunk_size=10_000, patient_id=None):
+        """Insert records synchronously, committing every chunk_size rows.
+
+        With a patient ID they are also appended, in order, to that patient's history.
+        """
+        patient_id = clean_patient_id(patient_id)
+        conn = connect(self.path)
+        try:
+            chunk = []
+            for record in records:
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    self._commit(conn, chunk, patient_id and [patient_id] * len(chunk))
+                    chunk = []
+            if chunk:
+                self._commit(conn, chunk, patient_id and [patient_id] * len(chunk))
+        finally:
+            conn.close()
+
+    def history(self, patient_id, last=None):
+        """A patient's (seq, AssessmentRecord) history, oldest first"""
+        conn = connect(self.path)
+        try:
+            return read_history(conn, patient_id, last)
+        finally:
+            conn.close()
+
+    def trend(self, patient_id):
+        """A patient's (assessment_date, wpi_score, total_ss_score) rows, oldest first"""
+        conn = connect(self.path)
+        try:
+            return read_trend(conn, patient_id)
+        finally:
+            conn.close()
+
+    def aggregates(self):
+        """CohortAggregates over every committed assessment"""
+        conn = connect(self.path)
+        try:
+            return read_aggregates(conn)
+        finally:
+            conn.close()
+
+    def count(self, **filters):
+        """Number of stored assessments matching the filters of build_filter()"""
+        where, params = build_filter(**filters)
+        conn = connect(self.path)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM assessments{where}", params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def query(self, limit=None, newest_first=False, **filters):
+        """Yield AssessmentRecords matching the filters of build_filter(), by date"""
+        return query_records(self.path, limit, newest_first, **filters)
+
+
+def query_records(path, limit=None, newest_first=False, **filters):
+    """Yield stored AssessmentRecords from path without starting a writer"""
+    where, params = build_filter(**filters)
+    sql = (f"SELECT {RECORD_COLUMNS} FROM assessments{where} "
+           f"ORDER BY assessment_date {'DESC' if newest_first else 'ASC'}, id")
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    conn = connect(path)
+    try:
+        for row in conn.execute(sql, params):
+            yield AssessmentRecord(*row)
+    finally:
+        conn.close()
+
+def default_store_path():
+    """Path of the app's store, or "" when storing is disabled"""
+    return os.environ.get("FIBRO_STORE_PATH", DEFAULT_STORE_PATH)
+
+def open_default_store():
+    """Open the app's store, or return None when storing is disabled"""
+    path = default_store_path()
+    return AssessmentStore(path) if path else None
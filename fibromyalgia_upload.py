@@ -0,0 +1,249 @@
+"""Scoring of uploaded raw-answer spreadsheets (CSV or XLSX).
+
+Uploads use the columns of the command-line scorer's raw-answer CSV (see
+fibromyalgia_cli): one yes/no column per pain area and symptom label, the
+three severities, and optionally ``None of these areas`` and
+``assessment_date``.
+
+Files are read ``chunk_size`` rows at a time. Each chunk's cells are parsed
+by factorizing them, so every distinct cell text is parsed once. The chunk
+is then scored with ``score_batch``. Only compact columns are kept: masks,
+severities, scores and the date, under 100 bytes per row. Memory for the
+raw cells therefore depends on the chunk size rather than the file, and
+the first chunk's results are ready before the rest of the file is read.
+
+As in the command-line scorer, a CSV row with more or fewer cells than the
+header is rejected rather than padded or failing the whole upload.
+
+XLSX files are read with openpyxl (in requirements.txt).
+"""
+
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from fibromyalgia_scoring import (
+    NONE_OF_THESE_AREAS, PAIN_AREAS, OTHER_SYMPTOMS, MAX_SEVERITY, MAX_WPI_SCORE, MAX_SS_SCORE
+)
+from fibromyalgia_record import AssessmentRecord
+from fibromyalgia_batch import score_batch
+from fibromyalgia_store import CohortAggregates
+from fibromyalgia_cli import SEVERITY_FIELDS, check_csv_columns, parse_flag, parse_severity
+from fibromyalgia_criteria import default_criteria
+
+UPLOAD_FORMATS = ("csv", "xlsx")
+
+DEFAULT_CHUNK_SIZE = 5_000
+
+# Columns of a scored upload; "row" is the spreadsheet row, the header being row 1
+SCORED_COLUMNS = [
+    "row", "assessment_date", "wpi_score", "ss_2a_score", "ss_2b_score", "total_ss_score",
+    "meets_diagnostic_criteria", "fatigue", "waking_unrefreshed", "cognitive_symptoms",
+    "no_pain_areas", "pain_mask", "symptom_mask"
+]
+
+_PAIN_WEIGHTS = np.left_shift(1, np.arange(len(PAIN_AREAS), dtype=np.int64))
+_SYMPTOM_WEIGHTS = np.left_shift(1, np.arange(len(OTHER_SYMPTOMS), dtype=np.int64))
+
+
+def guess_upload_format(name):
+    """Pick csv or xlsx from a file name"""
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension not in UPLOAD_FORMATS:
+        raise ValueError(f"unsupported file type {extension!r}, expected one of {', '.join(UPLOAD_FORMATS)}")
+    return extension
+
+def _csv_frame(rows, header, row_errors):
+    frame = pd.DataFrame(rows, columns=header, dtype=object)
+    frame.attrs["row_errors"] = row_errors
+    return frame
+
+def _iter_csv_chunks(stream, chunk_size):
+    """Yield DataFrames of CSV cells; ``attrs["row_errors"]`` maps a row index to its error"""
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(
+        stream, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, [])
+        rows, row_errors, yielded = [], {}, False
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(header):
+                row_errors[len(rows)] = (f"row has {'more' if len(row) > len(header) else 'fewer'} "
+                                         "cells than the header")
+                row = (row + [""] * len(header))[:len(header)]
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield _csv_frame(rows, header, row_errors)
+                rows, row_errors, yielded = [], {}, True
+        if rows or not yielded:
+            yield _csv_frame(rows, header, row_errors)
+    finally:
+        if text is not stream:
+            # Leave the caller's stream open
+            text.detach()
+
+def _iter_xlsx_chunks(stream, chunk_size):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("XLSX upload needs openpyxl (pip install openpyxl)") from None
+    # Read-only mode streams the sheet instead of loading every cell
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = ["" if cell is None else str(cell) for cell in next(rows, ())]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header, dtype=object)
+                chunk = []
+        if chunk or not header:
+            yield pd.DataFrame(chunk, columns=header, dtype=object)
+    finally:
+        workbook.close()
+
+def iter_upload_chunks(stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield DataFrame chunks of an upload's raw cells.
+
+    Raises ValueError for an unknown format, a missing reader, or missing columns.
+    """
+    if fmt not in UPLOAD_FORMATS:
+        raise ValueError(f"unknown upload format {fmt!r}, expected one of {', '.join(UPLOAD_FORMATS)}")
+    chunks = _iter_csv_chunks(stream, chunk_size) if fmt == "csv" else _iter_xlsx_chunks(stream, chunk_size)
+    checked = False
+    for chunk in chunks:
+        if not checked:
+            check_csv_columns(list(chunk.columns))
+            checked = True
+        yield chunk
+
+def _cell_text(value):
+    return "" if value is None else str(value)
+
+def _parse_cells(values, parse):
+    """Parse a 2-D object array with parse(text) -> int; -1 marks invalid cells"""
+    codes, uniques = pd.factorize(values.ravel())
+    # Empty cells (None) get code -1, which picks the extra last entry
+    parsed = np.empty(len(uniques) + 1, dtype=np.int8)
+    for i, value in enumerate(list(uniques) + [None]):
+        try:
+            parsed[i] = parse(_cell_text(value))
+        except ValueError:
+            parsed[i] = -1
+    return parsed[codes].reshape(values.shape)
+
+def _parse_severity_cell(text):
+    value = parse_severity(text)
+    if not 0 <= value <= MAX_SEVERITY:
+        raise ValueError(f"severity out of range: {value}")
+    return value
+
+def score_chunk(chunk, first_row=2):
+    """Score one chunk of raw cells.
+
+    Returns (scored, rejects): a DataFrame of SCORED_COLUMNS for the valid
+    rows and one of ``row`` and ``error`` for the others. ``first_row`` is
+    the spreadsheet row of the chunk's first line.
+    """
+    rows = np.arange(first_row, first_row + len(chunk), dtype=np.int32)
+    flag_columns = PAIN_AREAS + OTHER_SYMPTOMS
+    flags = _parse_cells(chunk[flag_columns].to_numpy(dtype=object), parse_flag)
+    severities = _parse_cells(chunk[SEVERITY_FIELDS].to_numpy(dtype=object), _parse_severity_cell)
+    if NONE_OF_THESE_AREAS in chunk.columns:
+        no_pain_areas = _parse_cells(chunk[[NONE_OF_THESE_AREAS]].to_numpy(dtype=object),
+                                     parse_flag)[:, 0]
+    else:
+        no_pain_areas = np.zeros(len(chunk), dtype=np.int8)
+
+    cells = np.column_stack([flags, severities, no_pain_areas])
+    invalid = cells < 0
+    bad = invalid.any(axis=1)
+    row_errors = chunk.attrs.get("row_errors") or {}
+    bad[list(row_errors)] = True
+    rejects = pd.DataFrame({"row": rows[bad], "error": [
+        row_errors.get(index)
+        or _cell_error(chunk, index, (flag_columns + SEVERITY_FIELDS + [NONE_OF_THESE_AREAS])[column])
+        for index, column in zip(np.flatnonzero(bad), invalid[bad].argmax(axis=1))
+    ]})
+
+    good = ~bad
+    flags, severities = flags[good], severities[good]
+    pain_flags, symptom_flags = flags[:, :len(PAIN_AREAS)], flags[:, len(PAIN_AREAS):]
+    fatigue, waking, cognitive = severities.T.astype(np.int64)
+    scores = score_batch(pain_flags, fatigue, waking, cognitive, symptom_flags)
+    if "assessment_date" in chunk.columns:
+        dates = [_cell_text(value) or None for value in chunk["assessment_date"].to_numpy(dtype=object)[good]]
+    else:
+        dates = [None] * int(good.sum())
+
+    scored = pd.DataFrame({
+        "row": rows[good],
+        "assessment_date": pd.Series(dates, dtype=object),
+        **{name: scores[name].astype(np.int8) for name in
+           ("wpi_score", "ss_2a_score", "ss_2b_score", "total_ss_score")},
+        "meets_diagnostic_criteria": scores["meets_diagnostic_criteria"].astype(bool),
+        "fatigue": fatigue.astype(np.int8),
+        "waking_unrefreshed": waking.astype(np.int8),
+        "cognitive_symptoms": cognitive.astype(np.int8),
+        "no_pain_areas": no_pain_areas[good].astype(bool),
+        "pain_mask": pain_flags.astype(np.int64) @ _PAIN_WEIGHTS,
+        "symptom_mask": symptom_flags.astype(np.int64) @ _SYMPTOM_WEIGHTS,
+    })
+    return scored, rejects
+
+def _cell_error(chunk, index, column):
+    value = _cell_text(chunk[column].iloc[index])
+    kind = "severity value (0-3)" if column in SEVERITY_FIELDS else "yes/no value"
+    return f"{column}: not a {kind}: {value!r}"
+
+def iter_scored_chunks(stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (scored, rejects, rows_read) for each chunk of an upload"""
+    rows_read = 0
+    for chunk in iter_upload_chunks(stream, fmt, chunk_size):
+        scored, rejects = score_chunk(chunk, first_row=rows_read + 2)
+        rows_read += len(chunk)
+        yield scored, rejects, rows_read
+
+def concat_chunks(frames, columns):
+    """Concatenate chunk DataFrames, or an empty one with the given columns"""
+    frames = [frame for frame in frames if len(frame)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+def aggregate_scored(scored):
+    """CohortAggregates over a scored upload"""
+    pain_masks = scored["pain_mask"].to_numpy(dtype=np.int64)
+    symptom_masks = scored["symptom_mask"].to_numpy(dtype=np.int64)
+    pain_area_counts = [int(np.count_nonzero(pain_masks & weight)) for weight in _PAIN_WEIGHTS]
+    symptom_counts = [int(np.count_nonzero(symptom_masks & weight)) for weight in _SYMPTOM_WEIGHTS]
+    wpi_ss = np.zeros((MAX_WPI_SCORE + 1, MAX_SS_SCORE + 1), dtype=np.int64)
+    np.add.at(wpi_ss, (scored["wpi_score"].to_numpy(dtype=np.int64),
+                       scored["total_ss_score"].to_numpy(dtype=np.int64)), 1)
+    dated = scored[scored["assessment_date"].notna()]
+    days = dated.groupby(dated["assessment_date"].str[:10])["meets_diagnostic_criteria"].agg(["size", "sum"])
+    daily = [(day, int(size), int(meets)) for day, size, meets in days.itertuples()]
+    return CohortAggregates(len(scored), pain_area_counts, symptom_counts, wpi_ss.tolist(), daily)
+
+def criteria_summary(scored):
+    """(name, reference, rows meeting) for every criteria set, in one pass"""
+    criteria = default_criteria()
+    result = criteria.evaluate(
+        scored["pain_mask"].to_numpy(dtype=np.int64), scored["symptom_mask"].to_numpy(dtype=np.int64),
+        scored["fatigue"].to_numpy(dtype=np.int16), scored["waking_unrefreshed"].to_numpy(dtype=np.int16),
+        scored["cognitive_symptoms"].to_numpy(dtype=np.int16)
+    )
+    return [(criteria_set.name, criteria_set.reference, int(np.count_nonzero(result.meets[criteria_set.key])))
+            for criteria_set in criteria.criteria_sets]
+
+def scored_records(scored):
+    """Yield an AssessmentRecord for each scored row"""
+    columns = ["pain_mask", "symptom_mask", "fatigue", "waking_unrefreshed", "cognitive_symptoms",
+               "no_pain_areas", "assessment_date"]
+    for pain_mask, symptom_mask, fatigue, waking, cognitive, no_pain_areas, date in \
+            scored[columns].itertuples(index=False, name=None):
+        yield AssessmentRecord(pain_mask, symptom_mask, fatigue, waking, cognitive, no_pain_areas, date)
@@ -0,0 +1,59 @@
+"""Cohort analytics over every stored assessment.
+
+Reads only the aggregate tables the store keeps up to date on each write,
+so rendering costs the same for ten assessments or ten million.
+"""
+
+import streamlit as st
+
+from fibromyalgia_app import get_store
+from fibromyalgia_charts import (
+    cohort_scores_figure, cohort_heatmap_figure, cohort_trend_figure,
+    cohort_pain_areas_figure, cohort_symptoms_figure
+)
+
+
+def main():
+    st.set_page_config(
+        page_title="Cohort Analytics",
+        page_icon="📊",
+        layout="wide"
+    )
+    st.title("📊 Cohort Analytics")
+
+    store = get_store()
+    if store is None:
+        st.info("Storing assessments is disabled (FIBRO_STORE_PATH is empty), so there is no cohort to show.")
+        return
+
+    aggregates = store.aggregates()
+    if not aggregates.total:
+        st.info("No assessments have been stored yet.")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Assessments", f"{aggregates.total:,}")
+    with col2:
+        st.metric("Meets Criteria", f"{aggregates.meets_criteria / aggregates.total:.1%}")
+    with col3:
+        st.metric("Mean WPI Score", f"{aggregates.mean_wpi():.1f}")
+    with col4:
+        st.metric("Mean Total SS", f"{aggregates.mean_ss():.1f}")
+
+    st.plotly_chart(cohort_trend_figure(aggregates), use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(cohort_scores_figure(aggregates), use_container_width=True)
+    with col2:
+        st.plotly_chart(cohort_heatmap_figure(aggregates), use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(cohort_pain_areas_figure(aggregates), use_container_width=True)
+    with col2:
+        st.plotly_chart(cohort_symptoms_figure(aggregates), use_container_width=True)
+
+
+main()
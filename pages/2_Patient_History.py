@@ -0,0 +1,92 @@
+"""Longitudinal history of one patient's assessments.
+
+The trend chart reads only the stored scores and is downsampled on the
+server, so it stays fast for thousands of entries; pain areas and symptoms
+are decoded from their deltas for the recent entries shown in the table.
+"""
+
+import streamlit as st
+
+from fibromyalgia_app import get_store
+from fibromyalgia_charts import patient_trend_figure
+from fibromyalgia_record import decode_mask
+from fibromyalgia_scoring import PAIN_AREAS, OTHER_SYMPTOMS
+from fibromyalgia_store import clean_patient_id
+
+RECENT_ENTRIES = 20
+
+
+def describe_changes(previous, record):
+    """Pain areas and symptoms gained (+) or lost (-) since the previous entry"""
+    if previous is None:
+        return ""
+    changes = []
+    for labels, before, after in ((PAIN_AREAS, previous.pain_mask, record.pain_mask),
+                                  (OTHER_SYMPTOMS, previous.symptom_mask, record.symptom_mask)):
+        changed = before ^ after
+        changes += [f"+{label}" for label in decode_mask(changed & after, labels)]
+        changes += [f"-{label}" for label in decode_mask(changed & before, labels)]
+    return ", ".join(changes)
+
+
+def main():
+    st.set_page_config(
+        page_title="Patient History",
+        page_icon="📈",
+        layout="wide"
+    )
+    st.title("📈 Patient History")
+
+    store = get_store()
+    if store is None:
+        st.info("Storing assessments is disabled (FIBRO_STORE_PATH is empty), so there is no history to show.")
+        return
+
+    try:
+        patient_id = clean_patient_id(st.text_input("Patient ID", key="history_patient_id"))
+    except ValueError as exc:
+        st.error(f"Patient ID: {exc}")
+        return
+    if patient_id is None:
+        st.info("Enter the patient ID used when submitting their assessments.")
+        return
+
+    trend = store.trend(patient_id)
+    if not trend:
+        st.info(f"No stored assessments for patient {patient_id}.")
+        return
+
+    _, wpi_score, total_ss_score = trend[-1]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Assessments", f"{len(trend):,}")
+    with col2:
+        st.metric("Latest WPI Score", wpi_score,
+                  delta=wpi_score - trend[-2][1] if len(trend) > 1 else None, delta_color="inverse")
+    with col3:
+        st.metric("Latest Total SS", total_ss_score,
+                  delta=total_ss_score - trend[-2][2] if len(trend) > 1 else None, delta_color="inverse")
+    with col4:
+        st.metric("First Assessment", trend[0][0] or "—")
+
+    st.plotly_chart(patient_trend_figure(trend), use_container_width=True)
+
+    st.markdown(f"### Last {min(RECENT_ENTRIES, len(trend))} Assessments")
+    # One extra entry so the oldest row shown has something to compare with
+    history = store.history(patient_id, last=RECENT_ENTRIES + 1)
+    rows = []
+    previous = None
+    for seq, record in history:
+        rows.append({
+            "#": seq + 1,
+            "Date": record.assessment_date,
+            "WPI": record.wpi_score,
+            "Total SS": record.total_ss_score,
+            "Meets Criteria": "Yes" if record.meets_criteria else "No",
+            "Changes": describe_changes(previous, record),
+        })
+        previous = record
+    st.dataframe(rows[-RECENT_ENTRIES:][::-1], use_container_width=True, hide_index=True)
+
+
+main()
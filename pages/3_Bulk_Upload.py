@@ -0,0 +1,188 @@
+"""Score a spreadsheet of paper questionnaires in one go.
+
+The upload is read and scored in chunks (see fibromyalgia_upload) and only
+the compact scored columns are kept in session state, so paging through
+the table or changing the download format does not rescore the file.
+"""
+
+import io
+import time
+
+import streamlit as st
+
+from fibromyalgia_charts import (
+    cohort_scores_figure, cohort_heatmap_figure, cohort_trend_figure,
+    cohort_pain_areas_figure, cohort_symptoms_figure
+)
+from fibromyalgia_cli import REQUIRED_CSV_COLUMNS
+from fibromyalgia_export import EXPORT_FORMATS, write_export
+from fibromyalgia_record import decode_mask
+from fibromyalgia_scoring import PAIN_AREAS, OTHER_SYMPTOMS
+from fibromyalgia_upload import (
+    SCORED_COLUMNS, aggregate_scored, concat_chunks, criteria_summary, guess_upload_format,
+    iter_scored_chunks, scored_records
+)
+
+PAGE_SIZES = [50, 100, 500]
+PREVIEW_ROWS = 20
+
+
+def score_upload(uploaded):
+    """Score the uploaded file with a progress bar; returns the result dict"""
+    progress = st.progress(0.0, text="Scoring…")
+    preview = st.empty()
+    scored_parts, reject_parts = [], []
+    start = time.perf_counter()
+    for scored, rejects, rows_read in iter_scored_chunks(uploaded, guess_upload_format(uploaded.name)):
+        if not scored_parts:
+            preview.dataframe(page_table(scored.head(PREVIEW_ROWS)), hide_index=True)
+        scored_parts.append(scored)
+        reject_parts.append(rejects)
+        # Rows are not known up front; the file position is a good enough guide
+        progress.progress(min(uploaded.tell() / max(uploaded.size, 1), 1.0),
+                          text=f"Scored {rows_read:,} rows…")
+    progress.empty()
+    preview.empty()
+    scored = concat_chunks(scored_parts, SCORED_COLUMNS)
+    return {
+        "file_id": uploaded.file_id,
+        "name": uploaded.name,
+        "scored": scored,
+        "rejects": concat_chunks(reject_parts, ["row", "error"]),
+        "aggregates": aggregate_scored(scored),
+        "criteria": criteria_summary(scored),
+        "seconds": time.perf_counter() - start,
+    }
+
+def page_table(scored):
+    """Display rows for a slice of the scored upload, with the labels decoded"""
+    return [
+        {
+            "Row": row.row,
+            "Date": row.assessment_date,
+            "WPI": row.wpi_score,
+            "SS 2a": row.ss_2a_score,
+            "SS 2b": row.ss_2b_score,
+            "Total SS": row.total_ss_score,
+            "Meets Criteria": "Yes" if row.meets_diagnostic_criteria else "No",
+            "Pain Areas": ", ".join(decode_mask(row.pain_mask, PAIN_AREAS)),
+            "Other Symptoms": ", ".join(decode_mask(row.symptom_mask, OTHER_SYMPTOMS)),
+        }
+        for row in scored.itertuples(index=False)
+    ]
+
+@st.fragment
+def show_table(scored):
+    """One page of scored rows"""
+    st.markdown("### Scored Rows")
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key="upload_page_size")
+    pages = max(1, -(-len(scored) // page_size))
+    with col2:
+        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1,
+                               key="upload_page")
+    start = (page - 1) * page_size
+    st.dataframe(page_table(scored.iloc[start:start + page_size]), use_container_width=True,
+                 hide_index=True)
+
+@st.fragment
+def show_download(result):
+    """Scored file download, built only when asked for"""
+    st.markdown("### 💾 Download Scored File")
+    col1, col2 = st.columns(2)
+    with col1:
+        fmt = st.selectbox("Format", EXPORT_FORMATS, key="upload_format")
+    with col2:
+        layout = st.selectbox("Pain areas and symptoms", ["boolean", "bitmask"], key="upload_layout",
+                              format_func=lambda layout: {"boolean": "One column per label",
+                                                          "bitmask": "Bitmask columns"}[layout])
+    if st.button("Prepare download", key="upload_prepare"):
+        buffer = io.BytesIO()
+        try:
+            write_export(scored_records(result["scored"]), buffer, fmt, layout)
+        except ValueError as exc:
+            st.error(str(exc))
+            return
+        stem = result["name"].rsplit(".", 1)[0]
+        st.download_button(f"📄 Download {stem}_scored.{fmt}", data=buffer.getvalue(),
+                           file_name=f"{stem}_scored.{fmt}", key="upload_download")
+
+
+def main():
+    st.set_page_config(
+        page_title="Bulk Upload",
+        page_icon="📤",
+        layout="wide"
+    )
+    st.title("📤 Bulk Upload")
+    st.markdown("Score a CSV or XLSX file with one row per questionnaire: a yes/no column for every "
+                "pain area and symptom label, plus `fatigue`, `waking_unrefreshed` and "
+                "`cognitive_symptoms` (0-3). `assessment_date` and `None of these areas` are optional.")
+    st.download_button("📋 Download blank template (CSV)",
+                       data=",".join(["assessment_date"] + REQUIRED_CSV_COLUMNS) + "\n",
+                       file_name="fibromyalgia_upload_template.csv", mime="text/csv")
+
+    uploaded = st.file_uploader("Questionnaire file", type=["csv", "xlsx"])
+    if uploaded is None:
+        st.session_state.pop("upload_result", None)
+        return
+
+    result = st.session_state.get("upload_result")
+    if result is None or result["file_id"] != uploaded.file_id:
+        try:
+            result = score_upload(uploaded)
+        except ValueError as exc:
+            st.error(f"Cannot score {uploaded.name}: {exc}")
+            return
+        st.session_state.upload_result = result
+
+    scored, rejects, aggregates = result["scored"], result["rejects"], result["aggregates"]
+    st.success(f"Scored {len(scored):,} rows of {result['name']} in {result['seconds']:.1f}s"
+               + (f"; {len(rejects):,} rows could not be scored." if len(rejects) else "."))
+
+    if len(rejects):
+        with st.expander(f"⚠️ {len(rejects):,} rejected rows"):
+            st.dataframe(rejects.head(1000), use_container_width=True, hide_index=True)
+            st.download_button("Download rejected rows (CSV)", data=rejects.to_csv(index=False),
+                               file_name=f"{result['name'].rsplit('.', 1)[0]}_rejects.csv",
+                               mime="text/csv")
+    if not len(scored):
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Scored Rows", f"{len(scored):,}")
+    with col2:
+        st.metric("Meets Criteria", f"{scored['meets_diagnostic_criteria'].mean():.1%}")
+    with col3:
+        st.metric("Mean WPI Score", f"{aggregates.mean_wpi():.1f}")
+    with col4:
+        st.metric("Mean Total SS", f"{aggregates.mean_ss():.1f}")
+
+    st.markdown("### 🎯 Criteria Revisions")
+    st.dataframe([
+        {"Criteria": name, "Meets": f"{meets:,}", "Rate": f"{meets / len(scored):.1%}", "Reference": reference}
+        for name, reference, meets in result["criteria"]
+    ], use_container_width=True, hide_index=True)
+
+    show_table(scored)
+
+    st.markdown("### 📊 Charts")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(cohort_scores_figure(aggregates), use_container_width=True)
+    with col2:
+        st.plotly_chart(cohort_heatmap_figure(aggregates), use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(cohort_pain_areas_figure(aggregates), use_container_width=True)
+    with col2:
+        st.plotly_chart(cohort_symptoms_figure(aggregates), use_container_width=True)
+    if aggregates.daily:
+        st.plotly_chart(cohort_trend_figure(aggregates), use_container_width=True)
+
+    show_download(result)
+
+
+main()